@@ -0,0 +1,144 @@
+"""
+Measurement of benchmarks and the history of runs
+
+Every sample is the mean time of a call over a calibrated amount of calls,
+so fast functions are not dominated by the clock resolution. Runs are kept
+in a JSON history with the machine they were measured on: a baseline is the
+latest run of the same benchmark on the same platform.
+
+Example:
+    benchmark = Benchmark('extract')
+    benchmark.run(extract_batch, db, ids)
+    history = History('history.json')
+    comparison = benchmark.compare(history.baseline('extract'))
+    history.save({'extract': benchmark.samples})
+"""
+from datetime import datetime
+import gc
+import json
+import os
+import platform
+from statistics import mean, stdev
+import subprocess
+from time import perf_counter
+from typing import Callable, Dict, List, Optional
+
+from .stats import Comparison, welch_test
+
+
+ROUNDS = 20
+WARMUP = 1
+MIN_SAMPLE_TIME = 0.01
+MAX_RUNS = 50
+
+
+def get_platform() -> str:
+    """Returns a key of the machine and the interpreter, timings of different ones are not compared"""
+    return f'{platform.node()} {platform.machine()} {platform.python_implementation()} {platform.python_version()}'
+
+
+def get_commit() -> Optional[str]:
+    try:
+        result = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(__file__),
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+class Benchmark:
+    """Samples of a function timing, in seconds per call"""
+
+    def __init__(self, name: str, rounds: int = ROUNDS, min_sample_time: float = MIN_SAMPLE_TIME):
+        self.name = name
+        self.rounds = rounds
+        self.min_sample_time = min_sample_time
+        self.samples: List[float] = []
+        self.comparison: Optional[Comparison] = None
+
+    def calibrate(self, func: Callable, *args, **kwargs) -> int:
+        """Returns an amount of calls taking at least the min sample time"""
+        number = 1
+
+        while True:
+            start = perf_counter()
+            for _ in range(number):
+                func(*args, **kwargs)
+            elapsed = perf_counter() - start
+
+            if elapsed >= self.min_sample_time:
+                return number
+
+            number *= 10 if elapsed < self.min_sample_time / 10 else 2
+
+    def run(self, func: Callable, *args, **kwargs):
+        """Measures the function and returns its result for checks"""
+        for _ in range(WARMUP):
+            result = func(*args, **kwargs)
+
+        number = self.calibrate(func, *args, **kwargs)
+        gc_enabled = gc.isenabled()
+        gc.disable()
+
+        try:
+            for _ in range(self.rounds):
+                start = perf_counter()
+                for _ in range(number):
+                    func(*args, **kwargs)
+                self.samples.append((perf_counter() - start) / number)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+        return result
+
+    def compare(self, baseline: List[float]) -> Comparison:
+        """Compares the samples with the baseline ones and keeps the result"""
+        self.comparison = welch_test(baseline, self.samples)
+        return self.comparison
+
+    def summary(self) -> dict:
+        return {
+            'rounds': len(self.samples),
+            'min': min(self.samples),
+            'mean': mean(self.samples),
+            'stdev': stdev(self.samples) if len(self.samples) > 1 else 0.0,
+        }
+
+
+class History:
+    """JSON file of benchmark runs: {"runs": [{"time", "commit", "platform", "results": {name: samples}}]}"""
+
+    def __init__(self, path: str, platform_key: str = None):
+        self.path = path
+        self.platform = platform_key or get_platform()
+        self.runs: List[dict] = self._load()
+
+    def _load(self) -> List[dict]:
+        if not os.path.exists(self.path):
+            return []
+
+        with open(self.path, encoding='utf-8') as file:
+            return json.load(file).get('runs', [])
+
+    def baseline(self, name: str) -> Optional[List[float]]:
+        """Returns samples of the latest run of the benchmark on this platform"""
+        for run in reversed(self.runs):
+            if run['platform'] == self.platform and name in run['results']:
+                return run['results'][name]
+        return None
+
+    def save(self, results: Dict[str, List[float]], max_runs: int = MAX_RUNS):
+        """Appends a run and keeps the latest ones"""
+        self.runs.append({
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'commit': get_commit(),
+            'platform': self.platform,
+            'results': results,
+        })
+        self.runs = self.runs[-max_runs:]
+
+        with open(self.path, 'w', encoding='utf-8') as file:
+            json.dump({'runs': self.runs}, file, indent=1)
@@ -0,0 +1,103 @@
+"""
+Benchmarks of the ETL and search hot paths
+
+A test measures a function with the "bench" fixture. It fails if the function
+became slower than the baseline, the latest saved run on this machine:
+the slowdown must be significant by Welch's t-test and above the tolerance.
+
+Run:
+    python -m pytest benchmarks                  # compare with the history
+    python -m pytest benchmarks --bench-save     # and save the run if nothing regressed
+"""
+from os.path import dirname, join
+from typing import Callable, Dict, List
+
+from pytest import fail, fixture
+
+from .bench import ROUNDS, Benchmark, History
+
+
+HISTORY_FILE = join(dirname(__file__), 'history.json')
+ALPHA = 0.01
+TOLERANCE = 0.1
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('benchmarks')
+    group.addoption('--bench-history', default=HISTORY_FILE, help='JSON file of saved runs')
+    group.addoption('--bench-save', action='store_true', help='save the run if no benchmark regressed')
+    group.addoption('--bench-rounds', type=int, default=ROUNDS, help='samples per benchmark')
+    group.addoption('--bench-alpha', type=float, default=ALPHA, help='significance level of a slowdown')
+    group.addoption('--bench-tolerance', type=float, default=TOLERANCE,
+                    help='relative slowdown to ignore even if it is significant')
+
+
+def pytest_configure(config):
+    config.bench_results: Dict[str, Benchmark] = {}
+
+
+@fixture(scope='session')
+def bench_history(pytestconfig) -> History:
+    return History(pytestconfig.getoption('bench_history'))
+
+
+@fixture
+def bench(request, pytestconfig, bench_history) -> Callable:
+    """Measures a function, fails the test on a regression and returns the function result
+
+    Example:
+        def test_extract(bench, db):
+            movies = bench(extract_batch, db, ids)
+            assert movies
+    """
+    name = request.node.name
+    benchmark = Benchmark(name, pytestconfig.getoption('bench_rounds'))
+
+    def measure(func: Callable, *args, **kwargs):
+        result = benchmark.run(func, *args, **kwargs)
+        pytestconfig.bench_results[name] = benchmark
+        baseline = bench_history.baseline(name)
+
+        if baseline:
+            comparison = benchmark.compare(baseline)
+            alpha, tolerance = pytestconfig.getoption('bench_alpha'), pytestconfig.getoption('bench_tolerance')
+
+            if comparison.is_slower(alpha, tolerance):
+                fail(
+                    f'{name} is {comparison.change:.1%} slower: {comparison.current * 1000:.3f} ms '
+                    f'vs {comparison.baseline * 1000:.3f} ms, p={comparison.p_value:.2g}',
+                    pytrace=False,
+                )
+
+        return result
+
+    return measure
+
+
+def pytest_sessionfinish(session, exitstatus):
+    config = session.config
+    results: Dict[str, List[float]] = {name: b.samples for name, b in config.bench_results.items()}
+
+    # a regressed run must not become the baseline
+    if results and config.getoption('bench_save') and exitstatus == 0:
+        History(config.getoption('bench_history')).save(results)
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    if not config.bench_results:
+        return
+
+    terminalreporter.section('benchmarks')
+    terminalreporter.write_line(f'{"name":<40}{"mean, ms":>12}{"stdev, ms":>12}{"change":>10}{"p":>10}')
+
+    for name, benchmark in config.bench_results.items():
+        summary = benchmark.summary()
+        comparison = benchmark.comparison
+        change, p_value = '', ''
+
+        if comparison:
+            change, p_value = f'{comparison.change:+.1%}', f'{comparison.p_value:.2g}'
+
+        terminalreporter.write_line(
+            f'{name:<40}{summary["mean"] * 1000:12.3f}{summary["stdev"] * 1000:12.3f}{change:>10}{p_value:>10}'
+        )
@@ -0,0 +1,103 @@
+"""
+Welch's t-test of benchmark samples
+
+Samples of two runs have different variances and sizes, so the means are
+compared by Welch's test. The p-value comes from the Student's t distribution
+through the regularized incomplete beta function, no SciPy is needed.
+"""
+from dataclasses import dataclass
+from math import exp, lgamma, log, sqrt
+from statistics import mean, variance
+from typing import Sequence
+
+
+EPSILON = 1e-12
+MAX_ITERATIONS = 200
+
+
+def incomplete_beta(x: float, a: float, b: float) -> float:
+    """Returns the regularized incomplete beta function I_x(a, b)"""
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+
+    front = exp(lgamma(a + b) - lgamma(a) - lgamma(b) + a * log(x) + b * log(1 - x))
+
+    # the continued fraction converges fast below the mean of the distribution
+    if x > (a + 1) / (a + b + 2):
+        return 1.0 - front * beta_fraction(1 - x, b, a) / b
+
+    return front * beta_fraction(x, a, b) / a
+
+
+def beta_fraction(x: float, a: float, b: float) -> float:
+    """Evaluates the continued fraction of the incomplete beta function by Lentz's method"""
+    c, d = 1.0, 1.0 - (a + b) * x / (a + 1)
+    d = 1.0 / (d if abs(d) > EPSILON else EPSILON)
+    fraction = d
+
+    for m in range(1, MAX_ITERATIONS + 1):
+        for numerator in (
+            m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+            -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1)),
+        ):
+            d = 1.0 + numerator * d
+            d = 1.0 / (d if abs(d) > EPSILON else EPSILON)
+            c = 1.0 + numerator / c
+            c = c if abs(c) > EPSILON else EPSILON
+            fraction *= c * d
+
+        if abs(c * d - 1.0) < EPSILON:
+            break
+
+    return fraction
+
+
+def t_survival(t: float, df: float) -> float:
+    """Returns P(T > t) of the Student's t distribution"""
+    tail = incomplete_beta(df / (df + t * t), df / 2, 0.5) / 2
+    return tail if t > 0 else 1.0 - tail
+
+
+@dataclass
+class Comparison:
+    """Result of comparing a benchmark with its baseline, times are in seconds"""
+    baseline: float
+    current: float
+    t: float
+    df: float
+    p_value: float
+
+    @property
+    def change(self) -> float:
+        """Relative change of the mean time, positive for slowdowns"""
+        return self.current / self.baseline - 1 if self.baseline else 0.0
+
+    def is_slower(self, alpha: float, tolerance: float) -> bool:
+        """Checks whether the slowdown is significant and large enough to care"""
+        return self.p_value < alpha and self.change > tolerance
+
+
+def welch_test(baseline: Sequence[float], current: Sequence[float]) -> Comparison:
+    """One-sided Welch's t-test of the hypothesis that the current mean is greater
+
+    :param baseline: samples of the saved run
+    :param current: samples of this run
+    :return: means, t statistic, degrees of freedom and p-value
+    """
+    if len(baseline) < 2 or len(current) < 2:
+        raise ValueError('At least two samples of every run are required')
+
+    m1, m2 = mean(baseline), mean(current)
+    e1, e2 = variance(baseline, m1) / len(baseline), variance(current, m2) / len(current)
+    error = sqrt(e1 + e2)
+
+    if not error:
+        # identical timings, e.g. a too coarse clock
+        p_value = 0.0 if m2 > m1 else 1.0
+        return Comparison(m1, m2, 0.0, float(len(baseline) + len(current) - 2), p_value)
+
+    t = (m2 - m1) / error
+    df = (e1 + e2) ** 2 / (e1 ** 2 / (len(baseline) - 1) + e2 ** 2 / (len(current) - 1))
+    return Comparison(m1, m2, t, df, t_survival(t, df))
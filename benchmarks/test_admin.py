@@ -0,0 +1,90 @@
+import os
+from pathlib import Path
+import sys
+from unittest import mock
+
+from pytest import fixture, importorskip, mark, skip
+
+
+pytestmark = mark.benchmark
+
+ADMIN_DIR = Path(__file__).resolve().parent.parent / 'srv_admin'
+SCHEMA = ADMIN_DIR / 'schema.sql'
+MOVIES = 1000
+PERSONS = 500
+GENRES = 'Action', 'Adventure', 'Comedy', 'Drama', 'Sci-Fi'
+
+
+@fixture(scope='module')
+def admin_db():
+    """A test database of the admin service seeded with movies, genres and persons"""
+    django = importorskip('django')
+    sys.path.insert(0, str(ADMIN_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    django.setup()
+
+    from django.db import OperationalError, connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    try:
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    except OperationalError as e:
+        teardown_test_environment()
+        skip(f'PostgreSQL is not available: {e}')
+
+    # signals should not reach the ETL service
+    with mock.patch('movies.signals.ETLRunner.run'):
+        with connection.cursor() as cursor:
+            cursor.execute(SCHEMA.read_text())
+        seed()
+        yield
+
+    connection.creation.destroy_test_db(old_name, verbosity=0)
+    teardown_test_environment()
+
+
+def seed():
+    from movies.models import FilmWork, FilmWorkType, Genre, GenreFilmWork, Person, PersonFilmWork, RoleType
+
+    genres = Genre.objects.bulk_create(Genre(name=name) for name in GENRES)
+    persons = Person.objects.bulk_create(Person(full_name=f'Person {i}') for i in range(PERSONS))
+    movies = FilmWork.objects.bulk_create(
+        FilmWork(title=f'Star Movie {i}', type=FilmWorkType.MOVIE, description=f'Episode {i} of the saga')
+        for i in range(MOVIES)
+    )
+    GenreFilmWork.objects.bulk_create(
+        GenreFilmWork(film_work=movie, genre=genres[i % len(genres)]) for i, movie in enumerate(movies)
+    )
+    PersonFilmWork.objects.bulk_create(
+        PersonFilmWork(film_work=movie, person=persons[(i + shift) % PERSONS], role=role)
+        for i, movie in enumerate(movies)
+        for shift, role in enumerate((RoleType.ACTOR, RoleType.ACTOR, RoleType.DIRECTOR, RoleType.WRITER))
+    )
+
+
+@fixture(scope='module')
+def movies_api(admin_db):
+    from django.test import RequestFactory
+    from movies.api.views import MoviesApi
+
+    factory = RequestFactory()
+    view = MoviesApi.as_view()
+    return lambda **params: view(factory.get('/api/v1/movies/', params))
+
+
+def test_movies_queryset(bench, admin_db):
+    from movies.api.views import MoviesApi
+
+    movies = bench(lambda: list(MoviesApi().get_queryset()[:MoviesApi.paginate_by]))
+    assert len(movies) == MoviesApi.paginate_by
+
+
+def test_movies_api_page(bench, movies_api):
+    response = bench(movies_api, page=10)
+    assert response.status_code == 200
+
+
+def test_movies_api_search(bench, movies_api):
+    response = bench(movies_api, search='star saga')
+    assert response.status_code == 200
@@ -0,0 +1,80 @@
+from os.path import join
+from shutil import copyfile
+from sqlite3 import connect
+
+from pytest import fixture, importorskip, mark
+
+from common import ETL_DIR
+from practice.sprint_1.etl.analytics import CatalogAnalytics, actors_for_director, top_actors, top_writers
+from practice.sprint_1.etl.batch import BATCH_SIZE, chunked, extract_batch, extract_raw, transform_batch
+
+
+pytestmark = mark.benchmark
+
+DB_ADDRESS = join(ETL_DIR, 'db.sqlite')
+
+
+@fixture(scope='module')
+def db():
+    with connect(DB_ADDRESS) as connection:
+        yield connection
+
+
+@fixture(scope='module')
+def ids(db) -> list:
+    return [r[0] for r in db.execute('SELECT id FROM movies ORDER BY id')]
+
+
+@fixture(scope='module')
+def catalog(tmp_path_factory):
+    """A copy of the catalog prepared for analytics, indexes are not created in the original one"""
+    path = tmp_path_factory.mktemp('catalog') / 'db.sqlite'
+    copyfile(DB_ADDRESS, path)
+
+    with connect(path) as connection:
+        CatalogAnalytics(connection).top_actors()
+        yield connection
+
+
+@fixture(scope='module')
+def etl_requests():
+    return importorskip('practice.sprint_1.etl.etl_requests')
+
+
+@fixture(scope='module')
+def extractor(db, etl_requests):
+    return etl_requests.MovieDataExtractor(db)
+
+
+def test_extract_batch(bench, db, ids):
+    movies = bench(lambda: [m for chunk in chunked(ids, BATCH_SIZE) for m in extract_batch(db, chunk)])
+    assert len(movies) == len(ids)
+
+
+def test_transform_batch(bench, db, ids):
+    raw = extract_raw(db, ids)
+    movies = bench(transform_batch, *raw)
+    assert len(movies) == len(ids)
+
+
+def test_extractor_extract(bench, extractor, ids):
+    movies = bench(extractor.extract)
+    assert len(movies) == len(ids)
+
+
+def test_extractor_transform(bench, extractor, ids):
+    # transform updates a movie in place, so every call gets fresh raw data
+    raw = [extractor._extract_raw_data(movie_id) for movie_id in ids[:100]]
+    movies = bench(lambda: [extractor.transform(dict(movie)) for movie in raw])
+    assert len(movies) == 100
+
+
+def test_loader_get_bulk(bench, extractor, etl_requests):
+    movies = extractor.extract()
+    body = bench(etl_requests.ESLoader.get_bulk, movies, etl_requests.INDEX)
+    assert body.count('\n') == 2 * len(movies)
+
+
+def test_catalog_reports(bench, catalog):
+    reports = bench(lambda: (actors_for_director(catalog, 'Lerdam'), top_writers(catalog), top_actors(catalog)))
+    assert all(reports)
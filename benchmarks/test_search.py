@@ -0,0 +1,62 @@
+from contextlib import closing
+from os.path import join
+from sqlite3 import connect
+
+from pytest import fixture, importorskip, mark
+
+from common import ETL_DIR
+from practice.sprint_1.etl.batch import extract_batch
+
+
+pytestmark = mark.benchmark
+
+DB_ADDRESS = join(ETL_DIR, 'db.sqlite')
+LIST_URL = '/api/v1/movies/?search=star&search_in=all&genre=Action,Adventure&rating_min=7&sort=title&page=2'
+
+
+class StubElasticsearch:
+    """Returns a canned search response, so only the service side is measured"""
+
+    def __init__(self, movies: list):
+        self.response = {'hits': {'hits': [{'_source': movie} for movie in movies]}}
+
+    def search(self, body=None, index=None, **params):
+        return self.response
+
+
+@fixture(scope='module')
+def search_app():
+    for module in 'flask', 'flask_script', 'elasticsearch':
+        importorskip(module)
+    from srv_search.app import app
+    return app
+
+
+@fixture(scope='module')
+def stub_es() -> StubElasticsearch:
+    with closing(connect(DB_ADDRESS)) as db:
+        ids = [r[0] for r in db.execute('SELECT id FROM movies ORDER BY id LIMIT 50')]
+        movies = extract_batch(db, ids)
+    return StubElasticsearch([{'id': m['id'], 'title': m['title'], 'imdb_rating': m['imdb_rating']} for m in movies])
+
+
+def test_url_arg_validator(bench, search_app):
+    from srv_search.api.utils import UrlArgValidator
+
+    def validate():
+        with search_app.test_request_context(LIST_URL):
+            return UrlArgValidator().values
+
+    values = bench(validate)
+    assert values['page'] == 2
+
+
+def test_get_movies(bench, search_app, stub_es):
+    from srv_search.api.utils import get_movies
+
+    def search():
+        with search_app.test_request_context(LIST_URL):
+            return get_movies(stub_es, {'query': {'match_all': {}}}, limit=50, page=2)
+
+    response = bench(search)
+    assert len(response.json) == 50
@@ -0,0 +1,86 @@
+from random import Random
+
+from pytest import approx, raises
+
+from .bench import Benchmark, History
+from .stats import t_survival, welch_test
+
+
+def samples(mean: float, seed: int, amount: int = 30) -> list:
+    rng = Random(seed)
+    return [rng.gauss(mean, mean * 0.05) for _ in range(amount)]
+
+
+def test_t_survival():
+    # values of the Student's t distribution tables
+    assert t_survival(0.0, 5) == approx(0.5)
+    assert t_survival(1.0, 1) == approx(0.25)
+    assert t_survival(2.0, 10) == approx(0.03669, abs=1e-5)
+    assert t_survival(-2.0, 10) == approx(1 - 0.03669, abs=1e-5)
+    assert t_survival(3.0, 30) == approx(0.00269, abs=1e-5)
+
+
+def test_slowdown_is_significant():
+    comparison = welch_test(samples(1.0, seed=1), samples(1.2, seed=2))
+
+    assert comparison.change == approx(0.2, abs=0.05)
+    assert comparison.p_value < 0.001
+    assert comparison.is_slower(alpha=0.01, tolerance=0.1)
+
+
+def test_noise_is_not_a_slowdown():
+    comparison = welch_test(samples(1.0, seed=1), samples(1.0, seed=2))
+    assert not comparison.is_slower(alpha=0.01, tolerance=0.0)
+
+
+def test_small_slowdown_is_tolerated():
+    comparison = welch_test(samples(1.0, seed=1, amount=1000), samples(1.03, seed=2, amount=1000))
+
+    assert comparison.p_value < 0.01
+    assert not comparison.is_slower(alpha=0.01, tolerance=0.1)
+
+
+def test_speedup_is_not_a_slowdown():
+    comparison = welch_test(samples(1.0, seed=1), samples(0.5, seed=2))
+    assert comparison.p_value > 0.99
+
+
+def test_constant_samples():
+    assert welch_test([1.0, 1.0], [2.0, 2.0]).p_value == 0.0
+    assert welch_test([1.0, 1.0], [1.0, 1.0]).p_value == 1.0
+
+    with raises(ValueError):
+        welch_test([1.0], [1.0, 2.0])
+
+
+def test_benchmark_returns_result():
+    benchmark = Benchmark('sum', rounds=3, min_sample_time=0.001)
+
+    assert benchmark.run(sum, range(100)) == 4950
+    assert len(benchmark.samples) == 3
+    assert benchmark.summary()['rounds'] == 3
+
+
+def test_history_baseline(tmp_path):
+    path = str(tmp_path / 'history.json')
+    history = History(path, platform_key='here')
+    assert history.baseline('sum') is None
+
+    history.save({'sum': [1.0, 2.0]})
+    History(path, platform_key='there').save({'sum': [3.0, 4.0]})
+    history = History(path, platform_key='here')
+    history.save({'other': [5.0, 6.0]})
+
+    assert History(path, platform_key='here').baseline('sum') == [1.0, 2.0]
+    assert History(path, platform_key='there').baseline('sum') == [3.0, 4.0]
+
+
+def test_history_keeps_latest_runs(tmp_path):
+    history = History(str(tmp_path / 'history.json'))
+
+    for i in range(5):
+        history.save({'sum': [float(i), float(i)]}, max_runs=3)
+
+    history = History(history.path)
+    assert len(history.runs) == 3
+    assert history.baseline('sum') == [4.0, 4.0]
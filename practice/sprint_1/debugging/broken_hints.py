@@ -1,16 +1,56 @@
+from array import array
 from cProfile import run as profile
-from typing import Optional
+from itertools import chain, repeat
+from typing import Iterable, Iterator, Optional, Union
+
+
+PROFILE_SIZE = 10 ** 6
+# числа одного типа хранятся компактно, остальные элементы - в списке
+TYPECODES = {int: 'q', float: 'd'}
+TYPES = {code: type_ for type_, code in TYPECODES.items()}
+
+Storage = Union[array, list]
+
+
+def get_storage(elements: list, typecode: Optional[str] = None) -> Storage:
+    """
+    Возвращает хранилище для элементов: array для чисел одного типа, иначе список.
+    Типы сравниваются точно, чтобы bool и подклассы чисел выводились как есть.
+    """
+    types = set(map(type, elements))
+
+    if typecode is None and len(types) == 1:
+        typecode = TYPECODES.get(types.pop())
+    elif typecode is not None and types - {TYPES[typecode]}:
+        typecode = None
+
+    if typecode is None:
+        return elements
+
+    try:
+        return array(typecode, elements)
+    except OverflowError:
+        # целые больше 64 бит
+        return elements
 
 
 class Matrix:
     """
     Код нашего коллеги аналитика
     Очень медленный и тяжелый для восприятия. Ваша задача сделать его быстрее и проще для понимания.
+
+    Элементы хранятся в array, пока они числа одного типа (int или float), иначе в списке.
+    Размер матрицы зависит от истории добавлений и удалений, поэтому хранится отдельно.
     """
+    __slots__ = 'matrix', 'size'
+
     def __init__(self):
-        self.matrix = []
+        self.matrix: Storage = array(TYPECODES[int])
         self.size = 1
 
+    def __len__(self):
+        return len(self.matrix)
+
     def add_item(self, element: Optional = None):
         """
         Добавляем новый элемент в матрицу.
@@ -22,7 +62,45 @@ class Matrix:
         if len(self.matrix) >= (self.size - 1) ** 2:
             self.size += 1
 
-        self.matrix.append(element)
+        matrix = self.matrix
+
+        # число того же типа добавляется в array без проверок всего набора
+        if isinstance(matrix, array) and matrix and type(element) is TYPES[matrix.typecode]:
+            try:
+                matrix.append(element)
+                return
+            except OverflowError:
+                pass
+
+        self._append([element])
+
+    def extend(self, elements: Iterable):
+        """
+        Добавляем элементы в матрицу разом, размер меняется так же, как при add_item для каждого.
+        """
+        elements = list(elements)
+
+        if None in elements:
+            raise ValueError('Добавляемый элемент не может быть None')
+
+        length, size = len(self.matrix), self.size
+        remaining = len(elements)
+
+        while remaining:
+            limit = (size - 1) ** 2
+
+            if length >= limit:
+                size += 1
+                step = 1
+            else:
+                # до следующего расширения
+                step = min(remaining, limit - length)
+
+            length += step
+            remaining -= step
+
+        self._append(elements)
+        self.size = size
 
     def pop(self):
         """
@@ -37,27 +115,80 @@ class Matrix:
 
         return self.matrix.pop()
 
+    def truncate(self, count: int) -> Storage:
+        """
+        Удалить последние count элементов разом, размер меняется так же, как при pop для каждого.
+        Возвращает удалённые элементы в порядке хранения, при ошибке матрица не меняется.
+        """
+        if count < 0:
+            raise ValueError('Количество удаляемых элементов не может быть отрицательным')
+
+        length, size = len(self.matrix), self.size
+        remaining = count
+
+        while remaining:
+            if size == 1 or not length:
+                raise IndexError('Достигнут минимальный размер матрицы')
+
+            limit = (size - 1) * (size - 2)
+
+            if length - 1 <= limit:
+                size -= 1
+                step = 1
+            else:
+                # до следующего уменьшения
+                step = min(remaining, length - 1 - limit)
+
+            length -= step
+            remaining -= step
+
+        removed = self.matrix[length:]
+        del self.matrix[length:]
+        self.size = size
+        return removed
+
+    def _append(self, elements: list):
+        """Добавляет элементы, переходя на список, если они не умещаются в array"""
+        if isinstance(self.matrix, array):
+            # тип пустого хранилища выбирается по первым элементам
+            storage = get_storage(elements, self.matrix.typecode if self.matrix else None)
+
+            if isinstance(storage, array):
+                if self.matrix:
+                    self.matrix.extend(storage)
+                else:
+                    self.matrix = storage
+                return
+
+            self.matrix = self.matrix.tolist()
+
+        self.matrix.extend(elements)
+
+    def iter_rows(self) -> Iterator[str]:
+        """
+        Строки матрицы по одной, недостающие элементы выводятся как None.
+        Копируется только одна строка хранилища за раз.
+        """
+        length = len(self.matrix)
+
+        for start in range(0, self.size ** 2, self.size):
+            row = self.matrix[start:start + self.size] if start < length else ()
+            yield ' '.join(map(str, chain(row, repeat(None, self.size - len(row)))))
+
     def __str__(self):
         """
         Метод должен выводить матрицу в виде:
         1 2 3\nNone None None\nNone None None
         То есть между элементами строки должны быть пробелы, а строки отделены \n
         """
-        diff = self.size ** 2 - len(self.matrix)
-        matrix = self.matrix + [None] * diff
-
-        result = []
-        for i in range(self.size):
-            start = i * self.size
-            end = (i + 1) * self.size
-            row = ' '.join(map(lambda x: str(x), matrix[start:end]))
-            result.append(row)
-        return '\n'.join(result)
+        return '\n'.join(self.iter_rows())
 
 
-def main():
-    code = """m = Matrix()\nfor i in range(1000):\n\tm.add_item(i)\nfor i in range(1000):\n\tm.pop()"""
-    profile(code, sort=1)
+def main(size: int = PROFILE_SIZE):
+    per_item = f"m = Matrix()\nfor i in range({size}):\n\tm.add_item(i)\ns = str(m)\nfor i in range({size}):\n\tm.pop()"
+    bulk = f"m = Matrix()\nm.extend(range({size}))\ns = str(m)\nm.truncate({size})"
+    profile(per_item, sort=1)
+    profile(bulk, sort=1)
 
 
 if __name__ == '__main__':
@@ -1,4 +1,5 @@
-from json import loads
+from json import dumps, loads
+from typing import Iterable, Iterator
 
 
 request_payload = """\
@@ -15,20 +16,34 @@ request_payload = """\
 """
 
 
-def unique_tags(payload: dict) -> list:
-    """Extracts unique tags from payload"""
-    tags = payload.get('tags', [])
-    unique = list(set(tags))
+def get_tag_key(tag) -> tuple:
+    """Returns a key distinguishing tags by type as well, so 1, 1.0 and True differ"""
+    try:
+        hash(tag)
+    except TypeError:
+        # lists and objects of JSON are compared by their content
+        return type(tag), dumps(tag, sort_keys=True)
+    return type(tag), tag
+
+
+def iter_unique_tags(tags: Iterable) -> Iterator:
+    """Yields tags seen for the first time, keeps memory for unique ones only"""
+    seen = set()
 
-    int_inherited = filter(
-        lambda tag: type(tag) != type(unique[unique.index(tag)]),
-        tags
-    )
+    for tag in tags:
+        key = get_tag_key(tag)
 
-    unique.extend(int_inherited)
-    return unique
+        if key not in seen:
+            seen.add(key)
+            yield tag
+
+
+def unique_tags(payload: dict) -> list:
+    """Extracts unique tags from payload in order of appearance"""
+    return list(iter_unique_tags(payload.get('tags', [])))
 
 
-converted = loads(request_payload)
-result = unique_tags(converted)
-print(result)
+if __name__ == '__main__':
+    converted = loads(request_payload)
+    result = unique_tags(converted)
+    print(result)
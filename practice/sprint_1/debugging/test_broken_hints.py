@@ -1,3 +1,4 @@
+from array import array
 from math import ceil, sqrt
 from pytest import fixture, main, mark, param, raises
 from practice.sprint_1.debugging.broken_hints import Matrix
@@ -63,5 +64,74 @@ def test_str(matrix1000):
     assert str(matrix1000) == expected
 
 
+@mark.parametrize('items,storage', [
+    ([1, 2, 3], array),
+    ([1.0, 2.5], array),
+    ([1, 2.5], list),
+    ([True, False], list),
+    ([2 ** 70], list),
+    (['a', 'b'], list),
+])
+def test_storage(matrix, items, storage):
+    matrix.extend(items)
+    assert isinstance(matrix.matrix, storage)
+    assert str(matrix).split()[:len(items)] == list(map(str, items))
+
+
+def test_storage_switches_to_list(matrix):
+    matrix.extend([1, 2])
+    matrix.add_item(0.5)
+    matrix.add_item(2 ** 70)
+
+    assert isinstance(matrix.matrix, list)
+    assert [matrix.pop() for _ in range(4)] == [2 ** 70, 0.5, 2, 1]
+
+
+@mark.parametrize('chunks', [(1, 1, 1, 1, 1), (5, 0, 12), (100, 3, 900), (1000,)])
+def test_extend_matches_add_item(matrix, chunks):
+    expected = Matrix()
+
+    for chunk in chunks:
+        items = list(range(chunk))
+        matrix.extend(items)
+        for item in items:
+            expected.add_item(item)
+
+        assert matrix.size == expected.size
+        assert str(matrix) == str(expected)
+
+
+@mark.parametrize('counts', [(1, 1, 1), (7, 0, 300), (999,), (500, 499)])
+def test_truncate_matches_pop(matrix1000, counts):
+    expected = Matrix()
+    expected.extend([1] * 1000)
+
+    for count in counts:
+        removed = matrix1000.truncate(count)
+        assert list(removed) == [expected.pop() for _ in range(count)][::-1]
+        assert matrix1000.size == expected.size
+        assert str(matrix1000) == str(expected)
+
+
+def test_truncate_negative(matrix1000):
+    with raises(IndexError):
+        matrix1000.truncate(1001)
+    with raises(ValueError):
+        matrix1000.truncate(-1)
+
+    assert len(matrix1000) == 1000
+
+
+def test_extend_none(matrix):
+    with raises(ValueError):
+        matrix.extend([1, None])
+    assert len(matrix) == 0
+
+
+def test_iter_rows(matrix):
+    matrix.extend(range(5))
+    assert list(matrix.iter_rows()) == ['0 1 2 3', '4 None None None', 'None None None None', 'None None None None']
+
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,39 @@
+from json import loads
+from pytest import main, mark
+from practice.sprint_1.debugging.empire_bugs_back import iter_unique_tags, request_payload, unique_tags
+
+
+def test_request_payload():
+    tags = unique_tags(loads(request_payload))
+
+    assert tags[:4] == [2, 'семейное кино', 'космос', 1.0]
+    assert tags.count('боевик') == 1
+    assert len(tags) == 26
+
+
+@mark.parametrize('tags,expected', [
+    ([1, 1.0, True], [1, 1.0, True]),
+    ([True, 1, True, 1.0, 1], [True, 1, 1.0]),
+    ([0, False, 0.0, 0, ''], [0, False, 0.0, '']),
+    (['b', 'a', 'b', 'a'], ['b', 'a']),
+    ([[1, 2], [1, 2], {'a': 1}, {'a': 1}, [2, 1]], [[1, 2], {'a': 1}, [2, 1]]),
+    ([], []),
+])
+def test_unique_tags(tags, expected):
+    result = unique_tags({'tags': tags})
+
+    assert result == expected
+    assert list(map(type, result)) == list(map(type, expected))
+
+
+def test_no_tags():
+    assert unique_tags({}) == []
+
+
+def test_iter_unique_tags_is_lazy():
+    tags = iter_unique_tags(i % 3 for i in range(10 ** 9))
+    assert [next(tags) for _ in range(3)] == [0, 1, 2]
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,273 @@
+"""
+Reports over the SQLite movies catalog
+
+The reports of practice/sprint_1/sqlite.sql as parameterized functions. Instead of
+LIKE scans and grouping over the full join they use:
+    - covering indexes of movie_actors in both directions
+    - movie_directors and movie_writers link tables split from comma separated
+      directors and "writer" / "writers" JSON of movies
+    - an FTS5 index of names of directors and actors
+    - amounts of movies of writers and actors aggregated once and indexed for tops
+
+The link tables and the FTS index are built in the TEMP schema of a connection,
+so the catalog file only gets the indexes. Report functions expect the temp
+tables to be built, CatalogAnalytics does it, caches results and rebuilds
+the temp tables when the catalog changes.
+
+Run:
+    python -m practice.sprint_1.etl.analytics director Lerdam
+    python -m practice.sprint_1.etl.analytics writers --limit 5
+"""
+from argparse import ArgumentParser
+from collections import OrderedDict
+from contextlib import closing
+from os.path import join
+from sqlite3 import Connection, OperationalError, connect
+from typing import Callable, List, Tuple
+
+from common import ETL_DIR
+from practice.sprint_1.etl.batch import split_values
+
+
+DB_ADDRESS = join(ETL_DIR, 'db.sqlite')
+CACHE_SIZE = 256
+TOP_LIMIT = 10
+
+INDEXES = (
+    'CREATE INDEX IF NOT EXISTS movie_actors_movie_actor ON movie_actors (movie_id, actor_id);',
+    'CREATE INDEX IF NOT EXISTS movie_actors_actor_movie ON movie_actors (actor_id, movie_id);',
+)
+
+TEMP_TABLES = (
+    'DROP TABLE IF EXISTS temp.movie_directors;',
+    'DROP TABLE IF EXISTS temp.movie_writers;',
+    'DROP TABLE IF EXISTS temp.people_fts;',
+    'DROP TABLE IF EXISTS temp.movies_amounts;',
+    """\
+    CREATE TABLE temp.movie_directors (
+        name TEXT NOT NULL,
+        movie_id TEXT NOT NULL,
+        PRIMARY KEY (name, movie_id)
+    ) WITHOUT ROWID;
+    """,
+    """\
+    CREATE TABLE temp.movie_writers (
+        writer_id TEXT NOT NULL,
+        movie_id TEXT NOT NULL,
+        PRIMARY KEY (writer_id, movie_id)
+    ) WITHOUT ROWID;
+    """,
+    """\
+    CREATE VIRTUAL TABLE temp.people_fts
+        USING fts5(name, role UNINDEXED, tokenize = 'unicode61 remove_diacritics 2');
+    """,
+    """\
+    INSERT INTO temp.movie_writers
+        SELECT writer, id FROM movies WHERE writer != ''
+        UNION
+        SELECT json_extract(j.value, '$.id'), m.id FROM movies m, json_each(nullif(m.writers, '')) j;
+    """,
+    "INSERT INTO temp.people_fts (name, role) SELECT DISTINCT name, 'actor' FROM actors WHERE name != 'N/A';",
+    # amounts of movies are aggregated once, a top is a range of the index
+    """\
+    CREATE TABLE temp.movies_amounts (
+        role TEXT NOT NULL,
+        name TEXT NOT NULL,
+        amount INTEGER NOT NULL,
+        PRIMARY KEY (role, name)
+    ) WITHOUT ROWID;
+    """,
+    'CREATE INDEX temp.movies_amounts_top ON movies_amounts (role, amount DESC, name);',
+    """\
+    INSERT INTO temp.movies_amounts (role, name, amount)
+        SELECT 'writer', w.name, count(*)
+            FROM temp.movie_writers mw
+            JOIN writers w ON w.id = mw.writer_id
+            WHERE w.name != 'N/A'
+            GROUP BY w.name;
+    """,
+    """\
+    INSERT INTO temp.movies_amounts (role, name, amount)
+        SELECT 'actor', a.name, sum(c.amount)
+            FROM (
+                SELECT actor_id, count(*) AS amount
+                    FROM movie_actors
+                    GROUP BY actor_id
+            ) c
+            JOIN actors a ON a.id = c.actor_id
+            WHERE a.name != 'N/A'
+            GROUP BY a.name;
+    """,
+)
+
+ACTORS_FOR_DIRECTOR = """\
+    SELECT DISTINCT a.name
+        FROM people_fts f
+        JOIN movie_directors md ON md.name = f.name
+        JOIN movie_actors ma    ON ma.movie_id = md.movie_id
+        JOIN actors a           ON a.id = ma.actor_id
+        WHERE people_fts MATCH ? AND f.role = 'director' AND a.name != 'N/A'
+        ORDER BY a.name;
+    """
+
+TOP_PEOPLE = """\
+    SELECT name, amount
+        FROM temp.movies_amounts
+        WHERE role = ?
+        ORDER BY amount DESC, name
+        LIMIT ?;
+    """
+
+SEARCH_PEOPLE = """\
+    SELECT name, role
+        FROM people_fts
+        WHERE people_fts MATCH ?
+        ORDER BY rank
+        LIMIT ?;
+    """
+
+
+def create_indexes(db: Connection) -> bool:
+    """Creates covering indexes of the catalog, returns False for a read-only one"""
+    try:
+        for statement in INDEXES:
+            db.execute(statement)
+    except OperationalError:
+        return False
+    return True
+
+
+def build_temp_tables(db: Connection):
+    """(Re)builds link tables and the FTS index of the connection from the catalog"""
+    # a transaction of the caller is left as is
+    own_transaction = not db.in_transaction
+
+    for statement in TEMP_TABLES:
+        db.execute(statement)
+
+    with closing(db.execute('SELECT id, director FROM movies')) as cursor:
+        directors = [(name, movie_id) for movie_id, director in cursor for name in split_values(director)]
+
+    db.executemany('INSERT OR IGNORE INTO temp.movie_directors (name, movie_id) VALUES (?, ?)', directors)
+    db.execute("""\
+        INSERT INTO temp.people_fts (name, role)
+            SELECT DISTINCT name, 'director' FROM temp.movie_directors;
+        """)
+
+    if own_transaction:
+        db.commit()
+
+
+def get_match_query(text: str) -> str:
+    """Converts words to an FTS5 query of the words prefixes, so any input is a valid query"""
+    words = text.replace('"', ' ').split()
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def get_version(db: Connection) -> Tuple[int, int]:
+    """Returns a value which changes with every change of the catalog by any connection"""
+    data_version, = db.execute('PRAGMA data_version').fetchone()
+    return db.total_changes, data_version
+
+
+def actors_for_director(db: Connection, director: str) -> List[str]:
+    """Returns names of actors who worked with directors matching the words"""
+    query = get_match_query(director)
+    if not query:
+        return []
+
+    with closing(db.execute(ACTORS_FOR_DIRECTOR, [query])) as cursor:
+        return [name for name, in cursor]
+
+
+def top_writers(db: Connection, limit: int = TOP_LIMIT) -> List[Tuple[str, int]]:
+    """Returns writers with the largest amount of movies, by "writer" and "writers" of movies"""
+    with closing(db.execute(TOP_PEOPLE, ['writer', limit])) as cursor:
+        return cursor.fetchall()
+
+
+def top_actors(db: Connection, limit: int = TOP_LIMIT) -> List[Tuple[str, int]]:
+    """Returns actors with the largest amount of movies"""
+    with closing(db.execute(TOP_PEOPLE, ['actor', limit])) as cursor:
+        return cursor.fetchall()
+
+
+def search_people(db: Connection, name: str, limit: int = TOP_LIMIT) -> List[Tuple[str, str]]:
+    """Returns directors and actors matching the words of the name as (name, role)"""
+    query = get_match_query(name)
+    if not query:
+        return []
+
+    with closing(db.execute(SEARCH_PEOPLE, [query, limit])) as cursor:
+        return cursor.fetchall()
+
+
+class CatalogAnalytics:
+    """Cached reports of a catalog connection
+
+    Example:
+        analytics = CatalogAnalytics(db)
+        analytics.actors_for_director('Lerdam')
+        analytics.top_writers(1)
+    """
+
+    def __init__(self, db: Connection, cache_size: int = CACHE_SIZE):
+        self.db = db
+        self.cache_size = cache_size
+        self.results = OrderedDict()
+        self.version = None
+        create_indexes(db)
+
+    def _get(self, report: Callable, *args):
+        """Returns a cached result of the report, all results are dropped when the catalog changes"""
+        if get_version(self.db) != self.version:
+            build_temp_tables(self.db)
+            self.results.clear()
+            self.version = get_version(self.db)
+
+        key = report.__name__, args
+
+        if key in self.results:
+            self.results.move_to_end(key)
+            return self.results[key]
+
+        result = self.results[key] = report(self.db, *args)
+        if len(self.results) > self.cache_size:
+            self.results.popitem(last=False)
+        return result
+
+    def actors_for_director(self, director: str) -> List[str]:
+        return self._get(actors_for_director, director)
+
+    def top_writers(self, limit: int = TOP_LIMIT) -> List[Tuple[str, int]]:
+        return self._get(top_writers, limit)
+
+    def top_actors(self, limit: int = TOP_LIMIT) -> List[Tuple[str, int]]:
+        return self._get(top_actors, limit)
+
+    def search_people(self, name: str, limit: int = TOP_LIMIT) -> List[Tuple[str, str]]:
+        return self._get(search_people, name, limit)
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Reports over the SQLite movies catalog')
+    parser.add_argument('report', choices=('director', 'writers', 'actors', 'people'))
+    parser.add_argument('name', nargs='?', default='', help='words of a director or a person name')
+    parser.add_argument('-l', '--limit', type=int, default=TOP_LIMIT)
+    parser.add_argument('--db', default=DB_ADDRESS, help='SQLite catalog')
+    args = parser.parse_args()
+
+    with closing(connect(args.db)) as conn:
+        analytics = CatalogAnalytics(conn)
+        reports = {
+            'director': lambda: analytics.actors_for_director(args.name),
+            'writers': lambda: analytics.top_writers(args.limit),
+            'actors': lambda: analytics.top_actors(args.limit),
+            'people': lambda: analytics.search_people(args.name, args.limit),
+        }
+
+        for row in reports[args.report]():
+            if isinstance(row, tuple):
+                print(*row, sep='\t')
+            else:
+                print(row)
@@ -0,0 +1,268 @@
+"""
+Batched extraction and transformation of movies for ElasticSearch
+
+A chunk of movies is extracted by three queries (movies, actors, writers)
+and normalized at once, without per-movie queries or JSON round trips.
+Names of actors and writers are shared by many movies, so they are cached
+for a run by NameLookup and ActorsLookup.
+"""
+from collections import defaultdict
+from contextlib import closing
+from itertools import islice
+import json
+import re
+from sqlite3 import Connection
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from practice.sprint_1.etl.catalog import iter_rows
+from srv_etl.cache import DimensionCache
+
+
+BATCH_SIZE = 500
+NOT_AVAILABLE = 'N/A'
+SEPARATOR = ', '
+RATING_PATTERN = re.compile(r'\d+\.\d+')
+# sqlite3 exports the limit category since Python 3.11
+SQLITE_LIMIT_VARIABLE_NUMBER = 9
+# SQLITE_MAX_VARIABLE_NUMBER of SQLite before 3.32
+DEFAULT_VARIABLES_LIMIT = 999
+# a title is suggested when typing any of its first words
+SUGGEST_WORDS = 5
+# names of all actors and writers of the catalog take about 0.4 MiB
+CACHE_MAX_SIZE = 16 * 2 ** 20
+
+# movies, actors by movie id, names of writers by id
+RawBatch = Tuple[List[dict], Dict[str, List[dict]], Dict[str, str]]
+
+
+def chunked(iterable: Iterable, size: int = BATCH_SIZE) -> Iterator[list]:
+    """Splits an iterable into lists of the size"""
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+# Extract
+def select_in(db: Connection, query: str, ids: Sequence, chunk_size: int = BATCH_SIZE) -> Iterator[tuple]:
+    """Executes a query with "{ids}" placeholder for a parameterized IN-list
+
+    :param db: database connection instance
+    :param query: SQL with "IN ({ids})"
+    :param ids: values of the IN-list, split into chunks
+    :param chunk_size: max amount of parameters per query
+    """
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        placeholders = ', '.join('?' * len(chunk))
+        with closing(db.execute(query.format(ids=placeholders), chunk)) as cursor:
+            yield from cursor
+
+
+def extract_movies(db: Connection, movies_ids: Sequence[str]) -> List[dict]:
+    """Extracts raw movies rows"""
+    query = """\
+        SELECT id, imdb_rating, genre, title, plot, director, writer, writers
+            FROM movies
+            WHERE id IN ({ids});
+        """
+    keys = 'id', 'imdb_rating', 'genre', 'title', 'description', 'director', 'writer', 'writers'
+    return [dict(zip(keys, row)) for row in select_in(db, query, movies_ids)]
+
+
+def get_variables_limit(db: Connection) -> int:
+    """Returns the max amount of parameters of a query"""
+    # Connection.getlimit is available since Python 3.11
+    getlimit = getattr(db, 'getlimit', None)
+    return getlimit(SQLITE_LIMIT_VARIABLE_NUMBER) if getlimit else DEFAULT_VARIABLES_LIMIT
+
+
+class NameLookup:
+    """Names of writers by id, cached for a run
+
+    A full load preloads the whole table by one query at the start, then names
+    of any batch are dictionary lookups. Ids missing in the cache are selected
+    by parameterized IN-lists chunked within the variable limit of SQLite, so
+    any amount of ids of many movies takes a few queries, and every id is
+    selected once per run. The cache is bounded by size and counts hits.
+
+    Example:
+        writers = NameLookup(db)
+        writers.preload()
+        writers.get(['6e8d1d6b', '9b5d0fb4'])
+    """
+    name = 'writers'
+    query = 'SELECT id, name FROM writers WHERE id IN ({ids});'
+    preload_query = 'SELECT id, name FROM writers;'
+
+    def __init__(self, db: Connection, query: str = None, chunk_size: int = None, max_size: int = CACHE_MAX_SIZE):
+        self.db = db
+        self.query = query or self.query
+        self.chunk_size = chunk_size or get_variables_limit(db)
+        self.cache = DimensionCache(self.name, self._select, max_size)
+
+    @staticmethod
+    def _clean(rows: Iterable[tuple]) -> Iterator[tuple]:
+        # None for "N/A" names
+        return ((person_id, name if name != NOT_AVAILABLE else None) for person_id, name in rows)
+
+    def _select(self, ids: List) -> Iterator[tuple]:
+        return self._clean(select_in(self.db, self.query, ids, self.chunk_size))
+
+    def preload(self) -> int:
+        """Caches names of the whole table by one query, returns amount of cached names"""
+        return self.cache.preload(self._clean(iter_rows(self.db.execute(self.preload_query))))
+
+    def prefetch(self, ids: Iterable):
+        """Selects names of ids which are not cached yet"""
+        self.cache.get_many(ids)
+
+    def get(self, ids: Iterable) -> Dict[Any, Optional[str]]:
+        """Returns names by id of the ids found in the database"""
+        return self.cache.get_many(ids)
+
+
+class ActorsLookup(NameLookup):
+    """Names of actors by integer id, cached for a run"""
+    name = 'actors'
+    query = 'SELECT id, name FROM actors WHERE id IN ({ids});'
+    preload_query = 'SELECT id, name FROM actors;'
+
+
+def extract_actors(db: Connection, movies_ids: Sequence[str], lookup: ActorsLookup = None) -> Dict[str, List[dict]]:
+    """Extracts actors of movies ordered by id
+
+    Only links are selected, names come from the lookup.
+    :param db: database connection instance
+    :param movies_ids: ids of movies
+    :param lookup: names of actors cached during the run
+    """
+    # actor_id is TEXT in movie_actors, ids of actors are integers
+    query = """\
+        SELECT movie_id, CAST(actor_id AS INTEGER) AS actor_id
+            FROM movie_actors
+            WHERE movie_id IN ({ids})
+            ORDER BY movie_id, actor_id;
+        """
+    links = list(select_in(db, query, movies_ids))
+    names = (lookup or ActorsLookup(db)).get(actor_id for _, actor_id in links)
+    actors = defaultdict(list)
+
+    for movie_id, actor_id in links:
+        if actor_id in names:
+            actors[movie_id].append({'id': actor_id, 'name': names[actor_id]})
+
+    return actors
+
+
+def extract_writers(db: Connection, writers_ids: Sequence[str], lookup: NameLookup = None) -> Dict[str, str]:
+    """Extracts names of writers by id
+
+    :param db: database connection instance
+    :param writers_ids: ids of writers
+    :param lookup: names cached during the run
+    """
+    return (lookup or NameLookup(db)).get(writers_ids)
+
+
+def get_writers_ids(movie: dict) -> List[str]:
+    """Returns writers ids from "writer" id or "writers" JSON list of the raw movie"""
+    if movie.get('writer'):
+        return [movie['writer']]
+
+    return [str(writer.get('id', '')) for writer in json.loads(movie.get('writers') or '[]')]
+
+
+def extract_raw(db: Connection, movies_ids: Sequence[str], writers: NameLookup = None,
+                actors: ActorsLookup = None) -> RawBatch:
+    """Extracts a chunk of raw movies with their actors and writers by three queries
+
+    :param db: database connection instance
+    :param movies_ids: ids of movies
+    :param writers: names of writers cached during the run, so known ones are not selected again
+    :param actors: names of actors cached during the run
+    """
+    movies = extract_movies(db, movies_ids)
+
+    for movie in movies:
+        movie['writers'] = get_writers_ids(movie)
+
+    writers_ids = sorted({writer_id for movie in movies for writer_id in movie['writers']})
+    return movies, extract_actors(db, movies_ids, actors), extract_writers(db, writers_ids, writers)
+
+
+def extract_batch(db: Connection, movies_ids: Sequence[str]) -> List[dict]:
+    """Extracts and transforms a chunk of movies by three queries"""
+    return transform_batch(*extract_raw(db, movies_ids))
+
+
+# Transform
+def parse_rating(value) -> float:
+    """Returns a float rating, 0.0 if not available
+
+    Unlike the former regex-only parsing, integer ratings like "7" are kept (7.0, not 0.0).
+    """
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        match = RATING_PATTERN.search(str(value))
+        return float(match.group()) if match else 0.0
+
+
+def split_values(value: str) -> List[str]:
+    """Returns a list of clean values from a comma separated string"""
+    if not value or value == NOT_AVAILABLE:
+        return []
+
+    return value.split(SEPARATOR)
+
+
+def get_names(persons: Iterable[dict]) -> str:
+    """Joins names of actors / writers"""
+    return SEPARATOR.join(person['name'] or '' for person in persons)
+
+
+def get_suggest(title: str, rating: float) -> dict:
+    """Returns inputs of the completion field weighted by rating
+
+    The completion suggester matches prefixes only, so a title is indexed
+    from each of its first words: "Star Wars" is suggested for "war" too.
+    """
+    words = (title or '').split()
+    inputs = [' '.join(words[i:]) for i in range(min(len(words), SUGGEST_WORDS))]
+    return {'input': inputs, 'weight': int(rating * 10)}
+
+
+def transform_batch(movies: Iterable[dict], actors: Dict[str, List[dict]], writers: Dict[str, str]) -> List[dict]:
+    """Converts a chunk of movies to be uploaded to ElasticSearch server
+
+    :param movies: raw movies with writers ids in "writers"
+    :param actors: actors of every movie ordered by id
+    :param writers: names of writers by id
+    :return: documents ordered as movies
+    """
+    documents = []
+
+    for movie in movies:
+        movie_actors = actors.get(movie['id'], [])
+        movie_writers = [
+            {'id': writer_id, 'name': writers[writer_id]}
+            for writer_id in sorted(set(movie['writers'])) if writer_id in writers
+        ]
+        description = movie['description']
+        rating = parse_rating(movie['imdb_rating'])
+
+        documents.append({
+            'id': movie['id'],
+            'imdb_rating': rating,
+            'genre': split_values(movie['genre']),
+            'title': movie['title'],
+            'description': description if description != NOT_AVAILABLE else None,
+            'director': split_values(movie['director']) or None,
+            'actors': movie_actors,
+            'actors_names': get_names(movie_actors),
+            'writers': movie_writers,
+            'writers_names': get_names(movie_writers),
+            'suggest': get_suggest(movie['title'], rating),
+        })
+
+    return documents
@@ -0,0 +1,34 @@
+"""
+Compares per-movie and batched extraction of db.sqlite
+
+Run:
+    python -m practice.sprint_1.etl.bench_batch
+"""
+from contextlib import closing
+from os.path import join
+from timeit import repeat
+
+from common import ETL_DIR
+from practice.sprint_1.etl.batch import BATCH_SIZE, chunked, extract_batch
+from practice.sprint_1.etl.catalog import connect_readonly
+
+
+DB_ADDRESS = join(ETL_DIR, 'db.sqlite')
+
+
+def main(rounds: int = 5):
+    with closing(connect_readonly(DB_ADDRESS, immutable=True)) as db:
+        ids = [r[0] for r in db.execute('SELECT id FROM movies')]
+
+        per_movie = min(repeat(lambda: [extract_batch(db, [i]) for i in ids], number=1, repeat=rounds))
+        batched = min(repeat(
+            lambda: [extract_batch(db, chunk) for chunk in chunked(ids, BATCH_SIZE)], number=1, repeat=rounds
+        ))
+
+    print(f'{len(ids)} movies')
+    print(f'per movie: {per_movie * 1000:8.1f} ms')
+    print(f'batched:   {batched * 1000:8.1f} ms ({per_movie / batched:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Read-only connections to the SQLite movies catalog for extraction
+
+The catalog is opened by a "mode=ro" URI, so extractors can't change it and any
+amount of processes may read it at once. Pages are read through mmap instead of
+read() calls, the page cache and the prepared statements cache are larger than
+the defaults. An immutable catalog skips locking and change detection at all,
+it is safe only while nobody writes the file.
+
+Example:
+    with closing(connect_readonly(DB_ADDRESS, immutable=True)) as db:
+        for movie_id, in iter_rows(db.execute('SELECT id FROM movies')):
+            ...
+"""
+from contextlib import closing
+from os.path import join
+from pathlib import Path
+from sqlite3 import Connection, Cursor, connect
+from typing import Iterator
+
+from common import ETL_DIR
+
+
+DB_ADDRESS = join(ETL_DIR, 'db.sqlite')
+MMAP_SIZE = 256 * 2 ** 20
+# negative values are KiB instead of pages
+CACHE_SIZE = -64 * 2 ** 10
+CACHED_STATEMENTS = 256
+FETCH_SIZE = 500
+
+
+def get_readonly_uri(path: str, immutable: bool = False) -> str:
+    """Returns a URI opening the database file read-only"""
+    uri = f'{Path(path).resolve().as_uri()}?mode=ro'
+    return f'{uri}&immutable=1' if immutable else uri
+
+
+def connect_readonly(path: str = DB_ADDRESS, immutable: bool = False, mmap_size: int = MMAP_SIZE,
+                     cache_size: int = CACHE_SIZE, cached_statements: int = CACHED_STATEMENTS) -> Connection:
+    """Opens the catalog for extraction
+
+    :param path: SQLite database file
+    :param immutable: the file is not changed while the connection is open
+    :param mmap_size: max bytes of the file to map into memory
+    :param cache_size: page cache size, pages or KiB if negative
+    :param cached_statements: amount of prepared statements to keep
+    :return: a read-only connection
+    """
+    db = connect(get_readonly_uri(path, immutable), uri=True, cached_statements=cached_statements)
+    db.execute(f'PRAGMA mmap_size = {int(mmap_size)}')
+    db.execute(f'PRAGMA cache_size = {int(cache_size)}')
+    # sorting and temp tables of queries stay in memory
+    db.execute('PRAGMA temp_store = MEMORY')
+    return db
+
+
+def iter_rows(cursor: Cursor, size: int = FETCH_SIZE) -> Iterator[tuple]:
+    """Yields rows of the cursor fetched by chunks and closes it"""
+    with closing(cursor):
+        while rows := cursor.fetchmany(size):
+            yield from rows
@@ -0,0 +1,123 @@
+"""
+Change data capture for the SQLite movies catalog
+
+Every movie gets a compact fingerprint of its content including actors and writers.
+Fingerprints of the last successful load are kept in the ETL state, so a sync
+only touches new, changed and deleted movies.
+"""
+from contextlib import closing
+from dataclasses import dataclass, field
+from hashlib import blake2b
+from os.path import join
+from sqlite3 import Connection
+from typing import Dict, Iterable, List
+
+from common import ETL_DIR
+from srv_etl.state.state import State
+from srv_etl.state.storages import JsonFileStorage
+
+
+STATE_FILE = join(ETL_DIR, 'state.json')
+STATE_KEY = 'movies_fingerprints'
+
+FINGERPRINT_QUERY = """\
+    WITH actors_fp AS (
+        SELECT movie_id, group_concat(actor, '|') AS actors
+            FROM (
+                SELECT ma.movie_id, a.id || ':' || a.name AS actor
+                    FROM movie_actors ma
+                    JOIN actors a ON a.id = ma.actor_id
+                    ORDER BY ma.movie_id, a.id
+            )
+            GROUP BY movie_id
+    ),
+    movie_writers AS (
+        SELECT id AS movie_id, writer AS writer_id FROM movies WHERE writer != ''
+        UNION
+        SELECT m.id, json_extract(j.value, '$.id') FROM movies m, json_each(nullif(m.writers, '')) j
+    ),
+    writers_fp AS (
+        SELECT movie_id, group_concat(writer, '|') AS writers
+            FROM (
+                SELECT mw.movie_id, w.id || ':' || w.name AS writer
+                    FROM movie_writers mw
+                    JOIN writers w ON w.id = mw.writer_id
+                    ORDER BY mw.movie_id, w.id
+            )
+            GROUP BY movie_id
+    )
+    SELECT m.id, m.title, m.plot, m.imdb_rating, m.genre, m.director, af.actors, wf.writers
+        FROM movies m
+        LEFT JOIN actors_fp af ON af.movie_id = m.id
+        LEFT JOIN writers_fp wf ON wf.movie_id = m.id;
+    """
+
+
+def get_state(file: str = STATE_FILE) -> State:
+    """Returns the ETL state kept in a JSON file"""
+    return State(JsonFileStorage(file))
+
+
+@dataclass
+class Changes:
+    """Movies to reload and to delete since the last sync"""
+    upserted: List[str] = field(default_factory=list)
+    deleted: List[str] = field(default_factory=list)
+    fingerprints: Dict[str, str] = field(default_factory=dict, repr=False)
+
+    def __bool__(self):
+        return bool(self.upserted or self.deleted)
+
+
+class ChangeDetector:
+    """Compares fingerprints of movies with ones saved in the ETL state
+
+    Example:
+        detector = ChangeDetector(db, get_state())
+        changes = detector.detect()
+        errors = load(changes.upserted, changes.deleted)
+        detector.commit(changes, failed_ids=errors)
+    """
+
+    def __init__(self, db: Connection, state: State, key: str = STATE_KEY):
+        self.db = db
+        self.state = state
+        self.key = key
+
+    @staticmethod
+    def fingerprint(row: Iterable) -> str:
+        """Returns a short hash of the movie content"""
+        content = '\x1f'.join(map(str, row)).encode()
+        return blake2b(content, digest_size=8).hexdigest()
+
+    def get_fingerprints(self) -> Dict[str, str]:
+        """Computes fingerprints of all movies by one query"""
+        with closing(self.db.execute(FINGERPRINT_QUERY)) as cursor:
+            return {row[0]: self.fingerprint(row[1:]) for row in cursor}
+
+    def detect(self) -> Changes:
+        """Returns new, changed and deleted movies"""
+        previous = self.state.get_state(self.key) or {}
+        current = self.get_fingerprints()
+
+        return Changes(
+            upserted=[movie_id for movie_id, fp in current.items() if previous.get(movie_id) != fp],
+            deleted=[movie_id for movie_id in previous if movie_id not in current],
+            fingerprints=current,
+        )
+
+    def commit(self, changes: Changes, failed_ids: Iterable[str] = ()):
+        """Saves fingerprints after a load, failed movies are retried next time
+        :param changes: detected changes
+        :param failed_ids: ids of movies which were not loaded or deleted
+        """
+        fingerprints = dict(changes.fingerprints)
+        previous = self.state.get_state(self.key) or {}
+
+        for movie_id in failed_ids:
+            if movie_id in previous:
+                fingerprints[movie_id] = previous[movie_id]
+            else:
+                fingerprints.pop(movie_id, None)
+
+        self.state.set_state(self.key, fingerprints)
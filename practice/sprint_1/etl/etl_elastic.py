@@ -1,205 +1,488 @@
-from json import loads as json_loads
+from argparse import ArgumentParser
+from datetime import datetime
+from json import dumps as json_dumps, loads as json_loads
+from math import ceil
+from contextlib import closing
+from multiprocessing import Pool, cpu_count
 from os.path import join
-from re import search as re_search
-from sqlite3 import connect, Connection
-from typing import List
+from sqlite3 import Connection
+from typing import List, Optional, Tuple
 
-from elasticsearch import Elasticsearch
-from elasticsearch.helpers import bulk
+from elasticsearch import Elasticsearch, TransportError
 
 from common import ES_HOSTS, ETL_DIR
+from practice.sprint_1.etl.batch import BATCH_SIZE, ActorsLookup, NameLookup, chunked, extract_raw, transform_batch
+from practice.sprint_1.etl.catalog import connect_readonly, iter_rows
+from practice.sprint_1.etl.changes import STATE_FILE, ChangeDetector, get_state
+from practice.sprint_1.etl.metrics import BatchMetrics, ETLMetrics
+from practice.sprint_1.etl.retry import DeadLetterQueue, get_item_id, retry_failed
+from srv_etl.cache import CacheStats
+from srv_etl.state.state import State
 
 
+INDEX = 'movies'
 CR_INDEX_SCR = join(ETL_DIR, 'create_index.json')
 DB_ADDRESS = join(ETL_DIR, 'db.sqlite')
 
+# a new index version is loaded without refreshes and replicas
+BULK_SETTINGS = {'refresh_interval': '-1', 'number_of_replicas': 0}
+MERGE_TIMEOUT = 600
+SHARDS_PER_WORKER = 4
+BULK_SIZE = BATCH_SIZE
+BULK_FILTER = 'took,items.*._id,items.*.status,items.*.error'
+# the loaded index and the last uploaded movie id, kept by the alias as a versioned index is named on every run
+CHECKPOINT_KEY = f'{INDEX}_load'
+
 
 # Extract
-def get_movies_ids(db: Connection) -> str:
-    """Extracts ids of all movies from DB
+def get_id_ranges(db: Connection, shards: int) -> List[Tuple[int, int]]:
+    """Splits movies rowids into ranges of equal length
+
+    :param db: database connection instance
+    :param shards: amount of ranges
+    :return: the first and the last rowid of every range
+    """
+
+    low, high = db.execute('SELECT min(rowid), max(rowid) FROM movies').fetchone()
+
+    if low is None:
+        return []
+
+    step = ceil((high - low + 1) / shards)
+    return [(start, min(start + step - 1, high)) for start in range(low, high + 1, step)]
+
+
+def get_movies_ids(db: Connection, id_range: Tuple[int, int] = None, after: str = None) -> str:
+    """Extracts ids of all movies from DB ordered by id
 
     :param db: database connection instance
+    :param id_range: the first and the last rowid of movies to extract
+    :param after: the last id loaded before, to resume a load
     :return: ids of movies
     """
 
-    cursor = db.execute('SELECT id FROM movies')
+    conditions, params = [], []
+
+    if id_range:
+        conditions.append('rowid BETWEEN ? AND ?')
+        params.extend(id_range)
 
-    while record := cursor.fetchone():
-        yield record[0]
+    if after:
+        conditions.append('id > ?')
+        params.append(after)
 
-    cursor.close()
+    where = f' WHERE {" AND ".join(conditions)}' if conditions else ''
+    for movie_id, in iter_rows(db.execute(f'SELECT id FROM movies{where} ORDER BY id', params)):
+        yield movie_id
 
 
-def get_movie_data(db: Connection, movie_id: str) -> dict:
-    """Extracts all information about the movie from DB
+def get_documents(db: Connection, movies_ids: List[str], metrics: BatchMetrics = None,
+                  writers: NameLookup = None, actors: ActorsLookup = None) -> List[dict]:
+    """Extracts and converts a chunk of movies to be uploaded to ElasticSearch server
 
     :param db: database connection instance
-    :param movie_id: movie id from DB
-    :return: dict with the movie info
+    :param movies_ids: movies ids from DB
+    :param metrics: batch to record extract and transform timings
+    :param writers: names of writers cached during the run
+    :param actors: names of actors cached during the run
+    :return: prepared movies data
     """
 
-    query = """\
-    SELECT 
-       m.imdb_rating, 
-       m.genre, 
-       m.title, 
-       m.plot as description, 
-       m.director, 
-       group_concat(a.name, ', ') as actors_names,
-       null as writers_names,
-       '[' || group_concat(
-           json_object('id', a.id, 'name', a.name)
-       ) || ']' as actors,
-       m.writers
-    FROM movies m
-    JOIN movie_actors ma ON m.id = ma.movie_id
-    JOIN actors a        ON a.id = ma.actor_id
-    WHERE m.id = ?
-    GROUP BY m.id;
+    metrics = metrics or BatchMetrics()
+
+    with metrics.stage('extract'):
+        raw = extract_raw(db, movies_ids, writers, actors)
+
+    with metrics.stage('transform'):
+        documents = transform_batch(*raw)
+
+        for document in documents:
+            document['_id'] = document['id']
+
+    metrics.docs += len(documents)
+    return documents
+
+
+# Load
+def get_index_body() -> dict:
+    """Returns settings and mappings of the movie index"""
+
+    with open(CR_INDEX_SCR, 'r') as file:
+        return json_loads(file.read())
+
+
+def create_index(es_client: Elasticsearch):
+    """Creates the movie index in ElasticSearch server"""
+    return es_client.indices.create(INDEX, get_index_body(), ignore=400)
+
+
+def update_mapping(es_client: Elasticsearch):
+    """Adds fields new in the mapping, e.g. "suggest", to the existing movie index
+
+    The mapping is strict, so documents with fields missing in it are rejected.
+    Changes of existing fields can't be applied in place and need --reindex.
     """
+    es_client.indices.put_mapping(body=get_index_body()['mappings'], index=INDEX)
 
-    cursor = db.execute(query, [movie_id])
-    rating, genre, title, plot, director, \
-        actors_names, writers_names, actors, writers = cursor.fetchone()
-    cursor.close()
-
-    raw_data = {
-        "_id": movie_id,
-        "id": movie_id,
-        "imdb_rating": rating,
-        "genre": genre,
-        "title": title,
-        "description": plot,
-        "director": director,
-        "actors_names": actors_names,
-        "writers_names": writers_names,
-        "actors": actors,
-        "writers": writers
-    }
 
-    return raw_data
+def create_versioned_index(es_client: Elasticsearch) -> str:
+    """Creates a new version of the movie index tuned for bulk loading
 
+    :param es_client: ElasticSearch client instance
+    :return: name of the new index
+    """
 
-def get_writers(db: Connection, movie_data: dict) -> List[dict]:
-    """Extracts the movie writers from DB
+    body = get_index_body()
+    body['settings'].update(BULK_SETTINGS)
+    index_name = f'{INDEX}_{datetime.utcnow():%Y%m%d%H%M%S}'
+    es_client.indices.create(index_name, body)
+    return index_name
 
-    :param db: database connection instance
-    :param movie_data: data from db
-    :return: data with writers ids and names
+
+def swap_alias(es_client: Elasticsearch, index_name: str):
+    """Prepares the loaded index for search and atomically points the movie alias to it
+
+    :param es_client: ElasticSearch client instance
+    :param index_name: a loaded version of the index
     """
 
-    writers_data = movie_data.get('writers') or '[]'
-    writers_ids = map(
-        lambda w: str(w.get('id', '')),
-        json_loads(writers_data)
-    )
-    ids_str = "', '".join(writers_ids)
-    writers = []
+    settings = get_index_body()['settings']
+    live_settings = {
+        'refresh_interval': settings.get('refresh_interval', '1s'),
+        'number_of_replicas': settings.get('number_of_replicas', 1),
+    }
+
+    es_client.indices.forcemerge(index_name, max_num_segments=1, request_timeout=MERGE_TIMEOUT)
+    es_client.indices.put_settings({'index': live_settings}, index_name)
+    es_client.indices.refresh(index_name)
+    es_client.cluster.health(index=index_name, wait_for_status='yellow')
 
-    if ids_str:
-        query = f"SELECT * FROM writers WHERE id IN ('{ids_str}') ORDER BY id ASC"
-        cursor = db.execute(query)
-        writers = [
-            {'id': record[0], 'name': record[1]} for record in cursor.fetchall()
-        ]
-        cursor.close()
+    actions = [{'add': {'index': index_name, 'alias': INDEX}}]
+    old_indices = []
 
-    return writers
+    if es_client.indices.exists_alias(name=INDEX):
+        old_indices = [name for name in es_client.indices.get_alias(name=INDEX) if name != index_name]
+        actions.extend({'remove': {'index': name, 'alias': INDEX}} for name in old_indices)
+    elif es_client.indices.exists(INDEX):
+        # the index was created in place before aliases were used
+        actions.append({'remove_index': {'index': INDEX}})
 
+    es_client.indices.update_aliases({'actions': actions})
 
-def get_names(data: List[dict]) -> str:
-    """Extracts names from actors / writers data"""
-    name_iter = map(lambda r: r.get('name', ''), data)
-    return ', '.join(name_iter)
+    for name in old_indices:
+        es_client.indices.delete(name)
 
 
-def get_list_from_str(value: str) -> list:
-    """Returns a list of clean values from str"""
-    if value == 'N/A':
-        return []
+def is_failed(item: dict) -> bool:
+    """Checks a bulk response item, a deleted movie could be absent in the index"""
+    (op_type, result), = item.items()
+    return not (op_type == 'delete' and result.get('status') == 404)
 
-    return value.split(', ')
 
+def get_bulk(actions: List[dict]) -> str:
+    """Serializes documents and delete actions with "_id" to a bulk request body"""
 
-# Transform
-def convert_movie_data(db: Connection, data: dict) -> dict:
-    """Converts the movie data to be uploaded to ElasticSearch server
+    lines = []
 
-    :param db: database connection instance
-    :param data: the movie data
-    :return: prepared movie data
+    for action in actions:
+        source = dict(action)
+        op_type = source.pop('_op_type', 'index')
+        lines.append(json_dumps({op_type: {'_id': source.pop('_id')}}))
+
+        if op_type != 'delete':
+            lines.append(json_dumps(source))
+
+    return '\n'.join(lines) + '\n'
+
+
+def send_bulk(es_client: Elasticsearch, actions: List[dict], index: str, metrics: BatchMetrics = None) -> list:
+    """Sends a bulk request, a rejected or failed request fails all its items
+
+    :param es_client: ElasticSearch client instance
+    :param actions: documents or delete actions with "_id"
+    :param index: name of index to load data into
+    :param metrics: batch to record serialize and upload timings
+    :return: items with errors
     """
 
-    tmp = re_search(r'\d+.\d+', str(data.get('imdb_rating')))
-    rating = float(tmp.group()) if tmp else 0.0
+    metrics = metrics or BatchMetrics()
 
-    actors = json_loads(data.get('actors') or '[]').sort(key=lambda w: w['id'])
-    actors_names = data.get('actors_names') if data.get('actors_names') != 'N/A' else ''
-    director = get_list_from_str(data.get('director', ''))
-    genre = get_list_from_str(data.get('genre', ''))
-    writers = get_writers(db, data)
-    writers_names = get_names(writers)
+    with metrics.stage('serialize'):
+        body = get_bulk(actions).encode()
 
-    data.update({
-        'imdb_rating': rating,
-        'actors': actors,
-        'actors_names': actors_names,
-        'director': director,
-        'genre': genre,
-        'writers': writers,
-        'writers_names': writers_names,
-    })
-    return data
+    with metrics.stage('upload'):
+        try:
+            response = es_client.bulk(body, index=index, filter_path=BULK_FILTER)
+        except TransportError as e:
+            metrics.add_request(len(body))
+            return [
+                {action.get('_op_type', 'index'): {'_id': action['_id'], 'status': e.status_code, 'error': str(e)}}
+                for action in actions
+            ]
 
+    metrics.add_request(len(body), response.get('took', 0))
+    items = response.get('items', [])
+    return [item for item in items if 'error' in next(iter(item.values())) and is_failed(item)]
 
-# Load
-def create_index(es_client: Elasticsearch):
-    """Creates the movie index in ElasticSearch server"""
 
-    with open(CR_INDEX_SCR, 'r') as file:
-        body = json_loads(file.read())
+def bulk_with_retries(es_client: Elasticsearch, actions: List[dict], index: str,
+                      dead_letters: DeadLetterQueue = None, metrics: BatchMetrics = None) -> list:
+    """Uploads actions retrying transient failures, the rest go to the dead letter queue
+
+    :param es_client: ElasticSearch client instance
+    :param actions: documents or delete actions with "_id"
+    :param index: name of index to load data into
+    :param dead_letters: queue for actions failed permanently
+    :param metrics: batch to record serialize and upload timings
+    :return: items with errors
+    """
+
+    def send(pending: List[dict]) -> list:
+        return send_bulk(es_client, pending, index, metrics)
+
+    dead_letters = DeadLetterQueue() if dead_letters is None else dead_letters
+    return retry_failed(send, {action['_id']: action for action in actions}, index, dead_letters)
+
 
-    return es_client.indices.create('movies', body, ignore=400)
+def get_checkpoint(state: State, index: str) -> Optional[str]:
+    """Returns the last uploaded movie id of an interrupted load into the index"""
 
+    checkpoint = state.get_state(CHECKPOINT_KEY) if state else None
 
-def upload_movies_to_es(es_client: Elasticsearch) -> list:
+    if checkpoint and checkpoint['index'] == index:
+        return checkpoint['last_movie_id']
+    return None
+
+
+def get_unfinished_index(es_client: Elasticsearch, state: State) -> Optional[str]:
+    """Returns a new index version left by an interrupted reindex, if it still exists"""
+
+    checkpoint = state.get_state(CHECKPOINT_KEY) if state else None
+
+    if checkpoint and checkpoint['index'] != INDEX and es_client.indices.exists(checkpoint['index']):
+        return checkpoint['index']
+    return None
+
+
+def upload_movies_to_es(es_client: Elasticsearch, index: str = INDEX, id_range: Tuple[int, int] = None,
+                        state: State = None, metrics: ETLMetrics = None, immutable: bool = False,
+                        resume: bool = False) -> list:
     """Uploads movies data from the database to an ElasticSearch server
 
     :param es_client: ElasticSearch client instance
+    :param index: name of index to load data into
+    :param id_range: the first and the last rowid of movies to upload, all if not set
+    :param state: ETL state to keep the last uploaded chunk in
+    :param metrics: metrics of the run to add batches to
+    :param immutable: the database is not changed during the load, so it is read without locks
+    :param resume: continue an interrupted load into the index after its last uploaded chunk
+    :return: items with errors
+    """
+
+    metrics = metrics or ETLMetrics()
+    with_errors = []
+    last_id = get_checkpoint(state, index) if resume else None
+
+    if state:
+        state.set_state(CHECKPOINT_KEY, {'index': index, 'last_movie_id': last_id})
+
+    with closing(connect_readonly(DB_ADDRESS, immutable)) as db:
+        movies_ids = get_movies_ids(db, id_range, after=last_id)
+        # names are shared by movies of all chunks, so they are selected once at the start
+        writers, actors = NameLookup(db), ActorsLookup(db)
+
+        for lookup in writers, actors:
+            lookup.preload()
+            metrics.track(lookup.cache.stats)
+
+        for chunk in chunked(movies_ids, BULK_SIZE):
+            batch = metrics.batch()
+            documents = get_documents(db, chunk, batch, writers, actors)
+            with_errors.extend(bulk_with_retries(es_client, documents, index, metrics=batch))
+
+            if state:
+                state.set_state(CHECKPOINT_KEY, {'index': index, 'last_movie_id': chunk[-1]})
+
+    if state:
+        state.set_state(CHECKPOINT_KEY, None)
+
+    return with_errors
+
+
+def sync_movies_to_es(es_client: Elasticsearch, index: str = INDEX, state_file: str = STATE_FILE,
+                      metrics: ETLMetrics = None) -> list:
+    """Uploads new and changed movies and deletes removed ones since the last sync
+
+    :param es_client: ElasticSearch client instance
+    :param index: name of index to load data into
+    :param state_file: ETL state with fingerprints of loaded movies
+    :param metrics: metrics of the run to add batches to
     :return: items with errors
     """
 
-    cache, with_errors = [], []
+    metrics = metrics or ETLMetrics()
+    failed = []
+
+    with closing(connect_readonly(DB_ADDRESS)) as db:
+        detector = ChangeDetector(db, get_state(state_file))
+        changes = detector.detect()
+
+        # only names of changed movies are selected, caches are not preloaded
+        writers, actors = NameLookup(db), ActorsLookup(db)
+        metrics.track(writers.cache.stats, actors.cache.stats)
+
+        # a large diff is sent by chunks as a full load, so requests and memory stay bounded
+        for chunk in chunked(changes.upserted, BULK_SIZE):
+            batch = metrics.batch()
+            documents = get_documents(db, chunk, batch, writers, actors)
+            failed.extend(bulk_with_retries(es_client, documents, index, metrics=batch))
+
+        for chunk in chunked(changes.deleted, BULK_SIZE):
+            actions = [{'_op_type': 'delete', '_id': movie_id} for movie_id in chunk]
+            failed.extend(bulk_with_retries(es_client, actions, index, metrics=metrics.batch()))
+
+        detector.commit(changes, map(get_item_id, failed))
+
+    return failed
+
+
+def upload_shard(task: Tuple[str, Tuple[int, int], bool]) -> Tuple[list, List[BatchMetrics], List[CacheStats]]:
+    """Uploads a range of movies in a worker process with its own connections
+
+    :param task: name of index, the range of movies rowids and whether the database is immutable
+    :return: items with errors, metrics of batches and counters of caches
+    """
+    index, id_range, immutable = task
+    es_client = Elasticsearch(ES_HOSTS)
+    metrics = ETLMetrics()
+    failed = upload_movies_to_es(es_client, index, id_range, metrics=metrics, immutable=immutable)
+    return failed, metrics.batches, metrics.caches
+
+
+def upload_movies_parallel(index: str = INDEX, workers: int = None, metrics: ETLMetrics = None,
+                           immutable: bool = False) -> list:
+    """Uploads movies by ranges of ids in a pool of processes
+
+    :param index: name of index to load data into
+    :param workers: amount of processes, CPU count by default
+    :param metrics: metrics of the run to add batches of workers to
+    :param immutable: the database is not changed during the load, so it is read without locks
+    :return: items with errors of all workers
+    """
+
+    metrics = metrics or ETLMetrics()
+
+    workers = workers or cpu_count()
+
+    with closing(connect_readonly(DB_ADDRESS, immutable)) as db:
+        # more shards than workers to even out ranges with heavy movies
+        id_ranges = get_id_ranges(db, workers * SHARDS_PER_WORKER)
 
-    with connect(DB_ADDRESS) as db:
-        movies_ids = get_movies_ids(db)
+    with_errors = []
+    tasks = [(index, id_range, immutable) for id_range in id_ranges]
 
-        for movie_id in movies_ids:
-            data = get_movie_data(db, movie_id)
-            es_data = convert_movie_data(db, data)
-            cache.append(es_data)
+    with Pool(workers) as pool:
+        for failed, batches, caches in pool.imap_unordered(upload_shard, tasks):
+            with_errors.extend(failed)
+            metrics.extend(batches, caches)
+
+    return with_errors
+
+
+def replay_dead_letters(es_client: Elasticsearch, dead_letters: DeadLetterQueue = None) -> list:
+    """Uploads actions from the dead letter queue again, failed ones are put back
+
+    :param es_client: ElasticSearch client instance
+    :param dead_letters: queue of actions failed permanently
+    :return: items with errors
+    """
 
-            if len(cache) > 50:
-                _, failed = bulk(es_client, cache, index='movies')
-                cache.clear()
-                with_errors.extend(failed)
+    dead_letters = DeadLetterQueue() if dead_letters is None else dead_letters
+    with_errors = []
 
-    # cache remains
-    _, failed = bulk(es_client, cache, index='movies')
-    with_errors.extend(failed)
+    with dead_letters.replaying() as letters:
+        for index, actions in letters.items():
+            with_errors.extend(bulk_with_retries(es_client, actions, index, dead_letters))
 
     return with_errors
 
 
-def main():
+def main(reindex: bool = False, workers: int = 1, incremental: bool = False, resume: bool = False,
+         replay: bool = False, trace: str = None, immutable: bool = False):
+    """Loads movies to ElasticSearch
+
+    :param reindex: load a new index version and swap the alias instead of writing to the live index
+    :param workers: amount of processes to upload movies in parallel
+    :param incremental: upload only movies changed since the last sync
+    :param resume: continue an interrupted load from the last uploaded chunk, a reindex continues
+        into the index version it has created; a load by one worker only keeps the checkpoint
+    :param replay: upload actions from the dead letter queue only
+    :param trace: file to save a JSON trace of the run metrics
+    :param immutable: the database is not changed during the load, so it is read without locks
+    :return: items with errors
+    """
     es = Elasticsearch(ES_HOSTS)
     if not es.ping():
         raise ConnectionError('ElasticSearch server is not available')
 
-    create_index(es)
-    not_uploaded = upload_movies_to_es(es)
+    if replay:
+        return replay_dead_letters(es)
+
+    metrics = ETLMetrics()
+
+    if incremental:
+        create_index(es)
+        update_mapping(es)
+        not_uploaded = sync_movies_to_es(es, metrics=metrics)
+    else:
+        # a load by one process keeps the last uploaded chunk, so any run can be resumed
+        state = get_state() if workers == 1 else None
+
+        if reindex:
+            unfinished = get_unfinished_index(es, state)
+
+            if unfinished and not resume:
+                # a half-built version left by an interrupted reindex is loaded from scratch
+                es.indices.delete(unfinished)
+                unfinished = None
+
+            index_name = unfinished or create_versioned_index(es)
+        else:
+            index_name = INDEX
+            create_index(es)
+            update_mapping(es)
+
+        if workers > 1:
+            not_uploaded = upload_movies_parallel(index_name, workers, metrics, immutable)
+        else:
+            not_uploaded = upload_movies_to_es(
+                es, index_name, state=state, metrics=metrics, immutable=immutable, resume=resume
+            )
+
+        if reindex:
+            swap_alias(es, index_name)
+
+    metrics.finish()
+    print(metrics.report())
+
+    if trace:
+        metrics.dump(trace)
+
     return not_uploaded
 
 
 if __name__ == '__main__':
-    main()
+    parser = ArgumentParser(description='Load movies from SQLite to ElasticSearch')
+    parser.add_argument('--reindex', action='store_true', help='build a new index version and swap the alias')
+    parser.add_argument('-w', '--workers', type=int, default=1, help='upload in parallel by N processes')
+    parser.add_argument('-i', '--incremental', action='store_true', help='upload only changed movies')
+    parser.add_argument('--resume', action='store_true', help='continue an interrupted load')
+    parser.add_argument('--replay', action='store_true', help='upload actions from the dead letter queue')
+    parser.add_argument('--trace', help='save a JSON trace of the run metrics to the file')
+    parser.add_argument('--immutable', action='store_true', help='read the database without locks, nobody writes it')
+    args = parser.parse_args()
+
+    if args.resume and args.workers > 1:
+        parser.error('--resume is supported by one worker only')
+
+    main(args.reindex, args.workers, args.incremental, args.resume, args.replay, args.trace, args.immutable)
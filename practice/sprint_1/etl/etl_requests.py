@@ -1,23 +1,40 @@
 from abc import ABC, abstractmethod
+from argparse import ArgumentParser
 from contextlib import closing
 from dataclasses import dataclass
+from datetime import datetime
+from functools import partial
 import json
-from math import ceil
 from os.path import join
-from re import search as re_search
-from sqlite3 import connect, Connection
-from typing import List, Iterator
+from sqlite3 import Connection
+from typing import Dict, Iterable, List, Iterator, Optional, Tuple
 from urllib.parse import urljoin
 
 import requests
 
 from common import ETL_DIR, ES_HOSTS
+from practice.sprint_1.etl.batch import (
+    BATCH_SIZE, ActorsLookup, NameLookup, chunked, extract_actors, extract_raw, get_names, get_suggest, parse_rating,
+    split_values, transform_batch
+)
+from practice.sprint_1.etl.catalog import connect_readonly, iter_rows
+from practice.sprint_1.etl.changes import ChangeDetector, get_state
+from practice.sprint_1.etl.metrics import BatchMetrics, ETLMetrics
+from practice.sprint_1.etl.retry import DeadLetterQueue, get_item_id, retry_failed
+from srv_etl.cache import CacheStats
+from srv_etl.state.state import State
 
 
 INDEX = 'movies'
 CR_INDEX_SCR = join(ETL_DIR, 'create_index.json')
 DB_ADDRESS = join(ETL_DIR, 'db.sqlite')
 
+# a new index version is loaded without refreshes and replicas
+BULK_SETTINGS = {'refresh_interval': '-1', 'number_of_replicas': 0}
+MERGE_TIMEOUT = 600
+# the loaded index and the last loaded movie id, kept by the alias as a versioned index is named on every run
+CHECKPOINT_KEY = f'{INDEX}_load'
+
 
 @dataclass
 class Actor:
@@ -43,6 +60,7 @@ class Movie:
     actors_names: str
     writers: List[Writer]
     writers_names: str
+    suggest: dict = None
 
 
 class BaseExtractor(ABC):
@@ -50,6 +68,14 @@ class BaseExtractor(ABC):
     def __init__(self, db_conn: Connection):
         self.db = db_conn
 
+    @property
+    def caches(self) -> List[CacheStats]:
+        """Counters of caches of data shared by records"""
+        return []
+
+    def preload(self):
+        """Caches data shared by records at the start of a full run"""
+
     @abstractmethod
     def extract(self): ...
 
@@ -60,18 +86,39 @@ class BaseExtractor(ABC):
 class MovieDataExtractor(BaseExtractor):
     """The class to extract movie data from a database"""
 
-    def get_movies_ids(self, condition_str: str = None) -> Iterator:
-        """Extracts ids of all movies from DB
+    def __init__(self, db_conn: Connection):
+        super().__init__(db_conn)
+        # names of actors and writers are shared by all movies extracted during the run
+        self.writers = NameLookup(db_conn)
+        self.actors = ActorsLookup(db_conn)
+
+    @property
+    def caches(self) -> List[CacheStats]:
+        return [self.writers.cache.stats, self.actors.cache.stats]
+
+    def preload(self):
+        """Caches names of all actors and writers, so transform doesn't query them"""
+        self.writers.preload()
+        self.actors.preload()
+
+    def get_movies_ids(self, condition_str: str = None, after: str = None) -> Iterator:
+        """Extracts ids of all movies from DB ordered by id
         :param condition_str: conditions for SQL's WHERE
+        :param after: the last id loaded before, to resume a load
         :return: ids of movies
         """
-        query = 'SELECT id FROM movies'
+        conditions, params = [], []
 
         if condition_str:
-            query += ' WHERE ' + self._check_sql(condition_str)
+            conditions.append(f'({self._check_sql(condition_str)})')
 
-        with closing(self.db.execute(query)) as cursor:
-            return (r[0] for r in cursor.fetchall())
+        if after:
+            conditions.append('id > ?')
+            params.append(after)
+
+        where = f' WHERE {" AND ".join(conditions)}' if conditions else ''
+        query = f'SELECT id FROM movies{where} ORDER BY id'
+        return (movie_id for movie_id, in iter_rows(self.db.execute(query, params)))
 
     def get_movie(self, movie_id: str) -> Movie:
         """Returns a movie object by id"""
@@ -112,7 +159,24 @@ class MovieDataExtractor(BaseExtractor):
 
     def extract(self) -> List[dict]:
         """Returns all movies data prepared to load to ElasticSearch"""
-        return [self.extract_one(movie_id) for movie_id in self.get_movies_ids()]
+        return self.extract_many(self.get_movies_ids())
+
+    def extract_many(self, movies_ids: Iterable[str], metrics: BatchMetrics = None) -> List[dict]:
+        """Returns movies data prepared to load to ElasticSearch, extracted by chunks
+        :param movies_ids: ids of movies to extract
+        :param metrics: batch to record extract and transform timings
+        """
+        metrics = metrics or BatchMetrics()
+        records = []
+
+        for chunk in chunked(movies_ids):
+            with metrics.stage('extract'):
+                raw = extract_raw(self.db, chunk, self.writers, self.actors)
+            with metrics.stage('transform'):
+                records.extend(transform_batch(*raw))
+
+        metrics.docs += len(records)
+        return records
 
     def _extract_raw_data(self, movie_id: str) -> dict:
         """Extracts all information about the movie from DB
@@ -152,25 +216,11 @@ class MovieDataExtractor(BaseExtractor):
         return raw_data
 
     def _extract_actors(self, movie_id: str) -> List[dict]:
-        """Extracts the movie writers from DB
+        """Extracts the movie actors from DB
         :param movie_id: movie id from DB
-        :return: data with writers ids and names
+        :return: data with actors ids and names
         """
-        query = """\
-            SELECT a.id, a.name
-                FROM actors a
-                JOIN movie_actors ma ON a.id = ma.actor_id
-                JOIN movies m        ON m.id = ma.movie_id
-                WHERE m.id = ?
-                ORDER BY a.id ASC;
-            """
-
-        with closing(self.db.execute(query, [movie_id])) as cursor:
-            actors = [
-                {'id': r[0], 'name': r[1] if r[1] != 'N/A' else None}
-                for r in cursor.fetchall()
-            ]
-        return actors
+        return extract_actors(self.db, [movie_id], self.actors).get(movie_id, [])
 
     def _extract_writers(self, movie_data: dict) -> List[dict]:
         """Extracts the movie writers from DB
@@ -180,24 +230,12 @@ class MovieDataExtractor(BaseExtractor):
         writers_data = movie_data.get('writers')
 
         if isinstance(writers_data, list):
-            writers_ids = map(
-                lambda writer: str(writer.get('id', '')),
-                writers_data
-            )
-            ids_str = "', '".join(writers_ids)
+            writers_ids = [str(writer.get('id', '')) for writer in writers_data]
         else:
-            ids_str = writers_data
-
-        writers = []
+            writers_ids = [writers_data] if writers_data else []
 
-        if ids_str:
-            query = f"SELECT * FROM writers WHERE id IN ('{ids_str}') ORDER BY id ASC;"
-            with closing(self.db.execute(query)) as cursor:
-                writers = [
-                    {'id': r[0], 'name': r[1] if r[1] != 'N/A' else None}
-                    for r in cursor.fetchall()
-                ]
-        return writers
+        names = self.writers.get(writers_ids)
+        return [{'id': writer_id, 'name': names[writer_id]} for writer_id in sorted(names)]
 
     @staticmethod
     def _check_sql(sql: str) -> str:
@@ -209,37 +247,22 @@ class MovieDataExtractor(BaseExtractor):
 
         return sql
 
-    @staticmethod
-    def _get_names(data: List[dict]) -> str:
-        """Extracts names from actors / writers data"""
-        name_iter = map(lambda r: r.get('name') or '', data)
-        return ', '.join(name_iter)
-
-    @staticmethod
-    def _get_list_from_str(value: str) -> list:
-        """Returns a list of clean values from str"""
-        if value == 'N/A':
-            return []
-
-        return value.split(', ')
-
     def transform(self, movie: dict) -> dict:
         """Converts the movie data to be uploaded to ElasticSearch server
         :param movie: Movie object with raw data
         :return: prepared movie data
         """
 
-        tmp = re_search(r'\d+.\d+', str(movie['imdb_rating']))
-        rating = float(tmp.group()) if tmp else 0.0
-
-        director = self._get_list_from_str(movie['director'])
-        genre = self._get_list_from_str(movie['genre'])
+        director = split_values(movie['director'])
+        genre = split_values(movie['genre'])
 
         actors = self._extract_actors(movie['id'])
-        actors_names = self._get_names(actors)
+        actors_names = get_names(actors)
 
         writers = self._extract_writers(movie)
-        writers_names = self._get_names(writers)
+        writers_names = get_names(writers)
+
+        rating = parse_rating(movie['imdb_rating'])
 
         movie.update({
             'imdb_rating': rating,
@@ -249,14 +272,16 @@ class MovieDataExtractor(BaseExtractor):
             'genre': genre,
             'writers': writers,
             'writers_names': writers_names,
+            'suggest': get_suggest(movie['title'], rating),
         })
         return movie
 
 
 class ESLoader:
 
-    def __init__(self, url: str):
+    def __init__(self, url: str, dead_letters: DeadLetterQueue = None):
         self.url = url
+        self.dead_letters = DeadLetterQueue() if dead_letters is None else dead_letters
 
     def create_index(self, index_name: str, payload_file: str) -> requests.Response:
         """Creates the movie index in ElasticSearch server"""
@@ -268,40 +293,213 @@ class ESLoader:
         headers = {'Content-Type': 'application/json'}
         return requests.put(url, body, headers=headers)
 
+    def update_mapping(self, index_name: str, payload_file: str):
+        """Adds fields new in the mapping, e.g. "suggest", to the existing index
+
+        The mapping is strict, so documents with fields missing in it are rejected.
+        Changes of existing fields can't be applied in place and need --reindex.
+        """
+
+        with open(payload_file, 'r') as file:
+            mappings = json.load(file)['mappings']
+
+        requests.put(urljoin(self.url, f'{index_name}/_mapping'), json=mappings).raise_for_status()
+
+    def index_exists(self, index_name: str) -> bool:
+        """Checks whether the index exists in ElasticSearch server"""
+        return requests.head(urljoin(self.url, index_name)).status_code == 200
+
+    def delete_index(self, index_name: str):
+        """Deletes the index from ElasticSearch server"""
+        requests.delete(urljoin(self.url, index_name)).raise_for_status()
+
+    def create_versioned_index(self, alias: str, payload_file: str) -> str:
+        """Creates a new version of the index tuned for bulk loading
+        :param alias: alias the index will be available by
+        :param payload_file: index settings and mappings
+        :return: name of the new index
+        """
+
+        with open(payload_file, 'r') as file:
+            body = json.load(file)
+
+        body['settings'].update(BULK_SETTINGS)
+        index_name = f'{alias}_{datetime.utcnow():%Y%m%d%H%M%S}'
+        response = requests.put(urljoin(self.url, index_name), json=body)
+        response.raise_for_status()
+        return index_name
+
+    def swap_alias(self, alias: str, index_name: str, payload_file: str):
+        """Prepares the loaded index for search and atomically points the alias to it
+        :param alias: alias to swap
+        :param index_name: a loaded version of the index
+        :param payload_file: index settings to restore
+        """
+
+        with open(payload_file, 'r') as file:
+            settings = json.load(file)['settings']
+
+        live_settings = {
+            'refresh_interval': settings.get('refresh_interval', '1s'),
+            'number_of_replicas': settings.get('number_of_replicas', 1),
+        }
+
+        with requests.session() as client:
+            index_url = urljoin(self.url, index_name) + '/'
+            client.post(
+                urljoin(index_url, '_forcemerge?max_num_segments=1'), timeout=MERGE_TIMEOUT
+            ).raise_for_status()
+            client.put(urljoin(index_url, '_settings'), json={'index': live_settings}).raise_for_status()
+            client.post(urljoin(index_url, '_refresh')).raise_for_status()
+            client.get(
+                urljoin(self.url, f'_cluster/health/{index_name}?wait_for_status=yellow')
+            ).raise_for_status()
+
+            actions = [{'add': {'index': index_name, 'alias': alias}}]
+            old_indices = []
+            response = client.get(urljoin(self.url, f'_alias/{alias}'))
+
+            if response.status_code == 200:
+                old_indices = [name for name in response.json() if name != index_name]
+                actions.extend({'remove': {'index': name, 'alias': alias}} for name in old_indices)
+            elif client.head(urljoin(self.url, alias)).status_code == 200:
+                # the index was created in place before aliases were used
+                actions.append({'remove_index': {'index': alias}})
+
+            client.post(urljoin(self.url, '_aliases'), json={'actions': actions}).raise_for_status()
+
+            for name in old_indices:
+                client.delete(urljoin(self.url, name))
+
     @staticmethod
-    def get_bulk(records: List[dict], index_name: str) -> str:
-        """Prepares records to a bulk request to ElasticSearch"""
+    def get_actions(records: List[dict], index_name: str) -> Dict[str, str]:
+        """Prepares records to index actions of a bulk request by document id"""
 
-        payload = ''
+        actions = {}
 
         for record in records:
-            head = {'index': {'_index': index_name, '_id': record['id']}}
-            head = json.dumps(head)
-            record = json.dumps(record)
-            payload += f'{head}\n{record}\n'
+            head = json.dumps({'index': {'_index': index_name, '_id': record['id']}})
+            actions[record['id']] = f'{head}\n{json.dumps(record)}\n'
+
+        return actions
+
+    @staticmethod
+    def get_delete_actions(ids: List[str], index_name: str) -> Dict[str, str]:
+        """Prepares ids of documents to delete actions of a bulk request by document id"""
+        return {
+            doc_id: json.dumps({'delete': {'_index': index_name, '_id': doc_id}}) + '\n'
+            for doc_id in ids
+        }
+
+    @classmethod
+    def get_bulk(cls, records: List[dict], index_name: str) -> str:
+        """Prepares records to a bulk request to ElasticSearch"""
+        return ''.join(cls.get_actions(records, index_name).values())
 
-        return payload
+    @classmethod
+    def get_delete_bulk(cls, ids: List[str], index_name: str) -> str:
+        """Prepares ids of documents to a bulk delete request to ElasticSearch"""
+        return ''.join(cls.get_delete_actions(ids, index_name).values())
 
-    def load_to_es(self, records: List[dict], index_name: str, bulk_len: int = 100) -> List[dict]:
+    @staticmethod
+    def parse_action(action: str) -> Tuple[str, str]:
+        """Returns an operation type and a document id of an NDJSON action"""
+        (op_type, head), = json.loads(action.partition('\n')[0]).items()
+        return op_type, head['_id']
+
+    def post_bulk(self, client: requests.Session, actions: List[str], metrics: BatchMetrics = None) -> List[dict]:
+        """Sends a bulk request, a rejected or failed request fails all its items
+        :param client: HTTP session
+        :param actions: NDJSON actions
+        :param metrics: batch to record upload timings
+        :return: items with errors
+        """
+
+        url = urljoin(self.url, '_bulk?filter_path=took,items.*.error,items.*._id,items.*.status')
+        headers = {'Content-Type': 'application/x-ndjson'}
+        metrics = metrics or BatchMetrics()
+        body = ''.join(actions).encode()
+
+        try:
+            with metrics.stage('upload'):
+                response = client.post(url, data=body, headers=headers)
+        except requests.RequestException as e:
+            metrics.add_request(len(body))
+            status, error = None, str(e)
+        else:
+            if response.ok:
+                result = response.json()
+                metrics.add_request(len(body), result.get('took', 0))
+                items = result.get('items', [])
+                return [item for item in items if 'error' in next(iter(item.values()))]
+
+            metrics.add_request(len(body))
+            status, error = response.status_code, response.text
+
+        failed = []
+
+        for action in actions:
+            op_type, doc_id = self.parse_action(action)
+            failed.append({op_type: {'_id': doc_id, 'status': status, 'error': error}})
+
+        return failed
+
+    def send_bulks(self, bulks: Iterator[Dict[str, str]], index_name: str,
+                   metrics: BatchMetrics = None) -> List[dict]:
+        """Sends bulk requests to ElasticSearch retrying failed items
+        :param bulks: actions of bulk requests by document id
+        :param index_name: name of an index, for the dead letter queue
+        :param metrics: batch to record upload timings
+        :return: items with errors
+        """
+
+        with_errors = []
+
+        with requests.session() as client:
+
+            for actions in bulks:
+                send = partial(self.post_bulk, client, metrics=metrics)
+                with_errors.extend(retry_failed(send, actions, index_name, self.dead_letters))
+
+        return with_errors
+
+    def load_to_es(self, records: List[dict], index_name: str, bulk_len: int = 100,
+                   metrics: BatchMetrics = None) -> List[dict]:
         """Uploads records to ElasticSearch
         :param records: data to load
         :param index_name: name of an index where to load records
         :param bulk_len: one-time data list size for loading to ElasticSearch
+        :param metrics: batch to record serialize and upload timings
         """
 
-        packets = ceil(len(records) / bulk_len)
-        url = urljoin(self.url, '_bulk?filter_path=items.*.error')
-        headers = {'Content-Type': 'application/x-ndjson'}
-        with_errors = []
+        metrics = metrics or BatchMetrics()
 
-        with requests.session() as client:
+        with metrics.stage('serialize'):
+            bulks = [self.get_actions(packet, index_name) for packet in chunked(records, bulk_len)]
+
+        return self.send_bulks(bulks, index_name, metrics)
+
+    def delete_from_es(self, ids: List[str], index_name: str, bulk_len: int = 1000,
+                       metrics: BatchMetrics = None) -> List[dict]:
+        """Deletes documents from ElasticSearch
+        :param ids: ids of documents to delete
+        :param index_name: name of an index where to delete documents
+        :param bulk_len: one-time ids list size for deleting
+        :param metrics: batch to record upload timings
+        """
+
+        bulks = (self.get_delete_actions(packet, index_name) for packet in chunked(ids, bulk_len))
+        return self.send_bulks(bulks, index_name, metrics)
 
-            for i in range(packets):
-                start, end = i * bulk_len, (i + 1) * bulk_len
-                bulk = self.get_bulk(records[start:end], index_name)
-                response = client.post(url, data=bulk, headers=headers)
-                err = response.json().get('items', [])
-                with_errors.extend(err)
+    def replay_dead_letters(self) -> List[dict]:
+        """Sends actions from the dead letter queue again, failed ones are put back"""
+
+        with_errors = []
+
+        with self.dead_letters.replaying() as letters:
+            for index_name, actions in letters.items():
+                bulk = {self.parse_action(action)[1]: action for action in actions}
+                with_errors.extend(self.send_bulks([bulk], index_name))
 
         return with_errors
 
@@ -313,25 +511,136 @@ class ETL:
         self.extractor = extractor
         self.loader = loader
 
-    def load(self, index_name: str) -> list:
-        """Loads data to ElasticSearch
+    @staticmethod
+    def get_checkpoint(state: State, index_name: str) -> Optional[str]:
+        """Returns the last loaded movie id of an interrupted load into the index"""
+        checkpoint = state.get_state(CHECKPOINT_KEY) if state else None
+
+        if checkpoint and checkpoint['index'] == index_name:
+            return checkpoint['last_movie_id']
+        return None
+
+    def get_unfinished_index(self, alias: str, state: State) -> Optional[str]:
+        """Returns a new index version left by an interrupted reindex, if it still exists"""
+        checkpoint = state.get_state(CHECKPOINT_KEY) if state else None
+
+        if checkpoint and checkpoint['index'] != alias and self.loader.index_exists(checkpoint['index']):
+            return checkpoint['index']
+        return None
+
+    def load(self, index_name: str, metrics: ETLMetrics = None, state: State = None, resume: bool = False) -> list:
+        """Loads data to ElasticSearch by batches
         :param index_name: name of index to load data into
+        :param metrics: metrics of the run to add batches to
+        :param state: ETL state to keep the last loaded batch in
+        :param resume: continue an interrupted load into the index after its last loaded batch
         :returns upload errors
         """
         if requests.get(self.loader.url).status_code != 200:
             raise ConnectionError('ElasticSearch server is not available')
 
-        records = self.extractor.extract()
-        return self.loader.load_to_es(records, index_name)
+        metrics = metrics or ETLMetrics()
+        errors = []
+        last_id = self.get_checkpoint(state, index_name) if resume else None
+        self.extractor.preload()
+        metrics.track(*self.extractor.caches)
 
+        if state:
+            state.set_state(CHECKPOINT_KEY, {'index': index_name, 'last_movie_id': last_id})
 
-if __name__ == '__main__':
+        for chunk in chunked(self.extractor.get_movies_ids(after=last_id), BATCH_SIZE):
+            batch = metrics.batch()
+            records = self.extractor.extract_many(chunk, batch)
+            errors.extend(self.loader.load_to_es(records, index_name, metrics=batch))
+
+            if state:
+                state.set_state(CHECKPOINT_KEY, {'index': index_name, 'last_movie_id': chunk[-1]})
+
+        if state:
+            state.set_state(CHECKPOINT_KEY, None)
+
+        metrics.finish()
+        return errors
+
+    def sync(self, index_name: str, detector: ChangeDetector, metrics: ETLMetrics = None) -> list:
+        """Loads new and changed movies and deletes removed ones since the last sync
+        :param index_name: name of index to load data into
+        :param detector: detector of changes in the database
+        :param metrics: metrics of the run to add the batch to
+        :returns upload errors
+        """
+        if requests.get(self.loader.url).status_code != 200:
+            raise ConnectionError('ElasticSearch server is not available')
 
-    with connect(DB_ADDRESS) as db:
+        metrics = metrics or ETLMetrics()
+        batch = metrics.batch()
+        # only names of changed movies are selected, caches are not preloaded
+        metrics.track(*self.extractor.caches)
+        changes = detector.detect()
+        records = self.extractor.extract_many(changes.upserted, batch)
+        errors = self.loader.load_to_es(records, index_name, metrics=batch)
+        errors.extend(self.loader.delete_from_es(changes.deleted, index_name, metrics=batch))
+        metrics.finish()
+
+        detector.commit(changes, map(get_item_id, errors))
+        return errors
+
+    def reindex(self, alias: str, payload_file: str, metrics: ETLMetrics = None, state: State = None,
+                resume: bool = False) -> list:
+        """Loads data to a new index version and swaps the alias to it
+        :param alias: alias of the index to reload
+        :param payload_file: index settings and mappings
+        :param metrics: metrics of the run to add batches to
+        :param state: ETL state to keep the loaded index version and its last loaded batch in
+        :param resume: continue an interrupted reindex into the index version it has created
+        :returns upload errors
+        """
+        unfinished = self.get_unfinished_index(alias, state)
+
+        if unfinished and not resume:
+            # a half-built version left by an interrupted reindex is loaded from scratch
+            self.loader.delete_index(unfinished)
+            unfinished = None
+
+        index_name = unfinished or self.loader.create_versioned_index(alias, payload_file)
+        errors = self.load(index_name, metrics, state, resume)
+        self.loader.swap_alias(alias, index_name, payload_file)
+        return errors
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Load movies from SQLite to ElasticSearch')
+    parser.add_argument('--reindex', action='store_true', help='build a new index version and swap the alias')
+    parser.add_argument('-i', '--incremental', action='store_true', help='upload only changed movies')
+    parser.add_argument('--resume', action='store_true', help='continue an interrupted load')
+    parser.add_argument('--replay', action='store_true', help='send actions from the dead letter queue')
+    parser.add_argument('--trace', help='save a JSON trace of the run metrics to the file')
+    args = parser.parse_args()
+    metrics = ETLMetrics()
+    # the last loaded batch is kept by every run, --resume continues from it
+    state = get_state()
+
+    with closing(connect_readonly(DB_ADDRESS)) as db:
         es_loader = ESLoader(ES_HOSTS[0])
-        es_loader.create_index(INDEX, CR_INDEX_SCR)
         movie_extractor = MovieDataExtractor(db)
-
         etl = ETL(movie_extractor, es_loader)
-        errors = etl.load(INDEX)
+
+        if args.replay:
+            errors = es_loader.replay_dead_letters()
+        elif args.reindex:
+            errors = etl.reindex(INDEX, CR_INDEX_SCR, metrics, state, args.resume)
+        elif args.incremental:
+            es_loader.create_index(INDEX, CR_INDEX_SCR)
+            es_loader.update_mapping(INDEX, CR_INDEX_SCR)
+            errors = etl.sync(INDEX, ChangeDetector(db, state), metrics)
+        else:
+            es_loader.create_index(INDEX, CR_INDEX_SCR)
+            es_loader.update_mapping(INDEX, CR_INDEX_SCR)
+            errors = etl.load(INDEX, metrics, state, args.resume)
         print(errors)
+
+    if not args.replay:
+        print(metrics.report())
+
+        if args.trace:
+            metrics.dump(args.trace)
@@ -0,0 +1,152 @@
+"""
+Instrumentation of ETL runs
+
+Every batch records durations of its stages, amount of documents and bytes
+sent and the time ElasticSearch spent on the bulk requests ("took").
+Comparing "took" with the upload wall time separates server work from
+network and client overhead. Hit ratios of tracked dimension caches show
+how many names were looked up in memory instead of the database.
+
+Example:
+    metrics = ETLMetrics()
+    batch = metrics.batch()
+    with batch.stage('extract'):
+        ...
+    metrics.finish()
+    print(metrics.report())
+    metrics.dump('trace.json')
+"""
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+import json
+from time import perf_counter
+from typing import Dict, Iterable, List
+
+from srv_etl.cache import CacheStats
+
+
+STAGES = 'extract', 'transform', 'serialize', 'upload'
+
+
+def rate(value: float, duration: float) -> float:
+    return value / duration if duration else 0.0
+
+
+@dataclass
+class BatchMetrics:
+    """Measurements of one batch, durations are in seconds"""
+    number: int = 0
+    docs: int = 0
+    bytes: int = 0
+    requests: int = 0
+    took: float = 0.0
+    stages: Dict[str, float] = field(default_factory=lambda: dict.fromkeys(STAGES, 0.0))
+
+    @contextmanager
+    def stage(self, name: str):
+        """Adds the duration of the block to the stage"""
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] += perf_counter() - start
+
+    def add_request(self, size: int, took_ms: int = 0):
+        """Counts a bulk request
+        :param size: payload size in bytes
+        :param took_ms: "took" of the ElasticSearch response
+        """
+        self.requests += 1
+        self.bytes += size
+        self.took += took_ms / 1000
+
+
+class ETLMetrics:
+    """Metrics of an ETL run made of batches"""
+
+    def __init__(self):
+        self.batches: List[BatchMetrics] = []
+        self.caches: List[CacheStats] = []
+        self.started = perf_counter()
+        self.finished = None
+
+    def batch(self) -> BatchMetrics:
+        """Starts measuring a new batch"""
+        batch = BatchMetrics(len(self.batches))
+        self.batches.append(batch)
+        return batch
+
+    def extend(self, batches: Iterable[BatchMetrics], caches: Iterable[CacheStats] = ()):
+        """Adds batches and caches measured elsewhere, e.g. in worker processes"""
+        for batch in batches:
+            batch.number = len(self.batches)
+            self.batches.append(batch)
+        self.track(*caches)
+
+    def track(self, *caches: CacheStats):
+        """Adds counters of caches to report, they are read when the summary is made"""
+        self.caches.extend(caches)
+
+    def get_caches(self) -> Dict[str, CacheStats]:
+        """Returns counters of caches summed by name, e.g. of the same dimension in workers"""
+        totals = {}
+        for stats in self.caches:
+            totals.setdefault(stats.name, CacheStats(stats.name)).add(stats)
+        return totals
+
+    def finish(self):
+        self.finished = perf_counter()
+
+    @property
+    def wall(self) -> float:
+        return (self.finished or perf_counter()) - self.started
+
+    def summary(self) -> dict:
+        """Returns totals and rates of the run"""
+        wall = self.wall
+        docs = sum(b.docs for b in self.batches)
+        size = sum(b.bytes for b in self.batches)
+        took = sum(b.took for b in self.batches)
+        stages = {name: sum(b.stages[name] for b in self.batches) for name in STAGES}
+        busy = sum(stages.values())
+
+        return {
+            'batches': len(self.batches),
+            'requests': sum(b.requests for b in self.batches),
+            'docs': docs,
+            'bytes': size,
+            'wall': wall,
+            'docs_per_sec': rate(docs, wall),
+            'bytes_per_sec': rate(size, wall),
+            'stages': stages,
+            'stages_share': {name: rate(duration, busy) for name, duration in stages.items()},
+            'es_took': took,
+            'es_took_share': rate(took, stages['upload']),
+            'caches': {name: stats.as_dict() for name, stats in self.get_caches().items()},
+        }
+
+    def report(self) -> str:
+        """Returns a human readable summary"""
+        s = self.summary()
+        lines = [
+            f"{s['docs']} docs in {s['batches']} batches, {s['requests']} requests, {s['wall']:.2f} s",
+            f"{s['docs_per_sec']:.0f} docs/s, {s['bytes_per_sec'] / 2 ** 20:.2f} MiB/s",
+        ]
+        lines.extend(
+            f"{name:<10}{duration:8.2f} s {s['stages_share'][name]:6.1%}"
+            for name, duration in s['stages'].items()
+        )
+        lines.append(f"ES took {s['es_took']:.2f} s, {s['es_took_share']:.1%} of upload")
+        lines.extend(
+            f"{name} cache {c['hit_ratio']:.1%} hits of {c['hits'] + c['misses']} lookups, "
+            f"{c['items']} items, {c['size'] / 2 ** 20:.2f} MiB, {c['evictions']} evicted"
+            for name, c in s['caches'].items()
+        )
+        return '\n'.join(lines)
+
+    def dump(self, file: str):
+        """Saves the summary and every batch to a JSON trace"""
+        trace = {'summary': self.summary(), 'batches': [asdict(b) for b in self.batches]}
+
+        with open(file, 'w') as f:
+            json.dump(trace, f, indent=2)
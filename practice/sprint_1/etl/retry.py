@@ -0,0 +1,133 @@
+"""
+Retries of failed bulk items and a dead letter queue for the ones which still fail
+
+A failed item is a bulk response item, e.g. {"index": {"_id": "tt0076759", "status": 429, "error": {...}}}.
+Items failed by the transport (connection errors, rejected requests) have "N/A" or None status.
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+import json
+import os
+from os.path import join
+from random import uniform
+import shutil
+from time import sleep
+from typing import Any, Callable, Dict, Iterator, List
+
+from common import ETL_DIR
+
+
+DEAD_LETTERS_FILE = join(ETL_DIR, 'dead_letters.ndjson')
+RETRYABLE_STATUSES = {429, 503, 'N/A', None}
+MAX_RETRIES = 5
+INITIAL_BACKOFF = 0.5
+MAX_BACKOFF = 30
+
+
+def get_item_id(item: dict) -> str:
+    """Returns a document id of a bulk response item"""
+    (_, result), = item.items()
+    return result.get('_id')
+
+
+def is_retryable(item: dict) -> bool:
+    """Checks whether an item failed because of a transient reason"""
+    (_, result), = item.items()
+    return result.get('status') in RETRYABLE_STATUSES
+
+
+def get_backoff(attempt: int, initial: float = INITIAL_BACKOFF, maximum: float = MAX_BACKOFF) -> float:
+    """Returns an exponential delay with jitter before the retry attempt (from 1)"""
+    delay = min(maximum, initial * 2 ** (attempt - 1))
+    return uniform(delay / 2, delay)
+
+
+class DeadLetterQueue:
+    """Append-only NDJSON file of actions failed permanently
+
+    Every line is {"index": ..., "action": ..., "error": ...}, so the actions
+    can be replayed into the same index.
+    """
+
+    def __init__(self, path: str = DEAD_LETTERS_FILE):
+        self.path = path
+        # actions taken out of the queue are kept here until they are sent again
+        self.replaying_path = path + '.replaying'
+
+    def put(self, index: str, action: Any, error: dict):
+        """Appends a failed action"""
+        with open(self.path, 'a', encoding='utf-8') as file:
+            line = json.dumps({'index': index, 'action': action, 'error': error}, default=str)
+            file.write(line + '\n')
+
+    def __iter__(self) -> Iterator[dict]:
+        for path in self.replaying_path, self.path:
+            if os.path.exists(path):
+                with open(path, encoding='utf-8') as file:
+                    yield from map(json.loads, file)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    @contextmanager
+    def replaying(self) -> Iterator[Dict[str, List[Any]]]:
+        """Takes all actions out of the queue to send them again inside the block
+
+        The actions are deleted when the block is finished, so they are kept if sending fails,
+        and the next replay picks up actions of an interrupted one. Actions failed again
+        are appended to the queue meanwhile. Sending an action twice is harmless,
+        as an index or a delete by id gives the same document.
+        :return: actions by index
+        """
+        if os.path.exists(self.path):
+            if os.path.exists(self.replaying_path):
+                with open(self.path, 'rb') as queued, open(self.replaying_path, 'ab') as replaying:
+                    shutil.copyfileobj(queued, replaying)
+                os.remove(self.path)
+            else:
+                os.replace(self.path, self.replaying_path)
+
+        actions = defaultdict(list)
+
+        if os.path.exists(self.replaying_path):
+            with open(self.replaying_path, encoding='utf-8') as file:
+                for entry in map(json.loads, file):
+                    actions[entry['index']].append(entry['action'])
+
+        yield actions
+
+        if os.path.exists(self.replaying_path):
+            os.remove(self.replaying_path)
+
+
+def retry_failed(send: Callable[[List[Any]], List[dict]], actions: Dict[str, Any], index: str,
+                 dead_letters: DeadLetterQueue = None, max_retries: int = MAX_RETRIES) -> List[dict]:
+    """Sends actions and resends ones failed for transient reasons with exponential backoff
+
+    :param send: sends a list of actions, returns failed bulk response items
+    :param actions: actions by document id
+    :param index: target index
+    :param dead_letters: queue for actions failed permanently
+    :param max_retries: max amount of resending
+    :return: items failed permanently
+    """
+    pending = actions
+    failed_permanently = []
+
+    for attempt in range(max_retries + 1):
+        if attempt:
+            sleep(get_backoff(attempt))
+
+        failed = send(list(pending.values()))
+        retry = [item for item in failed if is_retryable(item)] if attempt < max_retries else []
+        failed_permanently.extend(item for item in failed if not (retry and is_retryable(item)))
+        pending = {get_item_id(item): pending[get_item_id(item)] for item in retry}
+
+        if not pending:
+            break
+
+    if dead_letters is not None:
+        for item in failed_permanently:
+            dead_letters.put(index, actions[get_item_id(item)], item)
+
+    return failed_permanently
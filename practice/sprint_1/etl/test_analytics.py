@@ -0,0 +1,131 @@
+from collections import Counter
+from os.path import join
+from shutil import copyfile
+from sqlite3 import connect
+
+from pytest import fixture, main, mark
+
+from common import ETL_DIR
+from practice.sprint_1.etl.analytics import CatalogAnalytics, create_indexes, get_match_query
+from practice.sprint_1.etl.batch import get_writers_ids
+
+
+DB_ADDRESS = join(ETL_DIR, 'db.sqlite')
+
+
+@fixture
+def path(tmp_path) -> str:
+    path = str(tmp_path / 'db.sqlite')
+    copyfile(DB_ADDRESS, path)
+    return path
+
+
+@fixture
+def db(path):
+    with connect(path) as conn:
+        yield conn
+
+
+@fixture
+def analytics(db) -> CatalogAnalytics:
+    return CatalogAnalytics(db)
+
+
+def count_queries(db, call) -> int:
+    """Counts statements of the call except checks of the catalog version"""
+    statements = []
+    db.set_trace_callback(statements.append)
+    try:
+        call()
+    finally:
+        db.set_trace_callback(None)
+    return sum(1 for s in statements if not s.startswith('PRAGMA'))
+
+
+def test_actors_for_director(db, analytics):
+    expected = {
+        name for name, in db.execute("""\
+            SELECT a.name
+                FROM movies m
+                JOIN movie_actors ma ON ma.movie_id = m.id
+                JOIN actors a ON ma.actor_id = a.id
+                WHERE m.director LIKE '%Lerdam%';
+            """)
+    }
+    assert analytics.actors_for_director('Lerdam') == sorted(expected)
+    assert analytics.actors_for_director('lerd') == sorted(expected)
+    assert analytics.actors_for_director('Zzzzzz') == []
+
+
+def test_top_actors(db, analytics):
+    expected = db.execute("""\
+        SELECT a.name, count(m.id) as amount
+            FROM actors a
+            JOIN movie_actors ma ON a.id = ma.actor_id
+            JOIN movies m ON m.id = ma.movie_id
+            WHERE a.name != 'N/A'
+            GROUP BY a.name
+            ORDER BY amount DESC, a.name
+            LIMIT 5
+        """).fetchall()
+    assert analytics.top_actors(5) == expected
+
+
+def test_top_writers(db, analytics):
+    names = dict(db.execute("SELECT id, name FROM writers WHERE name != 'N/A'"))
+    amounts = Counter()
+
+    for writer, writers in db.execute('SELECT writer, writers FROM movies'):
+        ids = set(get_writers_ids({'writer': writer, 'writers': writers}))
+        amounts.update(names[i] for i in ids if i in names)
+
+    expected = sorted(amounts.items(), key=lambda item: (-item[1], item[0]))[:5]
+    assert analytics.top_writers(5) == expected
+
+
+def test_search_people(analytics):
+    assert ('George Lucas', 'director') in analytics.search_people('george luc')
+    assert analytics.search_people('"') == []
+
+
+def test_results_are_cached(db, analytics):
+    analytics.top_actors(3)
+    assert count_queries(db, lambda: analytics.top_actors(3)) == 0
+    assert count_queries(db, lambda: analytics.top_actors(4)) == 1
+
+
+def test_change_invalidates_cache(db, analytics):
+    assert 'Mark Hamill' not in analytics.actors_for_director('Lerdam')
+
+    db.execute("INSERT INTO movies (id, director, title) VALUES ('tt9999999', 'Jørgen Lerdam', 'New')")
+    actor_id, = db.execute("SELECT id FROM actors WHERE name = 'Mark Hamill'").fetchone()
+    db.execute('INSERT INTO movie_actors (movie_id, actor_id) VALUES (?, ?)', ['tt9999999', str(actor_id)])
+
+    assert 'Mark Hamill' in analytics.actors_for_director('Lerdam')
+
+
+def test_read_only_catalog(path):
+    with connect(f'file:{path}?mode=ro', uri=True) as conn:
+        assert not create_indexes(conn)
+        assert CatalogAnalytics(conn).top_actors(1)
+
+
+def test_indexes_are_used(db, analytics):
+    analytics.top_actors(1)
+    query = 'EXPLAIN QUERY PLAN SELECT actor_id, count(*) FROM movie_actors GROUP BY actor_id'
+    plan = ' '.join(row[-1] for row in db.execute(query))
+    assert 'COVERING INDEX movie_actors_actor_movie' in plan
+
+
+@mark.parametrize('text,query', [
+    ('Lerdam', '"Lerdam"*'),
+    (' George  Lucas ', '"George"* "Lucas"*'),
+    ('O"Brien', '"O"* "Brien"*'),
+    ('', ''),
+])
+def test_get_match_query(text, query):
+    assert get_match_query(text) == query
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+import json
+from os.path import join
+from sqlite3 import connect
+
+from pytest import fixture, main, mark
+
+from common import ETL_DIR
+from practice.sprint_1.etl.batch import (
+    ActorsLookup, NameLookup, extract_batch, extract_raw, get_variables_limit, parse_rating, split_values,
+    transform_batch
+)
+
+
+DB_ADDRESS = join(ETL_DIR, 'db.sqlite')
+GOLDEN_FILE = join(ETL_DIR, 'golden_movies.json')
+
+
+@fixture(scope='module')
+def db():
+    with connect(DB_ADDRESS) as conn:
+        yield conn
+
+
+@fixture(scope='module')
+def golden():
+    with open(GOLDEN_FILE, encoding='utf-8') as file:
+        return {movie['id']: movie for movie in json.load(file)}
+
+
+@mark.parametrize('value,expected', [
+    ('8.6', 8.6),
+    # an integer rating was parsed as 0.0 by the former regex-only parsing
+    ('7', 7.0),
+    ('N/A', 0.0),
+    (None, 0.0),
+    ('rated 6.5/10', 6.5),
+])
+def test_parse_rating(value, expected):
+    assert parse_rating(value) == expected
+
+
+@mark.parametrize('value,expected', [
+    ('Action, Adventure', ['Action', 'Adventure']),
+    ('Drama', ['Drama']),
+    ('N/A', []),
+    ('', []),
+    (None, []),
+])
+def test_split_values(value, expected):
+    assert split_values(value) == expected
+
+
+def test_golden_output(db, golden):
+    documents = extract_batch(db, list(golden))
+    assert {doc['id']: doc for doc in documents} == golden
+
+
+def test_chunks_are_independent(db, golden):
+    ids = list(golden)
+    whole = extract_batch(db, ids)
+    by_one = [doc for movie_id in ids for doc in extract_batch(db, [movie_id])]
+    assert sorted(whole, key=lambda d: d['id']) == sorted(by_one, key=lambda d: d['id'])
+
+
+def count_queries(db, call) -> int:
+    statements = []
+    db.set_trace_callback(statements.append)
+    try:
+        call()
+    finally:
+        db.set_trace_callback(None)
+    return len(statements)
+
+
+def test_name_lookup(db):
+    expected = dict(db.execute("SELECT id, name FROM writers WHERE name != 'N/A' ORDER BY id LIMIT 50"))
+    ids = [*expected, 'missing', "' OR 1=1 --"]
+    writers = NameLookup(db, chunk_size=7)
+
+    # 52 ids by 7 per query
+    assert count_queries(db, lambda: writers.prefetch(ids)) == 8
+    assert count_queries(db, lambda: writers.get(ids)) == 0
+    assert writers.get(ids) == expected
+
+
+def test_name_lookup_is_shared(db, golden):
+    ids = list(golden)
+    writers, actors = NameLookup(db), ActorsLookup(db)
+    movies, _, names = extract_raw(db, ids, writers, actors)
+
+    assert names == NameLookup(db).get({i for movie in movies for i in movie['writers']})
+    # movies and links of actors
+    assert count_queries(db, lambda: extract_raw(db, ids, writers, actors)) == 2
+
+
+def test_preloaded_lookups(db, golden):
+    writers, actors = NameLookup(db), ActorsLookup(db)
+    writers.preload(), actors.preload()
+
+    raw = extract_raw(db, list(golden), writers, actors)
+    assert {doc['id']: doc for doc in transform_batch(*raw)} == golden
+    assert writers.cache.stats.hit_ratio == actors.cache.stats.hit_ratio == 1.0
+
+
+def test_variables_limit(db):
+    assert get_variables_limit(db) >= 999
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+from contextlib import closing
+from os.path import join
+from shutil import copyfile
+from sqlite3 import OperationalError, ProgrammingError
+
+from pytest import fixture, main, mark, raises
+
+from common import ETL_DIR
+from practice.sprint_1.etl.catalog import CACHE_SIZE, MMAP_SIZE, connect_readonly, iter_rows
+
+
+DB_ADDRESS = join(ETL_DIR, 'db.sqlite')
+
+
+@fixture
+def path(tmp_path) -> str:
+    # the URI must survive special characters of the path
+    path = str(tmp_path / 'movies catalog #1.sqlite')
+    copyfile(DB_ADDRESS, path)
+    return path
+
+
+@mark.parametrize('immutable', [False, True])
+def test_connect_readonly(path, immutable):
+    with closing(connect_readonly(path, immutable)) as db:
+        assert db.execute('SELECT count(*) FROM movies').fetchone()[0] == 999
+        assert db.execute('PRAGMA cache_size').fetchone()[0] == CACHE_SIZE
+        assert db.execute('PRAGMA mmap_size').fetchone()[0] == MMAP_SIZE
+
+        with raises(OperationalError):
+            db.execute("DELETE FROM movies")
+
+
+def test_parallel_readers(path):
+    with closing(connect_readonly(path)) as first, closing(connect_readonly(path)) as second:
+        rows = iter_rows(first.execute('SELECT id FROM movies ORDER BY id'), size=10)
+        next(rows)
+        assert second.execute('SELECT count(*) FROM movies').fetchone()[0] == 999
+        assert len(list(rows)) == 998
+
+
+def test_missing_database(tmp_path):
+    with raises(OperationalError):
+        connect_readonly(str(tmp_path / 'missing.sqlite'))
+
+
+@mark.parametrize('size', [1, 7, 1000])
+def test_iter_rows(path, size):
+    with closing(connect_readonly(path)) as db:
+        expected = db.execute('SELECT id FROM movies ORDER BY id').fetchall()
+        cursor = db.execute('SELECT id FROM movies ORDER BY id')
+
+        assert list(iter_rows(cursor, size)) == expected
+
+        with raises(ProgrammingError):
+            cursor.fetchone()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+from os.path import join
+from shutil import copyfile
+from sqlite3 import connect
+
+from pytest import fixture, main
+
+from common import ETL_DIR
+from practice.sprint_1.etl.changes import ChangeDetector, get_state
+
+
+DB_ADDRESS = join(ETL_DIR, 'db.sqlite')
+
+
+@fixture
+def db(tmp_path):
+    path = tmp_path / 'db.sqlite'
+    copyfile(DB_ADDRESS, path)
+    with connect(path) as conn:
+        yield conn
+
+
+@fixture
+def detector(db, tmp_path):
+    detector = ChangeDetector(db, get_state(str(tmp_path / 'state.json')))
+    detector.commit(detector.detect())
+    return detector
+
+
+def test_first_sync_loads_everything(db, tmp_path):
+    detector = ChangeDetector(db, get_state(str(tmp_path / 'state.json')))
+    changes = detector.detect()
+    assert len(changes.upserted) == db.execute('SELECT count(*) FROM movies').fetchone()[0]
+    assert changes.deleted == []
+
+
+def test_no_changes(detector):
+    assert not detector.detect()
+
+
+def test_changed_movie(db, detector):
+    db.execute("UPDATE movies SET title = 'A New Hope' WHERE id = 'tt0076759'")
+    assert detector.detect().upserted == ['tt0076759']
+
+
+def test_renamed_actor(db, detector):
+    db.execute("UPDATE actors SET name = 'Luke' WHERE name = 'Mark Hamill'")
+    movies = db.execute(
+        "SELECT movie_id FROM movie_actors ma JOIN actors a ON a.id = ma.actor_id WHERE a.name = 'Luke'"
+    )
+    assert set(detector.detect().upserted) == {r[0] for r in movies}
+
+
+def test_renamed_writer(db, detector):
+    db.execute("UPDATE writers SET name = 'Lucas' WHERE id = '0b60f2f35988f621775659dbb7ad784c3795d71b'")
+    changes = detector.detect()
+    assert 'tt0080684' in changes.upserted
+    assert 'tt0076759' not in changes.upserted
+
+
+def test_deleted_movie(db, detector):
+    db.execute("DELETE FROM movies WHERE id = 'tt0076759'")
+    changes = detector.detect()
+    assert changes.upserted == []
+    assert changes.deleted == ['tt0076759']
+
+
+def test_failed_movies_are_retried(db, detector):
+    db.execute("UPDATE movies SET title = 'A New Hope' WHERE id = 'tt0076759'")
+    db.execute("DELETE FROM movies WHERE id = 'tt0080684'")
+    changes = detector.detect()
+
+    detector.commit(changes, failed_ids=['tt0076759', 'tt0080684'])
+    retry = detector.detect()
+    assert retry.upserted == ['tt0076759']
+    assert retry.deleted == ['tt0080684']
+
+
+if __name__ == '__main__':
+    main()
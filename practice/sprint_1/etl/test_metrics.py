@@ -0,0 +1,70 @@
+import json
+
+from pytest import approx, main
+
+from practice.sprint_1.etl.metrics import STAGES, ETLMetrics
+from srv_etl.cache import CacheStats
+
+
+def test_summary():
+    metrics = ETLMetrics()
+
+    for _ in range(2):
+        batch = metrics.batch()
+        batch.docs += 10
+        batch.stages.update(extract=0.1, transform=0.1, serialize=0.2, upload=0.6)
+        batch.add_request(size=1000, took_ms=300)
+
+    metrics.started, metrics.finished = 0.0, 2.0
+    summary = metrics.summary()
+
+    assert summary['docs'] == 20
+    assert summary['docs_per_sec'] == 10
+    assert summary['bytes_per_sec'] == 1000
+    assert summary['stages']['upload'] == approx(1.2)
+    assert summary['stages_share']['upload'] == approx(0.6)
+    assert summary['es_took'] == approx(0.6)
+    assert summary['es_took_share'] == approx(0.5)
+
+
+def test_stage_timer():
+    batch = ETLMetrics().batch()
+
+    with batch.stage('extract'):
+        sum(range(10000))
+
+    assert batch.stages['extract'] > 0
+    assert set(batch.stages) == set(STAGES)
+
+
+def test_trace(tmp_path):
+    metrics = ETLMetrics()
+    metrics.batch().docs = 5
+    worker = ETLMetrics()
+    worker.batch(), worker.batch()
+    metrics.extend(worker.batches)
+    metrics.finish()
+
+    file = tmp_path / 'trace.json'
+    metrics.dump(str(file))
+    trace = json.loads(file.read_text())
+
+    assert trace['summary']['docs'] == 5
+    assert [batch['number'] for batch in trace['batches']] == [0, 1, 2]
+    assert 'upload' in metrics.report()
+
+
+def test_caches():
+    metrics = ETLMetrics()
+    metrics.track(CacheStats('actors', items=10, hits=6, misses=2))
+    metrics.extend([], [CacheStats('actors', items=10, hits=2), CacheStats('writers', misses=4)])
+    caches = metrics.summary()['caches']
+
+    assert caches['actors']['hit_ratio'] == 0.8
+    assert caches['actors']['items'] == 20
+    assert caches['writers']['hit_ratio'] == 0
+    assert 'actors cache 80.0% hits of 10 lookups' in metrics.report()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+from pytest import fixture, main, raises
+
+from practice.sprint_1.etl import retry
+from practice.sprint_1.etl.retry import DeadLetterQueue, retry_failed
+
+
+INDEX = 'movies'
+
+
+@fixture(autouse=True)
+def no_sleep(monkeypatch):
+    delays = []
+    monkeypatch.setattr(retry, 'sleep', delays.append)
+    return delays
+
+
+@fixture
+def dead_letters(tmp_path):
+    return DeadLetterQueue(str(tmp_path / 'dead_letters.ndjson'))
+
+
+def failed(doc_id, status):
+    return {'index': {'_id': doc_id, 'status': status, 'error': {'type': 'error'}}}
+
+
+class FlakyBulk:
+    """Fails documents with the statuses, one status per attempt"""
+
+    def __init__(self, statuses):
+        self.statuses = statuses
+        self.sent = []
+
+    def __call__(self, actions):
+        self.sent.append([action['_id'] for action in actions])
+        return [
+            failed(action['_id'], statuses.pop(0))
+            for action in actions if (statuses := self.statuses.get(action['_id']))
+        ]
+
+
+def test_transient_failures_are_retried(dead_letters, no_sleep):
+    send = FlakyBulk({'tt1': [429, 503], 'tt2': [None]})
+    actions = {doc_id: {'_id': doc_id} for doc_id in ('tt1', 'tt2', 'tt3')}
+
+    assert retry_failed(send, actions, INDEX, dead_letters) == []
+    assert send.sent == [['tt1', 'tt2', 'tt3'], ['tt1', 'tt2'], ['tt1']]
+    assert len(no_sleep) == 2 and no_sleep[0] <= no_sleep[1]
+    assert len(dead_letters) == 0
+
+
+def test_permanent_failures_are_not_retried(dead_letters):
+    # a version conflict is repeated by a retry, so it isn't transient
+    send = FlakyBulk({'tt1': [400], 'tt2': [409]})
+    actions = {'tt1': {'_id': 'tt1'}, 'tt2': {'_id': 'tt2'}, 'tt3': {'_id': 'tt3'}}
+
+    assert retry_failed(send, actions, INDEX, dead_letters) == [failed('tt1', 400), failed('tt2', 409)]
+    assert send.sent == [['tt1', 'tt2', 'tt3']]
+    assert [entry['action'] for entry in dead_letters] == [{'_id': 'tt1'}, {'_id': 'tt2'}]
+
+
+def test_retries_are_limited(dead_letters):
+    send = FlakyBulk({'tt1': [None] * 10})
+
+    errors = retry_failed(send, {'tt1': {'_id': 'tt1'}}, INDEX, dead_letters, max_retries=3)
+    assert errors == [failed('tt1', None)]
+    assert len(send.sent) == 4
+    assert len(dead_letters) == 1
+
+
+def put_failed(dead_letters, *ids):
+    retry_failed(FlakyBulk({doc_id: [400] for doc_id in ids}), {
+        doc_id: {'_id': doc_id} for doc_id in (*ids, 'tt9')
+    }, INDEX, dead_letters)
+
+
+def test_dead_letters_replay(dead_letters):
+    put_failed(dead_letters, 'tt1', 'tt2')
+
+    with dead_letters.replaying() as letters:
+        assert letters == {INDEX: [{'_id': 'tt1'}, {'_id': 'tt2'}]}
+        send = FlakyBulk({'tt2': [400]})
+        retry_failed(send, {a['_id']: a for a in letters[INDEX]}, INDEX, dead_letters)
+
+    assert [entry['action'] for entry in dead_letters] == [{'_id': 'tt2'}]
+
+
+def test_failed_replay_keeps_dead_letters(dead_letters):
+    put_failed(dead_letters, 'tt1', 'tt2')
+
+    def send(actions):
+        raise ConnectionError('ElasticSearch server is not available')
+
+    with raises(ConnectionError):
+        with dead_letters.replaying() as letters:
+            retry_failed(send, {a['_id']: a for a in letters[INDEX]}, INDEX, dead_letters)
+
+    assert [entry['action'] for entry in dead_letters] == [{'_id': 'tt1'}, {'_id': 'tt2'}]
+
+    # the interrupted replay is picked up together with letters queued since
+    put_failed(dead_letters, 'tt3')
+
+    with dead_letters.replaying() as letters:
+        assert letters == {INDEX: [{'_id': 'tt1'}, {'_id': 'tt2'}, {'_id': 'tt3'}]}
+
+    assert len(dead_letters) == 0
+
+
+if __name__ == '__main__':
+    main()
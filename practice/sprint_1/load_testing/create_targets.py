@@ -1,16 +1,36 @@
 """
 A module with a creator of targets for Vegeta
+
+Targets are streamed to a file: candidates are extracted by bulk queries
+and shuffled by chunks with a seeded generator, so the memory is bounded
+by a chunk and the same seed gives the same file.
+
+Run:
+    python -m practice.sprint_1.load_testing.create_targets --seed 42 --rounds 100
 """
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
-from random import choice, shuffle
-from sqlite3 import connect
+from argparse import ArgumentParser
+from contextlib import closing
+from dataclasses import dataclass, replace
+from itertools import chain
+from random import Random
+from sqlite3 import Connection
 from string import Template
 from typing import AnyStr, Dict, Union, List, Iterator, Iterable
 from urllib.parse import urlencode, urlparse, urlunparse, urljoin
 
-from common import op, SEARCH_SRV_DIR, SEARCH_SRV_URL
-from practice.sprint_1.etl.etl_requests import DB_ADDRESS, MovieDataExtractor
+from common import op, ETL_DIR, SEARCH_SRV_DIR, SEARCH_SRV_URL
+from practice.sprint_1.etl.batch import NOT_AVAILABLE, chunked
+from practice.sprint_1.etl.catalog import connect_readonly, iter_rows
+
+
+DB_ADDRESS = op.join(ETL_DIR, 'db.sqlite')
+SEED = 0
+SHUFFLE_CHUNK = 10000
+MIN_RATING = 7
+
+# field sets of the search service ("search_in" argument), the first is the default one
+SEARCH_FIELD_SETS = 'title', 'people', 'all'
 
 
 @dataclass
@@ -23,10 +43,11 @@ class VegetaTarget:
 class VegetaTargetFactory(ABC):
     """A class to create VegetaTarget object"""
 
-    def __init__(self, headers: Union[Dict[str, str], str] = '', body: AnyStr = ''):
+    def __init__(self, headers: Union[Dict[str, str], str] = '', body: AnyStr = '', rng: Random = None):
         self.headers = headers
         self.body = body
         self.params: List[str] = []
+        self.rng = rng or Random(SEED)
 
     def create(self, add_args: Dict[str, Iterable] = None) -> VegetaTarget:
         """Creates a target object
@@ -55,7 +76,7 @@ class VegetaTargetFactory(ABC):
         :param name: a name of URL parameter
         :param values: values to choose one from
         """
-        if value := choice(values):
+        if value := self.rng.choice(values):
             arg = urlencode({name: value})
             self.params.append(arg)
 
@@ -112,23 +133,28 @@ class SearchServiceTargetFactory(VegetaTargetFactory):
 class VegetaTargetsWriter:
     """Vegeta targets file creator"""
 
-    def __init__(self, target_list: Iterable[VegetaTarget], base_url: str = None):
+    def __init__(self, target_list: Iterable[VegetaTarget], base_url: str = None, seed: int = SEED,
+                 chunk_size: int = SHUFFLE_CHUNK):
         """Constructor
-        :param target_list: a sequence of VegetaTarget objects
+        :param target_list: a sequence of VegetaTarget objects, maybe a lazy one
         :param base_url: target's base_url
+        :param seed: seed of shuffling
+        :param chunk_size: amount of targets shuffled together
         """
         self.base_url = base_url or ''
         self.template = Template(f'GET $url$headers$body\n\n')
+        self.rng = Random(seed)
+        self.chunk_size = chunk_size
         self.targets = self._get_targets(target_list)
 
     def _get_targets(self, target_list: Iterable[VegetaTarget]) -> Iterator:
-        """Prepares targets list to write to a file
+        """Prepares targets to write to a file lazily, shuffled by chunks
         :param target_list: a sequence of VegetaTarget objects
         :return: an iterator of targets
         """
-        str_targets = [self.to_str(target) for target in target_list]
-        shuffle(str_targets)
-        return iter(str_targets)
+        for chunk in chunked(map(self.to_str, target_list), self.chunk_size):
+            self.rng.shuffle(chunk)
+            yield from chunk
 
     def to_file(self, file: str):
         """Starts extracting targets and writes it to a file
@@ -183,38 +209,77 @@ class VegetaTargetsWriter:
         return target_str
 
 
-if __name__ == '__main__':
+def add_url_args(target: VegetaTarget, args: Dict[str, str]) -> VegetaTarget:
+    """Returns a copy of the target with the arguments appended to its URL"""
+    url = target.url.rstrip('?&')
+    separator = '&' if '?' in url else '?'
+    return replace(target, url=url + separator + urlencode(args))
 
-    # getting high rated movies
-    with connect(DB_ADDRESS) as db:
-        extractor = MovieDataExtractor(db)
-        high_rated = [
-            extractor.get_movie(m_id)
-            for m_id in extractor.get_movies_ids('imdb_rating > 7')
-        ]
 
-    # creating objects for Vegeta targets
-    factory = SearchServiceTargetFactory()
-    search_args, persons = [], set()
+def get_search_args(db: Connection, min_rating: float = MIN_RATING) -> Iterator[Dict[str, list]]:
+    """Yields search arguments by titles of high rated movies and names of their actors and writers
+    :param db: database connection instance
+    :param min_rating: rating movies should be higher than
+    """
+    movies_query = """\
+        SELECT title, plot
+            FROM movies
+            WHERE CAST(imdb_rating AS REAL) > ?
+            ORDER BY id;
+        """
+    persons_query = """\
+        WITH rated AS (
+            SELECT id, writer, writers FROM movies WHERE CAST(imdb_rating AS REAL) > ?
+        ),
+        writers_ids AS (
+            SELECT writer AS id FROM rated WHERE writer != ''
+            UNION
+            SELECT json_extract(j.value, '$.id') FROM rated, json_each(nullif(rated.writers, '')) j
+        )
+        SELECT a.name
+            FROM actors a
+            JOIN movie_actors ma ON ma.actor_id = a.id
+            JOIN rated ON rated.id = ma.movie_id
+        UNION
+        SELECT w.name FROM writers w JOIN writers_ids wi ON wi.id = w.id
+        ORDER BY 1;
+        """
 
-    for movie in high_rated:
+    for title, plot in iter_rows(db.execute(movies_query, [min_rating])):
         # getting movie by title or description
-        short_title = movie.title[:len(movie.title) // 2]
-        short_description = movie.description[:len(movie.description) // 2] if movie.description else None
-        search_args.append({'search': [None, movie.title, short_title, short_description]})
+        short_title = title[:len(title) // 2]
+        short_description = plot[:len(plot) // 2] if plot and plot != NOT_AVAILABLE else None
+        yield {'search': [None, title, short_title, short_description]}
 
-        # getting actors and writers
-        for person in [*movie.actors, *movie.writers]:
-            persons.add(person.name)
+    for name, in iter_rows(db.execute(persons_query, [min_rating])):
+        if name != NOT_AVAILABLE:
+            yield {'search': [None, name]}
 
-    # getting search args by actors and writers
-    for person in persons:
-        search_args.append({'search': [None, person]})
 
-    # writing targets to the file
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Create Vegeta targets for the search service')
+    parser.add_argument('--seed', type=int, default=SEED, help='the same seed gives the same targets')
+    parser.add_argument('--rounds', type=int, default=1, help='passes over the movies, to make more targets')
+    parser.add_argument('--chunk-size', type=int, default=SHUFFLE_CHUNK, help='amount of targets shuffled together')
+    args = parser.parse_args()
+
+    # writing targets to a file per field set to compare their latency
     # https://github.com/KazakovDenis/praktikum/blob/master/search_service/tests/load/targets.txt
-    targets = map(factory.create, search_args)
-    filename = op.join(SEARCH_SRV_DIR, 'tests', 'load', 'targets.txt')
     base_url = urljoin(SEARCH_SRV_URL, '/api/v1/movies')
-    vegeta_writer = VegetaTargetsWriter(targets, base_url)
-    vegeta_writer.to_file(filename)
+
+    with closing(connect_readonly(DB_ADDRESS, immutable=True)) as db:
+
+        for field_set in SEARCH_FIELD_SETS:
+            # every field set gets the same random sequence, "search_in" is appended without drawing from it
+            factory = SearchServiceTargetFactory(rng=Random(args.seed))
+            search_args = chain.from_iterable(get_search_args(db) for _ in range(args.rounds))
+            targets = map(factory.create, search_args)
+
+            if field_set == SEARCH_FIELD_SETS[0]:
+                filename = op.join(SEARCH_SRV_DIR, 'tests', 'load', 'targets.txt')
+            else:
+                targets = (add_url_args(target, {'search_in': field_set}) for target in targets)
+                filename = op.join(SEARCH_SRV_DIR, 'tests', 'load', f'targets_{field_set}.txt')
+
+            vegeta_writer = VegetaTargetsWriter(targets, base_url, args.seed, args.chunk_size)
+            vegeta_writer.to_file(filename)
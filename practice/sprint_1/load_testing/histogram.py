@@ -0,0 +1,134 @@
+"""
+HDR-style latency histogram
+
+Values (microseconds) are counted in log-linear buckets: exact below 128,
+then 64 buckets per power of two, so any value is kept with a relative
+error below 1.6% at a constant memory whatever the range.
+
+Example:
+    histogram = LatencyHistogram()
+    histogram.record(1500)
+    histogram.percentile(99)
+"""
+from typing import Dict, Iterable, Tuple
+
+
+SUB_BUCKET_BITS = 7
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+HALF_BUCKETS = SUB_BUCKETS >> 1
+PERCENTILES = 50, 90, 99, 99.9
+
+
+def get_index(value: int) -> int:
+    """Returns an index of the bucket counting the value"""
+    if value < SUB_BUCKETS:
+        return value
+
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    return SUB_BUCKETS + (shift - 1) * HALF_BUCKETS + (value >> shift) - HALF_BUCKETS
+
+
+def get_bounds(index: int) -> Tuple[int, int]:
+    """Returns the lowest and the highest values of the bucket"""
+    if index < SUB_BUCKETS:
+        return index, index
+
+    shift, mantissa = divmod(index - SUB_BUCKETS, HALF_BUCKETS)
+    shift += 1
+    mantissa += HALF_BUCKETS
+    return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """Counts of latencies by log-linear buckets"""
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.total = 0
+        self.sum = 0
+        self.min = None
+        self.max = 0
+
+    def __len__(self):
+        return self.total
+
+    def record(self, value: int, count: int = 1):
+        """Counts a latency in microseconds"""
+        value = max(0, int(value))
+        index = get_index(value)
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.total += count
+        self.sum += value * count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = max(self.max, value)
+
+    def record_corrected(self, value: int, expected_interval: int, count: int = 1):
+        """Counts a latency and the requests a stalled closed-loop client did not send
+
+        A client waiting for a slow response does not send requests scheduled
+        meanwhile, so their latencies are missing (coordinated omission).
+        They are filled in as value - interval, value - 2 * interval, ...
+        """
+        self.record(value, count)
+
+        if expected_interval <= 0:
+            return
+
+        missing = value - expected_interval
+        while missing >= expected_interval:
+            self.record(missing, count)
+            missing -= expected_interval
+
+    def copy_corrected(self, expected_interval: int) -> 'LatencyHistogram':
+        """Returns a copy corrected for coordinated omission by bucket values"""
+        corrected = LatencyHistogram()
+
+        for index, count in sorted(self.counts.items()):
+            value = min(get_bounds(index)[1], self.max)
+            corrected.record_corrected(value, expected_interval, count)
+
+        corrected.min = self.min
+        return corrected
+
+    def merge(self, other: 'LatencyHistogram'):
+        """Adds counts of another histogram"""
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+
+        self.total += other.total
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.total if self.total else 0.0
+
+    def percentile(self, percent: float) -> int:
+        """Returns the highest value of the bucket the percentile falls into"""
+        if not self.total:
+            return 0
+
+        rank = max(1, round(percent / 100 * self.total))
+        seen = 0
+
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(get_bounds(index)[1], self.max)
+
+        return self.max
+
+    def percentiles(self, percents: Iterable[float] = PERCENTILES) -> Dict[str, int]:
+        return {f'p{percent:g}': self.percentile(percent) for percent in percents}
+
+    def summary(self) -> dict:
+        """Returns count, bounds, mean and percentiles in microseconds"""
+        return {
+            'count': self.total,
+            'min': self.min or 0,
+            'mean': round(self.mean),
+            **self.percentiles(),
+            'max': self.max,
+        }
@@ -0,0 +1,143 @@
+"""
+Workload replay from the search service access log
+
+Requests logged by srv_search are turned into VegetaTarget objects with
+their original offsets, so a load test reproduces the real mix of
+repeated queries, deep pages and endpoints, and its timing. The timing
+can be compressed and long idle gaps cut.
+
+Run:
+    python -m practice.sprint_1.load_testing.replay log/search_srv.log --describe
+    python -m practice.sprint_1.load_testing.replay log/search_srv.log --speedup 10 --max-gap 1
+    python -m practice.sprint_1.load_testing.replay log/search_srv.log --targets-out replay.txt
+"""
+from argparse import ArgumentParser
+import asyncio
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime
+import json
+import re
+from typing import Iterable, Iterator, List
+from urllib.parse import parse_qs, urljoin, urlsplit
+
+from common import SEARCH_SRV_URL
+from practice.sprint_1.load_testing.create_targets import VegetaTarget, VegetaTargetsWriter
+from practice.sprint_1.load_testing.runner import CONNECTIONS, TIMEOUT, LoadResult, LoadRunner
+
+
+LOGGER_NAME = 'srv_search'
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S,%f'
+# common.LOG_FORMAT with the message of srv_search.api.blueprint.log_request
+LOG_LINE = re.compile(
+    r'^\[(?P<time>\d{4}-\d\d-\d\d \d\d:\d\d:\d\d,\d{3})\] @(?P<name>\S+) \w+ in \w+: '
+    r'(?P<method>[A-Z]+) (?P<path>/\S*) FROM: \S+'
+)
+MOVIE_PATH = re.compile(r'/movies/[^/]+$')
+DEEP_PAGE = 10
+
+
+@dataclass
+class LogRecord:
+    time: datetime
+    method: str
+    path: str
+
+
+@dataclass
+class ReplayEntry:
+    offset: float
+    target: VegetaTarget
+
+
+def parse_log(lines: Iterable[str], logger_name: str = LOGGER_NAME) -> Iterator[LogRecord]:
+    """Parses access log lines, the other ones are skipped"""
+    for line in lines:
+        match = LOG_LINE.match(line)
+
+        if match and match['name'] == logger_name:
+            yield LogRecord(datetime.strptime(match['time'], TIME_FORMAT), match['method'], match['path'])
+
+
+def read_log(file: str, logger_name: str = LOGGER_NAME) -> Iterator[LogRecord]:
+    with open(file, encoding='utf-8') as f:
+        yield from parse_log(f, logger_name)
+
+
+def get_workload(records: Iterable[LogRecord], base_url: str = SEARCH_SRV_URL, speedup: float = 1.0,
+                 max_gap: float = None) -> Iterator[ReplayEntry]:
+    """Converts GET requests of the log to targets with offsets since the first one
+
+    :param records: access log records in order of time
+    :param base_url: URL of the service to replay to
+    :param speedup: how many times to compress the timing
+    :param max_gap: max seconds between requests after compression, to cut idle periods
+    """
+    offset, previous = 0.0, None
+
+    for record in records:
+        if record.method != 'GET':
+            continue
+
+        if previous:
+            gap = (record.time - previous).total_seconds() / speedup
+            offset += min(gap, max_gap) if max_gap is not None else gap
+
+        previous = record.time
+        yield ReplayEntry(offset, VegetaTarget(urljoin(base_url, record.path)))
+
+
+def describe(entries: Iterable[ReplayEntry]) -> dict:
+    """Returns the mix of a workload: repeated requests, pages, endpoints and rate"""
+    seen, pages, endpoints = Counter(), Counter(), Counter()
+    duration = 0.0
+
+    for entry in entries:
+        url = urlsplit(entry.target.url)
+        seen[entry.target.url] += 1
+        endpoints[MOVIE_PATH.sub('/movies/<movie_id>', url.path)] += 1
+        page = parse_qs(url.query).get('page', ['1'])[0]
+        pages[int(page) if page.isdigit() else 1] += 1
+        duration = entry.offset
+
+    requests = sum(seen.values())
+    return {
+        'requests': requests,
+        'duration': duration,
+        'rate': requests / duration if duration else 0.0,
+        # the upper bound of cache hits: requests seen before
+        'repeated_share': (requests - len(seen)) / requests if requests else 0.0,
+        'deep_pages_share': sum(n for page, n in pages.items() if page > DEEP_PAGE) / requests if requests else 0.0,
+        'pages': dict(sorted(pages.items())),
+        'endpoints': dict(endpoints.most_common()),
+    }
+
+
+def replay(entries: Iterable[ReplayEntry], connections: int = CONNECTIONS, timeout: float = TIMEOUT) -> LoadResult:
+    """Sends the workload keeping its timing"""
+    runner = LoadRunner([], connections, timeout)
+    return asyncio.run(runner.scheduled((entry.offset, entry.target) for entry in entries))
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Replay the search service access log')
+    parser.add_argument('log', help='access log file')
+    parser.add_argument('--base-url', default=SEARCH_SRV_URL, help='service to replay to')
+    parser.add_argument('-s', '--speedup', type=float, default=1.0, help='compress the timing N times')
+    parser.add_argument('--max-gap', type=float, help='max seconds between requests')
+    parser.add_argument('--describe', action='store_true', help='print the workload mix only')
+    parser.add_argument('--targets-out', help='write Vegeta targets in the log order instead of replaying')
+    parser.add_argument('--timeout', type=float, default=TIMEOUT, help='request timeout, seconds')
+    args = parser.parse_args()
+
+    workload: List[ReplayEntry] = list(
+        get_workload(read_log(args.log), args.base_url, args.speedup, args.max_gap)
+    )
+
+    if args.describe:
+        print(json.dumps(describe(workload), indent=2))
+    elif args.targets_out:
+        # one target per chunk keeps the order
+        VegetaTargetsWriter((entry.target for entry in workload), chunk_size=1).to_file(args.targets_out)
+    else:
+        print(replay(workload, timeout=args.timeout).report())
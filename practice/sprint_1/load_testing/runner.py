@@ -0,0 +1,342 @@
+"""
+Load test runner for the search service and the admin API
+
+Sends requests of VegetaTarget objects with asyncio, in one of modes:
+- open loop: requests start at a constant rate whatever the responses,
+  latency is measured from the time a request was scheduled;
+- closed loop: N clients send requests one after another, optionally
+  paced to a rate. Latency from the scheduled time is corrected for
+  coordinated omission: a stalled client does not hide stalled requests.
+
+Run:
+    python -m practice.sprint_1.load_testing.runner srv_search/tests/load/targets.txt --rate 100 --duration 10
+    python -m practice.sprint_1.load_testing.runner --url http://127.0.0.1:8000/api/movies/ --concurrency 20
+"""
+from argparse import ArgumentParser
+import asyncio
+from collections import Counter
+from dataclasses import dataclass, field
+from itertools import count, cycle, takewhile
+import json
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+from urllib.parse import urlsplit
+
+from practice.sprint_1.load_testing.create_targets import VegetaTarget
+from practice.sprint_1.load_testing.histogram import LatencyHistogram
+
+
+CONNECTIONS = 64
+TIMEOUT = 2.0
+USER_AGENT = 'praktikum-load/1.0'
+
+Address = Tuple[str, str, int]
+
+
+def read_targets(file: str) -> Iterator[VegetaTarget]:
+    """Reads targets of Vegeta HTTP format, as written by VegetaTargetsWriter"""
+    with open(file) as f:
+        blocks = f.read().split('\n\n')
+
+    for block in filter(str.strip, blocks):
+        request_line, *lines = block.strip().splitlines()
+        _, url = request_line.split(maxsplit=1)
+        headers = [line for line in lines if ': ' in line]
+        body = '\n'.join(line for line in lines if ': ' not in line)
+        yield VegetaTarget(url, '\n'.join(headers), body)
+
+
+def get_headers(target: VegetaTarget) -> Dict[str, str]:
+    """Returns target headers as a dict"""
+    if isinstance(target.headers, dict):
+        return target.headers
+
+    return dict(line.split(': ', 1) for line in target.headers.splitlines() if line)
+
+
+class HTTPConnection:
+    """A minimal keep-alive HTTP/1.1 client connection over asyncio streams"""
+
+    def __init__(self, scheme: str, host: str, port: int):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(
+            self.host, self.port, ssl=self.scheme == 'https'
+        )
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    async def request(self, method: str, path: str, headers: Dict[str, str], body: bytes = b'') -> int:
+        """Sends a request and reads the whole response
+        :return: response status
+        """
+        if self.writer is None or self.writer.is_closing():
+            await self.connect()
+
+        head = [f'{method} {path} HTTP/1.1', f'Host: {self.host}:{self.port}', f'User-Agent: {USER_AGENT}']
+        head.extend(f'{name}: {value}' for name, value in headers.items())
+        if body:
+            head.append(f'Content-Length: {len(body)}')
+
+        self.writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError('Connection closed by server')
+
+        status = int(status_line.split()[1])
+        response_headers = {}
+
+        while (line := await self.reader.readline()) not in (b'\r\n', b'\n', b''):
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+
+        await self._read_body(response_headers, method == 'HEAD' or status in (204, 304))
+
+        if response_headers.get('connection', '').lower() == 'close' or status_line.startswith(b'HTTP/1.0'):
+            self.close()
+
+        return status
+
+    async def _read_body(self, headers: Dict[str, str], empty: bool):
+        if empty:
+            return
+
+        if 'content-length' in headers:
+            await self.reader.readexactly(int(headers['content-length']))
+        elif headers.get('transfer-encoding', '').lower() == 'chunked':
+            while size := int((await self.reader.readline()).split(b';')[0], 16):
+                await self.reader.readexactly(size + 2)
+            await self.reader.readline()
+        else:
+            await self.reader.read()
+            self.close()
+
+
+class ConnectionPool:
+    """Keep-alive connections by address, at most `size` at once"""
+
+    def __init__(self, size: int = CONNECTIONS):
+        self.slots = asyncio.Semaphore(size)
+        self.idle: Dict[Address, list] = {}
+
+    async def request(self, address: Address, method: str, path: str, headers: Dict[str, str],
+                      body: bytes = b'') -> int:
+        async with self.slots:
+            idle = self.idle.setdefault(address, [])
+            connection = idle.pop() if idle else HTTPConnection(*address)
+
+            try:
+                status = await connection.request(method, path, headers, body)
+            except BaseException:
+                connection.close()
+                raise
+
+            idle.append(connection)
+            return status
+
+    def close(self):
+        for connections in self.idle.values():
+            for connection in connections:
+                connection.close()
+        self.idle.clear()
+
+
+@dataclass
+class LoadResult:
+    """Latencies in microseconds and outcomes of a run"""
+    service: LatencyHistogram = field(default_factory=LatencyHistogram)
+    response: LatencyHistogram = field(default_factory=LatencyHistogram)
+    statuses: Counter = field(default_factory=Counter)
+    errors: Counter = field(default_factory=Counter)
+    duration: float = 0.0
+
+    @property
+    def requests(self) -> int:
+        return sum(self.statuses.values()) + sum(self.errors.values())
+
+    @property
+    def failed(self) -> int:
+        return sum(n for status, n in self.statuses.items() if status >= 400) + sum(self.errors.values())
+
+    def summary(self) -> dict:
+        requests = self.requests
+        return {
+            'requests': requests,
+            'duration': self.duration,
+            'throughput': requests / self.duration if self.duration else 0.0,
+            'error_rate': self.failed / requests if requests else 0.0,
+            'statuses': {str(status): n for status, n in sorted(self.statuses.items())},
+            'errors': dict(self.errors),
+            # time from sending a request to the response
+            'service_time_us': self.service.summary(),
+            # time from the scheduled start, corrected for coordinated omission
+            'response_time_us': self.response.summary(),
+        }
+
+    def report(self) -> str:
+        s = self.summary()
+        lines = [
+            f"{s['requests']} requests in {s['duration']:.2f} s, {s['throughput']:.1f} req/s, "
+            f"{s['error_rate']:.2%} errors",
+            f"statuses: {s['statuses']} errors: {s['errors']}",
+        ]
+        for name in ('service_time_us', 'response_time_us'):
+            latency = s[name]
+            percentiles = ' '.join(f'{k}={v / 1000:.1f}' for k, v in latency.items() if k.startswith('p'))
+            lines.append(f"{name[:-3]:<14} ms: mean={latency['mean'] / 1000:.1f} {percentiles} "
+                         f"max={latency['max'] / 1000:.1f}")
+        return '\n'.join(lines)
+
+
+class LoadRunner:
+    """Sends targets in open or closed loop and measures latencies
+
+    Example:
+        runner = LoadRunner(read_targets('targets.txt'))
+        result = asyncio.run(runner.open_loop(rate=100, duration=10))
+        print(result.report())
+    """
+
+    def __init__(self, targets: Iterable[VegetaTarget], connections: int = CONNECTIONS, timeout: float = TIMEOUT):
+        self.targets = cycle(targets)
+        self.connections = connections
+        self.timeout = timeout
+        self.pool: Optional[ConnectionPool] = None
+
+    @staticmethod
+    def _prepare(target: VegetaTarget) -> Tuple[Address, str, Dict[str, str], bytes]:
+        url = urlsplit(target.url)
+        port = url.port or (443 if url.scheme == 'https' else 80)
+        path = (url.path or '/') + (f'?{url.query}' if url.query else '')
+        body = target.body.encode() if isinstance(target.body, str) else target.body
+        return (url.scheme, url.hostname, port), path, get_headers(target), body
+
+    async def _send(self, result: LoadResult, scheduled: float, target: VegetaTarget = None):
+        """Sends a target, the next one by default, records its latencies since sending and since the scheduled time"""
+        loop = asyncio.get_running_loop()
+        address, path, headers, body = self._prepare(target or next(self.targets))
+        sent = loop.time()
+
+        try:
+            status = await asyncio.wait_for(
+                self.pool.request(address, 'POST' if body else 'GET', path, headers, body), self.timeout
+            )
+            result.statuses[status] += 1
+        except asyncio.TimeoutError:
+            result.errors['timeout'] += 1
+        except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+            result.errors[type(e).__name__] += 1
+
+        finished = loop.time()
+        result.service.record((finished - sent) * 1e6)
+        result.response.record((finished - scheduled) * 1e6)
+
+    async def scheduled(self, schedule: Iterable[Tuple[float, Optional[VegetaTarget]]]) -> LoadResult:
+        """Starts requests at their offsets from the start whatever the responses
+        :param schedule: seconds since the start and targets, the next of self.targets if None
+        """
+        loop = asyncio.get_running_loop()
+        self.pool = ConnectionPool(self.connections)
+        result = LoadResult()
+        tasks = set()
+        start = loop.time()
+
+        for offset, target in schedule:
+            scheduled = start + offset
+
+            if (delay := scheduled - loop.time()) > 0:
+                await asyncio.sleep(delay)
+
+            task = asyncio.create_task(self._send(result, scheduled, target))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        await asyncio.gather(*tasks)
+        result.duration = loop.time() - start
+        self.pool.close()
+        return result
+
+    async def open_loop(self, rate: float, duration: float) -> LoadResult:
+        """Starts requests at a constant rate whatever the responses
+        :param rate: requests per second
+        :param duration: seconds to send requests for
+        """
+        offsets = takewhile(lambda offset: offset < duration, (i / rate for i in count()))
+        return await self.scheduled((offset, None) for offset in offsets)
+
+    async def closed_loop(self, concurrency: int, duration: float, rate: float = None) -> LoadResult:
+        """Sends requests by concurrent clients, each waits for a response before the next request
+        :param concurrency: amount of clients
+        :param duration: seconds to send requests for
+        :param rate: total requests per second to pace the clients to, as fast as possible if not set
+        """
+        loop = asyncio.get_running_loop()
+        self.pool = ConnectionPool(max(self.connections, concurrency))
+        result = LoadResult()
+        start = loop.time()
+        interval = concurrency / rate if rate else 0.0
+
+        async def client(number: int):
+            scheduled = start + number * interval / concurrency
+
+            while scheduled - start < duration and loop.time() - start < duration:
+                if (delay := scheduled - loop.time()) > 0:
+                    await asyncio.sleep(delay)
+
+                # a late request keeps the schedule, so its wait is counted in the response time
+                await self._send(result, scheduled if rate else loop.time())
+                scheduled = scheduled + interval if rate else loop.time()
+
+        await asyncio.gather(*(client(n) for n in range(concurrency)))
+        result.duration = loop.time() - start
+        self.pool.close()
+
+        if not rate:
+            # without a schedule clients are expected to send at the pace of a typical response
+            result.response = result.service.copy_corrected(result.service.percentile(50))
+
+        return result
+
+
+def main(targets: Iterable[VegetaTarget], rate: float = None, concurrency: int = None, duration: float = 10,
+         connections: int = CONNECTIONS, timeout: float = TIMEOUT) -> LoadResult:
+    """Runs a load test in open loop if only rate is set, in closed loop otherwise"""
+    runner = LoadRunner(targets, connections, timeout)
+
+    if concurrency:
+        return asyncio.run(runner.closed_loop(concurrency, duration, rate))
+
+    return asyncio.run(runner.open_loop(rate or 1, duration))
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Load test the search service or the admin API')
+    parser.add_argument('targets', nargs='?', help='file of Vegeta targets')
+    parser.add_argument('--url', help='a single URL to request instead of targets')
+    parser.add_argument('-r', '--rate', type=float, help='requests per second, open loop if no concurrency')
+    parser.add_argument('-c', '--concurrency', type=int, help='amount of clients of closed loop')
+    parser.add_argument('-d', '--duration', type=float, default=10, help='seconds')
+    parser.add_argument('--connections', type=int, default=CONNECTIONS, help='max connections of open loop')
+    parser.add_argument('--timeout', type=float, default=TIMEOUT, help='request timeout, seconds')
+    parser.add_argument('-o', '--output', help='save the summary to a JSON file')
+    args = parser.parse_args()
+
+    if not (args.targets or args.url):
+        parser.error('targets file or --url is required')
+
+    load_targets = [VegetaTarget(args.url)] if args.url else list(read_targets(args.targets))
+    load_result = main(load_targets, args.rate, args.concurrency, args.duration, args.connections, args.timeout)
+    print(load_result.report())
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(load_result.summary(), output, indent=2)
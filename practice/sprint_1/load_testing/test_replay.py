@@ -0,0 +1,59 @@
+import asyncio
+
+from pytest import approx, main
+
+from practice.sprint_1.load_testing.replay import describe, get_workload, parse_log
+from practice.sprint_1.load_testing.runner import LoadRunner
+from practice.sprint_1.load_testing.test_runner import StandIn, run_against
+
+
+LOG = """\
+[2021-03-01 12:00:00,000] @srv_search INFO in blueprint: GET /api/v1/movies/?search=star FROM: 127.0.0.1 STATUS: 200
+[2021-03-01 12:00:00,500] @uncaught CRITICAL in utils: ('boom',)
+[2021-03-01 12:00:00,500] @srv_search INFO in blueprint: GET /api/v1/movies/?search=star FROM: 127.0.0.1 STATUS: 200
+[2021-03-01 12:00:01,000] @srv_search INFO in blueprint: GET /api/v1/movies/?page=20&limit=10 FROM: 10.0.0.2 STATUS: 200
+[2021-03-01 12:00:01,000] @srv_search INFO in blueprint: POST /api/v1/movies/ FROM: 10.0.0.2 STATUS: 405
+[2021-03-01 12:01:01,000] @srv_search INFO in blueprint: GET /api/v1/movies/tt0076759 FROM: 10.0.0.3 STATUS: 200
+[2021-03-01 12:01:01,000] @srv_search INFO in blueprint: GET request FROM: 10.0.0.3
+"""
+
+
+def test_parse_log():
+    records = list(parse_log(LOG.splitlines()))
+    assert [r.method for r in records] == ['GET', 'GET', 'GET', 'POST', 'GET']
+    assert records[2].path == '/api/v1/movies/?page=20&limit=10'
+
+
+def test_workload_timing():
+    records = list(parse_log(LOG.splitlines()))
+
+    assert [e.offset for e in get_workload(records)] == [0, 0.5, 1, 61]
+    assert [e.offset for e in get_workload(records, speedup=10)] == approx([0, 0.05, 0.1, 6.1])
+    assert [e.offset for e in get_workload(records, max_gap=1)] == [0, 0.5, 1, 2]
+
+    entry = next(get_workload(records, base_url='http://search:8000'))
+    assert entry.target.url == 'http://search:8000/api/v1/movies/?search=star'
+
+
+def test_describe():
+    mix = describe(get_workload(parse_log(LOG.splitlines())))
+    assert mix['requests'] == 4
+    assert mix['repeated_share'] == 0.25
+    assert mix['deep_pages_share'] == 0.25
+    assert mix['endpoints'] == {'/api/v1/movies/': 3, '/api/v1/movies/<movie_id>': 1}
+
+
+def test_replay_keeps_timing():
+    records = list(parse_log(LOG.splitlines()))
+
+    def load(url):
+        workload = get_workload(records, base_url=url, speedup=10, max_gap=0.1)
+        return LoadRunner([]).scheduled((e.offset, e.target) for e in workload)
+
+    result = run_against(StandIn(), load)
+    assert result.statuses == {200: 4}
+    assert 0.2 <= result.duration < 0.5
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+import asyncio
+from random import Random
+
+from pytest import approx, fixture, main
+
+from practice.sprint_1.load_testing.create_targets import VegetaTarget, VegetaTargetsWriter
+from practice.sprint_1.load_testing.histogram import LatencyHistogram
+from practice.sprint_1.load_testing.runner import LoadRunner, read_targets
+
+
+class StandIn:
+    """A local HTTP server answering instantly, /stall once slowly, /missing with 404"""
+
+    def __init__(self, stall: float = 0.2):
+        self.stall = stall
+        self.stalled = False
+        self.requests = 0
+
+    async def handle(self, reader, writer):
+        while request_line := await reader.readline():
+            while await reader.readline() not in (b'\r\n', b''):
+                pass
+
+            self.requests += 1
+            path = request_line.split()[1].decode()
+
+            if path == '/stall' and not self.stalled:
+                self.stalled = True
+                await asyncio.sleep(self.stall)
+
+            status = '404 Not Found' if path == '/missing' else '200 OK'
+            writer.write(f'HTTP/1.1 {status}\r\nContent-Length: 2\r\n\r\n[]'.encode())
+            await writer.drain()
+
+        writer.close()
+
+
+def run_against(stand_in: StandIn, make_load):
+    """Runs a load coroutine while the stand-in server is listening"""
+
+    async def run():
+        server = await asyncio.start_server(stand_in.handle, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            return await make_load(f'http://127.0.0.1:{port}')
+
+    return asyncio.run(run())
+
+
+@fixture
+def stand_in():
+    return StandIn()
+
+
+def test_histogram_percentiles():
+    values = [Random(0).randrange(100, 100000) for _ in range(10000)]
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+
+    ordered = sorted(values)
+    for percent in (50, 90, 99):
+        assert histogram.percentile(percent) == approx(ordered[int(percent / 100 * len(values)) - 1], rel=0.02)
+    assert (histogram.min, histogram.max) == (ordered[0], ordered[-1])
+
+
+def test_coordinated_omission_correction():
+    histogram = LatencyHistogram()
+    for _ in range(99):
+        histogram.record(1000)
+    histogram.record(100000)
+
+    corrected = histogram.copy_corrected(expected_interval=1000)
+    assert histogram.percentile(99) == approx(1000, rel=0.01)
+    assert corrected.total == 99 + 100
+    assert corrected.percentile(99) > 90000
+
+
+def test_read_targets(tmp_path):
+    file = tmp_path / 'targets.txt'
+    targets = [VegetaTarget('http://localhost/a?x=1'), VegetaTarget('http://localhost/b', 'Accept: */*')]
+    VegetaTargetsWriter(targets, chunk_size=1).to_file(str(file))
+    assert list(read_targets(str(file))) == targets
+
+
+def test_open_loop(stand_in):
+    def load(url):
+        runner = LoadRunner([VegetaTarget(f'{url}/ok'), VegetaTarget(f'{url}/missing')])
+        return runner.open_loop(rate=200, duration=0.25)
+
+    result = run_against(stand_in, load)
+    assert result.requests == stand_in.requests == 50
+    assert result.statuses == {200: 25, 404: 25}
+    assert result.summary()['error_rate'] == 0.5
+    assert result.service.total == result.response.total == 50
+
+
+def test_closed_loop_stall_is_not_hidden(stand_in):
+    def load(url):
+        runner = LoadRunner([VegetaTarget(f'{url}/stall')])
+        return runner.closed_loop(concurrency=1, duration=0.5, rate=100)
+
+    result = run_against(stand_in, load)
+    # the client sent nothing while stalled, but requests scheduled meanwhile were late
+    assert result.service.percentile(90) < 20000
+    assert result.response.percentile(90) > 50000
+    assert result.errors == {}
+
+
+def test_timeout(stand_in):
+    stand_in.stall = 1
+
+    def load(url):
+        runner = LoadRunner([VegetaTarget(f'{url}/stall')], timeout=0.05)
+        return runner.closed_loop(concurrency=1, duration=0.01)
+
+    result = run_against(stand_in, load)
+    assert result.errors == {'timeout': 1}
+
+
+if __name__ == '__main__':
+    main()
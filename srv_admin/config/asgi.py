@@ -11,6 +11,11 @@ import os
 
 from django.core.asgi import get_asgi_application
 
+from config.db.pool import warm_up
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_asgi_application()
+
+# open pooled connections before the first request
+warm_up()
@@ -0,0 +1,47 @@
+"""
+PostgreSQL backend taking connections from a pool
+
+Django closes the connection at the end of a request when CONN_MAX_AGE = 0,
+this backend returns it to the pool instead, so requests don't pay
+for connection setup. Pool settings are read from OPTIONS['pool'],
+see config.db.pool.POOL_DEFAULTS.
+"""
+from django.db.backends.postgresql import base
+from django.utils.asyncio import async_unsafe
+import psycopg2.extras
+
+from .pool import ConnectionPool, get_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self) -> dict:
+        conn_params = super().get_connection_params()
+        conn_params.pop('pool', None)
+        return conn_params
+
+    def get_pool(self) -> ConnectionPool:
+        """Returns the pool of this database alias"""
+        options = self.settings_dict['OPTIONS'].get('pool')
+        return get_pool(self.alias, options, self.get_connection_params())
+
+    @async_unsafe
+    def get_new_connection(self, conn_params):
+        connection = self.get_pool().acquire()
+
+        # the same as in the parent, but for a connection from the pool
+        options = self.settings_dict['OPTIONS']
+        try:
+            self.isolation_level = options['isolation_level']
+        except KeyError:
+            self.isolation_level = connection.isolation_level
+        else:
+            if self.isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+        psycopg2.extras.register_default_jsonb(conn_or_curs=connection, loads=lambda x: x)
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.get_pool().release(self.connection)
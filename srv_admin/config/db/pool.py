@@ -0,0 +1,118 @@
+"""
+Per-process pools of PostgreSQL connections
+
+min_size connections are opened with the pool, the others on demand, and
+all of them are kept open when returned. When max_size connections are
+checked out, a thread waits for a returned one up to "timeout" seconds.
+"""
+import os
+import threading
+import time
+
+from psycopg2 import Error as DatabaseError, OperationalError
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+
+
+POOL_DEFAULTS = {
+    # connections opened with the pool
+    'min_size': 1,
+    'max_size': 10,
+    # seconds to wait for a free connection when all of them are checked out
+    'timeout': 10,
+    # seconds a connection may be idle before it's checked by SELECT 1
+    'health_check_interval': 30,
+}
+
+_pools = {}
+_lock = threading.Lock()
+
+
+class ConnectionPool(ThreadedConnectionPool):
+    """Thread-safe pool checking idle connections before handing them out"""
+
+    def __init__(self, min_size: int, max_size: int, health_check_interval: float, timeout: float = None,
+                 **conn_params):
+        self.health_check_interval = health_check_interval
+        self.timeout = POOL_DEFAULTS['timeout'] if timeout is None else timeout
+        self._released_at = {}
+        self._slots = threading.BoundedSemaphore(max_size)
+        super().__init__(min_size, max_size, **conn_params)
+        # the parent closes returned connections above minconn, so a burst would reconnect every time
+        self.minconn = self.maxconn
+
+    def acquire(self):
+        """Returns a healthy connection, the broken ones are dropped
+
+        :raises OperationalError: no connection is returned to the pool in time or it's closed
+        """
+        if not self._slots.acquire(timeout=self.timeout):
+            raise OperationalError(f'All {self.maxconn} connections of the pool are busy for {self.timeout} s')
+
+        try:
+            while True:
+                connection = self.getconn()
+
+                if self.is_healthy(connection):
+                    return connection
+
+                self.putconn(connection, close=True)
+        except PoolError as e:
+            self._slots.release()
+            raise OperationalError(f'Unable to get a connection from the pool: {e}') from e
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, connection, close: bool = False):
+        """Returns the connection to the pool"""
+        self._released_at[id(connection)] = time.monotonic()
+        try:
+            self.putconn(connection, close=close)
+        finally:
+            self._slots.release()
+
+    def is_healthy(self, connection) -> bool:
+        """Checks a connection which has been idle for too long"""
+        if connection.closed:
+            return False
+
+        released_at = self._released_at.pop(id(connection), None)
+        if released_at is None or time.monotonic() - released_at < self.health_check_interval:
+            return True
+
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if not connection.autocommit:
+                connection.rollback()
+        except DatabaseError:
+            return False
+
+        return True
+
+
+def get_pool(alias: str, options: dict, conn_params: dict) -> ConnectionPool:
+    """Returns the pool of the database alias, creates it on the first call
+    :param alias: database alias from settings.DATABASES
+    :param options: pool options overriding POOL_DEFAULTS
+    :param conn_params: psycopg2 connection parameters
+    """
+    # a forked worker must not share sockets with its parent
+    key = alias, os.getpid()
+
+    if key not in _pools:
+        with _lock:
+            if key not in _pools:
+                _pools[key] = ConnectionPool(**{**POOL_DEFAULTS, **(options or {})}, **conn_params)
+
+    return _pools[key]
+
+
+def warm_up():
+    """Opens pools of all pooled databases before the first request"""
+    from django.db import connections
+    from .base import DatabaseWrapper
+
+    for connection in connections.all():
+        if isinstance(connection, DatabaseWrapper):
+            connection.get_pool()
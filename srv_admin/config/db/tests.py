@@ -0,0 +1,75 @@
+import threading
+from unittest import TestCase, mock
+
+from psycopg2 import OperationalError, extensions
+
+from .pool import ConnectionPool
+
+
+class FakeConnection:
+    """An idle psycopg2 connection which doesn't reach a server"""
+
+    def __init__(self, *args, **kwargs):
+        self.closed = 0
+        self.autocommit = True
+        self.info = mock.Mock(transaction_status=extensions.TRANSACTION_STATUS_IDLE)
+
+    def close(self):
+        self.closed = 1
+
+
+class ConnectionPoolTest(TestCase):
+
+    def setUp(self):
+        patcher = mock.patch('psycopg2.connect', side_effect=FakeConnection)
+        self.connect = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pool = ConnectionPool(min_size=1, max_size=2, health_check_interval=30, timeout=0.1)
+        self.addCleanup(self.close_pool)
+
+    def close_pool(self):
+        if not self.pool.closed:
+            self.pool.closeall()
+
+    def test_checkout_and_return(self):
+        first = self.pool.acquire()
+        second = self.pool.acquire()
+        self.assertIsNot(first, second)
+
+        self.pool.release(first)
+        self.assertIs(self.pool.acquire(), first)
+
+    def test_returned_connections_are_kept_open(self):
+        # a burst above min_size doesn't reconnect when it's repeated
+        for _ in range(3):
+            connections = [self.pool.acquire(), self.pool.acquire()]
+            for connection in connections:
+                self.pool.release(connection)
+
+        self.assertEqual(self.connect.call_count, 2)
+        self.assertFalse(any(connection.closed for connection in connections))
+
+    def test_exhausted_pool_waits_for_a_connection(self):
+        connection = self.pool.acquire()
+        self.pool.acquire()
+        timer = threading.Timer(0.02, self.pool.release, [connection])
+        timer.start()
+        self.addCleanup(timer.cancel)
+
+        self.assertIs(self.pool.acquire(), connection)
+
+    def test_exhausted_pool_raises_operational_error(self):
+        self.pool.acquire()
+        self.pool.acquire()
+
+        with self.assertRaises(OperationalError):
+            self.pool.acquire()
+
+    def test_closed_pool_raises_operational_error(self):
+        self.pool.closeall()
+
+        with self.assertRaises(OperationalError):
+            self.pool.acquire()
+
+        # the slot is returned on failure
+        self.assertTrue(self.pool._slots.acquire(blocking=False))
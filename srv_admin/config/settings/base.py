@@ -41,6 +41,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'movies',
 ]
@@ -91,6 +92,8 @@ DATABASES = {
         'PASSWORD': os.getenv('POSTGRES_PASS', 'postgres'),
         'HOST': os.getenv('POSTGRES_IP', '127.0.0.1'),
         'PORT': '5432',
+        # persistent connections, production.py switches to a pool
+        'CONN_MAX_AGE': int(os.getenv('POSTGRES_CONN_MAX_AGE', 60)),
         'OPTIONS': {
             # тогда таблицы Django создаются в этой же схеме
             # 'options': '-c search_path=content,public;',
@@ -99,6 +102,27 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'movies': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'movies',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
+# rendered movie details, invalidated by movies.signals
+MOVIES_CACHE_ALIAS = 'movies'
+MOVIES_CACHE_TIMEOUT = int(os.getenv('MOVIES_CACHE_TIMEOUT', 60 * 60))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
 
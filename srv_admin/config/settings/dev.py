@@ -3,6 +3,9 @@ from .base import *
 
 DEBUG = True
 
+# runserver handles every request in a new thread, persistent connections would leak
+DATABASES['default']['CONN_MAX_AGE'] = 0
+
 INSTALLED_APPS.extend([
     'django_extensions',
     'debug_toolbar',
@@ -4,3 +4,22 @@ from .base import *
 ALLOWED_HOSTS.extend([
     '*',
 ])
+
+# connections are returned to the pool of config.db at the end of each request
+DATABASES['default'].update({
+    'ENGINE': 'config.db',
+    'CONN_MAX_AGE': 0,
+})
+DATABASES['default']['OPTIONS']['pool'] = {
+    'min_size': int(os.getenv('POSTGRES_POOL_MIN', 2)),
+    'max_size': int(os.getenv('POSTGRES_POOL_MAX', 10)),
+    'timeout': float(os.getenv('POSTGRES_POOL_TIMEOUT', 10)),
+    'health_check_interval': int(os.getenv('POSTGRES_POOL_CHECK_INTERVAL', 30)),
+}
+
+# the cache should be shared between workers to be invalidated everywhere
+CACHES['movies'] = {
+    'BACKEND': 'django_redis.cache.RedisCache',
+    'LOCATION': os.getenv('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+    'KEY_PREFIX': 'admin',
+}
@@ -1,19 +1,83 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.forms.models import BaseInlineFormSet
+from django.http import QueryDict
+
 from .models import *
+from .search import search_film_works, search_persons
 
 
-class GenreFilmWorkInline(admin.TabularInline):
-    model = GenreFilmWork
+class IndexedSearchMixin:
+    """Replaces ILIKE scans over search_fields with index-backed search"""
+
+    search_function = None
+
+    def get_search_results(self, request, queryset, search_term):
+        return self.search_function(queryset, search_term), False
+
+
+class PaginatedInlineFormSet(BaseInlineFormSet):
+    """Inline formset showing only one page of related objects"""
+
+    per_page = 20
+    page_number = 1
+    page_arg = 'page'
+    # URL arguments of the request, kept in links to other pages
+    query = QueryDict()
+
+    def get_queryset(self):
+        if not hasattr(self, 'page'):
+            paginator = Paginator(super().get_queryset(), self.per_page)
+            self.page = paginator.get_page(self.page_number)
+            self._queryset = self.page.object_list
+        return self._queryset
+
+    def page_links(self):
+        """Returns numbers of pages with query strings of links to them"""
+        self.get_queryset()
+        query = self.query.copy()
+
+        for number in self.page.paginator.page_range:
+            query[self.page_arg] = number
+            yield number, query.urlencode()
+
+
+class PaginatedTabularInline(admin.TabularInline):
+    """Tabular inline with pages switched by "<prefix>-page" URL argument"""
+
+    formset = PaginatedInlineFormSet
+    template = 'admin/movies/edit_inline/tabular_paginated.html'
+    per_page = 20
     extra = 0
 
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        page_arg = f'{formset.get_default_prefix()}-page'
+        formset.per_page = self.per_page
+        formset.page_number = request.GET.get(page_arg, 1)
+        formset.page_arg = page_arg
+        formset.query = request.GET
+        return formset
+
+
+class GenreFilmWorkInline(PaginatedTabularInline):
+    model = GenreFilmWork
+    autocomplete_fields = ('film_work', 'genre')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('film_work', 'genre')
+
 
-class PersonFilmWorkInline(admin.TabularInline):
+class PersonFilmWorkInline(PaginatedTabularInline):
     model = PersonFilmWork
-    extra = 0
+    autocomplete_fields = ('film_work', 'person')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('film_work', 'person')
 
 
 @admin.register(FilmWork)
-class FilmWorkAdmin(admin.ModelAdmin):
+class FilmWorkAdmin(IndexedSearchMixin, admin.ModelAdmin):
     # отображение полей в списке
     list_display = ('title', 'type', 'creation_date', 'rating')
     # порядок следования полей в форме создания/редактирования
@@ -21,8 +85,12 @@ class FilmWorkAdmin(admin.ModelAdmin):
     # фильтрация в списке
     list_filter = ('type',)
 
-    # поиск по полям
+    # поиск по полям: id, триграммы по названию, полнотекстовый по описанию
     search_fields = ('title', 'description', 'id')
+    search_function = staticmethod(search_film_works)
+
+    # не считать всю таблицу повторно при поиске
+    show_full_result_count = False
 
     fields = (
         'title', 'type', 'description', 'creation_date', 'certificate',
@@ -37,7 +105,7 @@ class FilmWorkAdmin(admin.ModelAdmin):
 @admin.register(Genre)
 class GenreAdmin(admin.ModelAdmin):
     list_display = ('name', )
-    list_filter = ('name', 'description')
+    list_filter = ('name', )
     search_fields = ('name', 'description')
     fields = ('name', 'description')
 
@@ -47,10 +115,13 @@ class GenreAdmin(admin.ModelAdmin):
 
 
 @admin.register(Person)
-class PersonAdmin(admin.ModelAdmin):
+class PersonAdmin(IndexedSearchMixin, admin.ModelAdmin):
     list_display = ('full_name', )
-    list_filter = ('full_name', 'birth_date')
+    # фильтр по full_name загружал бы все имена в боковую панель
+    list_filter = ('birth_date', )
     search_fields = ('full_name', 'birth_date')
+    search_function = staticmethod(search_persons)
+    show_full_result_count = False
     fields = ('full_name', 'birth_date')
 
     inlines = [
@@ -0,0 +1,36 @@
+from typing import Iterable, Optional
+from uuid import UUID
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+MOVIE_KEY = 'movies:detail:{}'
+
+
+def get_cache():
+    """Returns the cache storing rendered movie payloads"""
+    return caches[settings.MOVIES_CACHE_ALIAS]
+
+
+def movie_key(movie_id: UUID) -> str:
+    """Returns a cache key for the movie details payload"""
+    return MOVIE_KEY.format(movie_id)
+
+
+def get_movie(movie_id: UUID) -> Optional[bytes]:
+    """Returns a rendered movie payload or None if it's not cached"""
+    return get_cache().get(movie_key(movie_id))
+
+
+def set_movie(movie_id: UUID, payload: bytes):
+    """Stores a rendered movie payload"""
+    get_cache().set(movie_key(movie_id), payload, settings.MOVIES_CACHE_TIMEOUT)
+
+
+def invalidate_movies(movies_ids: Iterable[UUID]):
+    """Drops rendered payloads of the movies"""
+    keys = [movie_key(movie_id) for movie_id in movies_ids]
+
+    if keys:
+        get_cache().delete_many(keys)
@@ -1,12 +1,14 @@
 from django.contrib.postgres.aggregates import ArrayAgg
 from django.core.paginator import InvalidPage
 from django.db.models import Q, QuerySet
-from django.http import JsonResponse, Http404
+from django.http import HttpResponse, JsonResponse, Http404
 from django.utils.translation import gettext_lazy as _
 from django.views.generic.detail import BaseDetailView
 from django.views.generic.list import BaseListView
 
 from ..models import FilmWork, RoleType
+from ..search import rank_film_works, search_film_works
+from . import cache
 
 
 class MoviesApiMixin:
@@ -14,7 +16,7 @@ class MoviesApiMixin:
     queryset = None
     http_method_names = ['get']
 
-    def get_queryset(self) -> dict:
+    def get_queryset(self) -> QuerySet:
         """Return movies"""
 
         def persons_list(role):
@@ -52,6 +54,16 @@ class MoviesApi(MoviesApiMixin, BaseListView):
 
     paginate_by = 50
 
+    def get_queryset(self) -> QuerySet:
+        """Return movies matching "search" URL argument"""
+        queryset = super().get_queryset()
+        search = self.request.GET.get('search', '').strip()
+
+        if search:
+            queryset = rank_film_works(search_film_works(queryset, search), search)
+
+        return queryset
+
     def get_context_data(self, *, object_list=None, **kwargs) -> dict:
         """Get data for the request."""
         context = {}
@@ -103,6 +115,18 @@ class MoviesApi(MoviesApiMixin, BaseListView):
 class MovieDetailsApi(MoviesApiMixin, BaseDetailView):
     """Endpoint to work with movie details"""
 
+    def get(self, request, *args, **kwargs):
+        """Return a cached payload or render and cache it"""
+        movie_id = self.kwargs.get('pk')
+        payload = cache.get_movie(movie_id)
+
+        if payload is not None:
+            return HttpResponse(payload, content_type='application/json')
+
+        response = super().get(request, *args, **kwargs)
+        cache.set_movie(movie_id, response.content)
+        return response
+
     def get_context_data(self, **kwargs) -> dict:
         """Insert the single object into the context dict."""
         movie = kwargs.get('object')
@@ -0,0 +1,117 @@
+"""
+Bulk loading and unloading of the "content" schema through Postgres COPY
+"""
+import csv
+import io
+import json
+from itertools import islice
+from typing import Iterable, Iterator, Sequence, TextIO
+
+from django.db import connection
+from django.db.models import Model
+
+
+COPY_BATCH_SIZE = 5000
+
+
+def batched(rows: Iterable, size: int) -> Iterator[list]:
+    """Splits rows into lists of the size"""
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def to_csv(rows: Iterable[Sequence]) -> io.StringIO:
+    """Serializes rows to a CSV buffer for COPY, None becomes NULL"""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    return buffer
+
+
+class CopyUpserter:
+    """Loads rows into a table through COPY to a temporary table and INSERT ... ON CONFLICT
+
+    Example:
+        with transaction.atomic(), connection.cursor() as cursor:
+            upserter = CopyUpserter(cursor, Genre, ('id', 'name'), conflict=('id',))
+            upserter.load(rows)
+    """
+
+    def __init__(self, cursor, model: Model, columns: Sequence[str], conflict: Sequence[str],
+                 update: Sequence[str] = (), timestamps: Sequence[str] = ('created_at',),
+                 batch_size: int = COPY_BATCH_SIZE):
+        """Constructor
+        :param cursor: cursor inside a transaction
+        :param model: a model of the target table
+        :param columns: columns of the rows
+        :param conflict: columns of a unique constraint
+        :param update: columns to update on conflict, nothing is updated if empty
+        :param timestamps: columns set to now()
+        :param batch_size: rows amount per COPY
+        """
+        qn = connection.ops.quote_name
+        self.cursor = cursor
+        self.table = qn(model._meta.db_table)
+        self.staging = qn(f'tmp_{model._meta.model_name}')
+        self.columns = columns
+        self.conflict = conflict
+        self.update = update
+        self.timestamps = timestamps
+        self.batch_size = batch_size
+        self.loaded = 0
+
+    def load(self, rows: Iterable[Sequence]) -> int:
+        """Upserts rows batch by batch
+        :returns: amount of inserted or updated rows
+        """
+        self.cursor.execute(
+            f'CREATE TEMP TABLE IF NOT EXISTS {self.staging} '
+            f'(LIKE {self.table} INCLUDING DEFAULTS) ON COMMIT DROP'
+        )
+
+        for batch in batched(rows, self.batch_size):
+            self.cursor.execute(f'TRUNCATE {self.staging}')
+            self.cursor.copy_expert(
+                f'COPY {self.staging} ({", ".join(self.columns)}) FROM STDIN WITH (FORMAT csv)',
+                to_csv(batch)
+            )
+            self.cursor.execute(self.get_upsert_sql())
+            self.loaded += self.cursor.rowcount
+
+        return self.loaded
+
+    def get_upsert_sql(self) -> str:
+        """Returns INSERT ... SELECT from the temporary table"""
+        columns = [*self.columns, *self.timestamps]
+        values = [*self.columns, *('now()' for _ in self.timestamps)]
+        conflict = ', '.join(self.conflict)
+
+        if self.update:
+            assignments = ', '.join(f'{column} = EXCLUDED.{column}' for column in self.update)
+            action = f'UPDATE SET {assignments}'
+        else:
+            action = 'NOTHING'
+
+        return (
+            f'INSERT INTO {self.table} ({", ".join(columns)}) '
+            f'SELECT DISTINCT ON ({conflict}) {", ".join(values)} FROM {self.staging} '
+            f'ON CONFLICT ({conflict}) DO {action}'
+        )
+
+
+def export_csv(model: Model, stream: TextIO):
+    """Streams a table to CSV with a header by COPY ... TO STDOUT"""
+    table = connection.ops.quote_name(model._meta.db_table)
+
+    with connection.cursor() as cursor:
+        cursor.copy_expert(f'COPY {table} TO STDOUT WITH (FORMAT csv, HEADER)', stream)
+
+
+def export_ndjson(model: Model, stream: TextIO, chunk_size: int = COPY_BATCH_SIZE):
+    """Streams a table to NDJSON through a server-side cursor"""
+    queryset = model._default_manager.order_by().values()
+
+    for record in queryset.iterator(chunk_size=chunk_size):
+        stream.write(json.dumps(record, ensure_ascii=False, default=str))
+        stream.write('\n')
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...bulk import COPY_BATCH_SIZE, export_csv, export_ndjson
+from ...models import FilmWork, Genre, GenreFilmWork, Person, PersonFilmWork
+
+
+TABLES = {
+    model._meta.model_name: model
+    for model in (FilmWork, Genre, Person, GenreFilmWork, PersonFilmWork)
+}
+EXPORTERS = {
+    'csv': export_csv,
+    'ndjson': export_ndjson,
+}
+
+
+class Command(BaseCommand):
+    help = 'Streams a table of the "content" schema as CSV or NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('table', choices=TABLES, help='model name of the table')
+        parser.add_argument('--format', choices=EXPORTERS, default='csv', help='output format')
+        parser.add_argument('-o', '--output', help='output file (default stdout)')
+
+    def handle(self, *args, **options):
+        model = TABLES[options['table']]
+        export = EXPORTERS[options['format']]
+
+        if not options['output']:
+            self.stdout.ending = ''
+            export(model, self.stdout)
+            return
+
+        try:
+            with open(options['output'], 'w', encoding='utf-8', buffering=COPY_BATCH_SIZE * 64) as file:
+                export(model, file)
+        except OSError as e:
+            raise CommandError(f'Unable to write {options["output"]}: {e}')
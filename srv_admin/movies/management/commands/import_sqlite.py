@@ -0,0 +1,153 @@
+import json
+import sqlite3
+from contextlib import closing
+from typing import Iterator, Tuple
+from uuid import NAMESPACE_URL, UUID, uuid5
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from ...api.cache import invalidate_movies
+from ...bulk import COPY_BATCH_SIZE, CopyUpserter
+from ...models import FilmWork, FilmWorkType, Genre, GenreFilmWork, Person, PersonFilmWork, RoleType
+
+
+SQLITE_DB = settings.BASE_DIR.parent.parent / 'practice' / 'sprint_1' / 'etl' / 'db.sqlite'
+
+# sqlite ids are not uuids, so they are derived deterministically to make reimport idempotent
+NAMESPACE = uuid5(NAMESPACE_URL, 'praktikum/content')
+EMPTY = ('', 'N/A', None)
+
+
+def make_id(*parts) -> UUID:
+    """Returns a stable uuid for the source entity"""
+    return uuid5(NAMESPACE, ':'.join(map(str, parts)))
+
+
+def split(value: str) -> list:
+    """Returns clean values from a comma separated string"""
+    if value in EMPTY:
+        return []
+    return [item.strip() for item in value.split(',') if item.strip() not in EMPTY]
+
+
+class SQLiteCatalog:
+    """Reads the practice catalog (movies, actors, writers, movie_actors) in bulk"""
+
+    def __init__(self, db: sqlite3.Connection):
+        self.db = db
+
+    def _select(self, query: str) -> Iterator[tuple]:
+        with closing(self.db.execute(query)) as cursor:
+            while rows := cursor.fetchmany(COPY_BATCH_SIZE):
+                yield from rows
+
+    def film_works(self) -> Iterator[tuple]:
+        """Rows of id, title, description, rating, type"""
+        query = 'SELECT id, title, plot, imdb_rating FROM movies'
+
+        for movie_id, title, plot, rating in self._select(query):
+            rating = float(rating) if rating not in EMPTY else None
+            description = plot if plot not in EMPTY else None
+            yield make_id('film_work', movie_id), title, description, rating, FilmWorkType.MOVIE
+
+    def genres(self) -> Iterator[Tuple[UUID, UUID]]:
+        """Pairs of film work id and genre name"""
+        for movie_id, genres in self._select('SELECT id, genre FROM movies'):
+            for name in split(genres):
+                yield make_id('film_work', movie_id), name
+
+    def persons(self) -> Iterator[Tuple[UUID, str, str]]:
+        """Triples of film work id, person name and role"""
+        writers = dict(self._select("SELECT id, name FROM writers WHERE name != 'N/A'"))
+        query = 'SELECT id, director, writer, writers FROM movies'
+
+        for movie_id, director, writer, writers_json in self._select(query):
+            film_work_id = make_id('film_work', movie_id)
+            writers_ids = {w['id'] for w in json.loads(writers_json or '[]')}
+            writers_ids.add(writer)
+
+            for name in split(director):
+                yield film_work_id, name, RoleType.DIRECTOR
+
+            for writer_id in writers_ids:
+                if name := writers.get(writer_id):
+                    yield film_work_id, name, RoleType.WRITER
+
+        query = """\
+            SELECT ma.movie_id, a.name
+                FROM movie_actors ma
+                JOIN actors a ON a.id = ma.actor_id
+                WHERE a.name != 'N/A'
+            """
+        for movie_id, name in self._select(query):
+            yield make_id('film_work', movie_id), name, RoleType.ACTOR
+
+
+class Command(BaseCommand):
+    help = (
+        'Imports the practice SQLite catalog into the "content" schema. '
+        'Persons are merged by full name, so namesakes become one person.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default=str(SQLITE_DB), help='SQLite database file')
+        parser.add_argument('--batch-size', type=int, default=COPY_BATCH_SIZE, help='rows per COPY')
+
+    def handle(self, *args, **options):
+        with closing(sqlite3.connect(options['path'])) as db:
+            catalog = SQLiteCatalog(db)
+            with transaction.atomic(), connection.cursor() as cursor:
+                self.load(cursor, catalog, options['batch_size'])
+
+    def load(self, cursor, catalog: SQLiteCatalog, batch_size: int):
+        """Upserts all the tables"""
+        timestamps = ('created_at', 'updated_at')
+        movies_ids = []
+
+        def upsert(model, columns, conflict, rows, update=(), stamps=('created_at',)):
+            upserter = CopyUpserter(cursor, model, columns, conflict, update, stamps, batch_size)
+            loaded = upserter.load(rows)
+            self.stdout.write(f'{model._meta.model_name}: {loaded} rows upserted')
+
+        def film_works():
+            for row in catalog.film_works():
+                movies_ids.append(row[0])
+                yield row
+
+        upsert(
+            FilmWork, ('id', 'title', 'description', 'rating', 'type'), ('id',), film_works(),
+            update=('title', 'description', 'rating', 'updated_at'), stamps=timestamps,
+        )
+
+        genre_links = list(catalog.genres())
+        genres = {name: make_id('genre', name) for _, name in genre_links}
+        upsert(
+            Genre, ('id', 'name'), ('id',), ((genre_id, name) for name, genre_id in genres.items()),
+            update=('name', 'updated_at'), stamps=timestamps,
+        )
+        upsert(
+            GenreFilmWork, ('id', 'film_work_id', 'genre_id'), ('film_work_id', 'genre_id'),
+            ((make_id(fw_id, genres[name]), fw_id, genres[name]) for fw_id, name in genre_links),
+        )
+
+        person_links = list(catalog.persons())
+        # the catalog has no ids of directors, so persons are identified by name
+        persons = {name: make_id('person', name) for _, name, _ in person_links}
+        upsert(
+            Person, ('id', 'full_name'), ('id',), ((person_id, name) for name, person_id in persons.items()),
+            update=('full_name', 'updated_at'), stamps=timestamps,
+        )
+        upsert(
+            PersonFilmWork, ('id', 'film_work_id', 'person_id', 'role'), ('film_work_id', 'person_id', 'role'),
+            (
+                (make_id(fw_id, persons[name], role), fw_id, persons[name], role)
+                for fw_id, name, role in person_links
+            ),
+        )
+
+        # COPY doesn't send post_save and m2m_changed, so cached payloads are dropped here,
+        # and once more after commit in case a request cached the old rows meanwhile
+        invalidate_movies(movies_ids)
+        transaction.on_commit(lambda: invalidate_movies(movies_ids))
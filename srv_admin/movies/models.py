@@ -1,6 +1,7 @@
 from uuid import uuid4
 
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
 from django.core.validators import MinValueValidator
 from django.db import models
 from django.utils.translation import gettext_lazy as _
@@ -41,6 +42,10 @@ class Person(models.Model):
     class Meta:
         managed = False
         db_table = 'content"."person'
+        # the table is unmanaged, indexes are created by schema.sql
+        indexes = [
+            GinIndex(name='person_full_name_trgm', fields=['full_name'], opclasses=['gin_trgm_ops']),
+        ]
         verbose_name = _('персоналии')
         verbose_name_plural = _('персоналии')
 
@@ -69,6 +74,11 @@ class FilmWork(models.Model):
     class Meta:
         managed = False
         db_table = 'content"."film_work'
+        # the table is unmanaged, indexes are created by schema.sql
+        # along with film_work_description_fts on to_tsvector(description)
+        indexes = [
+            GinIndex(name='film_work_title_trgm', fields=['title'], opclasses=['gin_trgm_ops']),
+        ]
         # db_tablespace = 'content'
         verbose_name = _('кинопроизведение')
         verbose_name_plural = _('кинопроизведения')
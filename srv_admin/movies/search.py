@@ -0,0 +1,74 @@
+"""
+Index-backed search of film works and persons
+
+Expects the pg_trgm GIN indexes and the full-text index from schema.sql:
+substring and similarity lookups on names are served by trigram indexes,
+words of descriptions are looked up in the full-text index.
+"""
+from datetime import date
+from typing import Optional
+from uuid import UUID
+
+from django.contrib.postgres.search import SearchQuery, SearchVector, TrigramSimilarity
+from django.db.models import Q, QuerySet
+
+
+# must match the configuration of film_work_description_fts index
+SEARCH_CONFIG = 'english'
+
+
+def parse_uuid(term: str) -> Optional[UUID]:
+    """Returns UUID if the term is a primary key"""
+    try:
+        return UUID(term)
+    except ValueError:
+        return None
+
+
+def parse_date(term: str) -> Optional[date]:
+    """Returns date if the term is in ISO format"""
+    try:
+        return date.fromisoformat(term)
+    except ValueError:
+        return None
+
+
+def search_film_works(queryset: QuerySet, term: str) -> QuerySet:
+    """Filters film works by id, title or description"""
+    term = term.strip()
+
+    if not term:
+        return queryset
+
+    if pk := parse_uuid(term):
+        return queryset.filter(pk=pk)
+
+    matching = queryset.model._default_manager.annotate(
+        description_vector=SearchVector('description', config=SEARCH_CONFIG)
+    ).filter(
+        Q(title__icontains=term)
+        | Q(title__trigram_similar=term)
+        | Q(description_vector=SearchQuery(term, config=SEARCH_CONFIG))
+    )
+    return queryset.filter(pk__in=matching.values('pk'))
+
+
+def rank_film_works(queryset: QuerySet, term: str) -> QuerySet:
+    """Orders film works by title similarity to the term"""
+    return queryset.order_by(TrigramSimilarity('title', term.strip()).desc(), 'pk')
+
+
+def search_persons(queryset: QuerySet, term: str) -> QuerySet:
+    """Filters persons by id, birth date or name"""
+    term = term.strip()
+
+    if not term:
+        return queryset
+
+    if pk := parse_uuid(term):
+        return queryset.filter(pk=pk)
+
+    if birth_date := parse_date(term):
+        return queryset.filter(birth_date=birth_date)
+
+    return queryset.filter(Q(full_name__icontains=term) | Q(full_name__trigram_similar=term))
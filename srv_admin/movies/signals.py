@@ -1,11 +1,15 @@
 import datetime
 import os
+from typing import Iterable
 from urllib.parse import urljoin
 
-from django.db.models.signals import post_save, post_delete
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
 import requests
 
+from .api.cache import invalidate_movies
+
 
 @receiver(post_save, sender='movies.Person', dispatch_uid='congratulatory_signal')
 def congratulatory(sender, instance, created, **kwargs):
@@ -30,3 +34,54 @@ class ETLRunner:
         """Send http request to start ETL process"""
         url = urljoin(self.address, process)
         requests.get(url)
+
+
+def invalidate_on_commit(movies_ids: Iterable):
+    """Drops cached payloads of the movies once the transaction is committed
+
+    A request before the commit reads the old rows and caches them again,
+    so the ids are collected now, while deleted rows and links still exist.
+    """
+    movies_ids = list(movies_ids)
+    transaction.on_commit(lambda: invalidate_movies(movies_ids))
+
+
+@receiver([post_save, post_delete], sender='movies.FilmWork', dispatch_uid='film_work_cache_signal')
+def invalidate_film_work(sender, instance, **kwargs):
+    """Drops the cached payload of a changed movie"""
+    invalidate_on_commit([instance.pk])
+
+
+@receiver(pre_save, sender='movies.GenreFilmWork', dispatch_uid='genre_link_previous_signal')
+@receiver(pre_save, sender='movies.PersonFilmWork', dispatch_uid='person_link_previous_signal')
+def remember_film_work(sender, instance, raw=False, **kwargs):
+    """Remembers a movie the link pointed to before it's moved to another one"""
+    if raw or instance._state.adding:
+        return
+
+    instance._previous_film_work_id = sender._default_manager.filter(
+        pk=instance.pk
+    ).values_list('film_work_id', flat=True).first()
+
+
+@receiver([post_save, post_delete], sender='movies.GenreFilmWork', dispatch_uid='genre_link_cache_signal')
+@receiver([post_save, post_delete], sender='movies.PersonFilmWork', dispatch_uid='person_link_cache_signal')
+def invalidate_film_work_link(sender, instance, **kwargs):
+    """Drops cached payloads of movies whose genres or persons changed"""
+    movies_ids = {instance.film_work_id, getattr(instance, '_previous_film_work_id', None)}
+    invalidate_on_commit(movie_id for movie_id in movies_ids if movie_id)
+
+
+@receiver(post_save, sender='movies.Genre', dispatch_uid='genre_cache_signal')
+@receiver(post_save, sender='movies.Person', dispatch_uid='person_cache_signal')
+def invalidate_related_film_works(sender, instance, created, raw=False, **kwargs):
+    """Drops cached payloads of all movies containing a renamed genre or person
+
+    Deletions are not handled here: the cascade deletes the links first,
+    so their own signals invalidate the movies.
+    """
+    if created or raw:
+        return
+
+    links = getattr(instance, f'{sender._meta.model_name}_film_work')
+    invalidate_on_commit(links.values_list('film_work_id', flat=True).distinct())
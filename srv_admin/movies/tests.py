@@ -1,3 +1,325 @@
+from contextlib import contextmanager
+from io import StringIO
+import json
+from pathlib import Path
+import sqlite3
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection, transaction
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .admin import PaginatedTabularInline
+from .api.cache import get_cache, get_movie
+from .models import FilmWork, FilmWorkType, Genre, GenreFilmWork, Person, PersonFilmWork, RoleType
+from .search import search_film_works, search_persons
+
+
+SCHEMA = Path(__file__).resolve().parent.parent / 'schema.sql'
+SQLITE_SCHEMA = """\
+    CREATE TABLE movies (
+        id TEXT PRIMARY KEY, genre TEXT, director TEXT, writer TEXT, title TEXT, plot TEXT,
+        ratings TEXT, imdb_rating TEXT, writers TEXT
+    );
+    CREATE TABLE actors (id INTEGER PRIMARY KEY, name TEXT);
+    CREATE TABLE writers (id TEXT PRIMARY KEY, name TEXT);
+    CREATE TABLE movie_actors (movie_id TEXT, actor_id TEXT);
+    INSERT INTO movies VALUES (
+        'tt0076759', 'Action, Sci-Fi', 'George Lucas', 'w1', 'Star Wars', 'Luke rescues the princess', '', '8.6', ''
+    );
+    INSERT INTO actors VALUES (1, 'Mark Hamill');
+    INSERT INTO writers VALUES ('w1', 'George Lucas');
+    INSERT INTO movie_actors VALUES ('tt0076759', '1');
+    """
+
+
+class ContentTestCase(TestCase):
+    """Creates the unmanaged "content" schema inside the test transaction"""
+
+    @classmethod
+    def setUpClass(cls):
+        # signals should not reach the ETL service
+        patcher = mock.patch('movies.signals.ETLRunner.run')
+        patcher.start()
+        cls.addClassCleanup(patcher.stop)
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        with connection.cursor() as cursor:
+            cursor.execute(SCHEMA.read_text())
+
+    @contextmanager
+    def commit_callbacks(self):
+        """Runs on_commit callbacks scheduled inside the block as if it was committed
+
+        The test transaction is never committed (captureOnCommitCallbacks appears in Django 3.2).
+        """
+        start = len(connection.run_on_commit)
+        yield
+        callbacks = connection.run_on_commit[start:]
+        del connection.run_on_commit[start:]
+
+        for _, callback in callbacks:
+            callback()
+
+
+class MovieDetailsCacheTest(ContentTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.movie = FilmWork.objects.create(title='Star Wars', type=FilmWorkType.MOVIE)
+        cls.person = Person.objects.create(full_name='Mark Hamill')
+
+    def setUp(self):
+        get_cache().clear()
+        self.url = f'/api/v1/movies/{self.movie.pk}'
+
+    def get_movie(self) -> dict:
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_cached_movie_skips_database(self):
+        movie = self.get_movie()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_movie(), movie)
+
+    def test_movie_change_invalidates_cache(self):
+        self.get_movie()
+        self.movie.title = 'Star Wars: Episode IV'
+
+        with self.commit_callbacks():
+            self.movie.save()
+
+        self.assertEqual(self.get_movie()['title'], 'Star Wars: Episode IV')
+
+    def test_cache_is_invalidated_after_commit(self):
+        self.get_movie()
+
+        with self.commit_callbacks():
+            with transaction.atomic():
+                self.movie.title = 'Star Wars: Episode IV'
+                self.movie.save()
+                # a request before the commit would cache the old rows again
+                self.assertIsNotNone(get_movie(self.movie.pk))
+
+            self.assertIsNotNone(get_movie(self.movie.pk))
+
+        self.assertIsNone(get_movie(self.movie.pk))
+        self.assertEqual(self.get_movie()['title'], 'Star Wars: Episode IV')
+
+    def test_person_link_invalidates_cache(self):
+        self.get_movie()
+
+        with self.commit_callbacks():
+            link = PersonFilmWork.objects.create(
+                film_work=self.movie, person=self.person, role=RoleType.ACTOR
+            )
+        self.assertEqual(self.get_movie()['actors'], ['Mark Hamill'])
+
+        with self.commit_callbacks():
+            link.delete()
+        self.assertEqual(self.get_movie()['actors'], [])
+
+    def test_person_rename_invalidates_cache(self):
+        PersonFilmWork.objects.create(film_work=self.movie, person=self.person, role=RoleType.ACTOR)
+        self.get_movie()
+        self.person.full_name = 'Mark Richard Hamill'
+
+        with self.commit_callbacks():
+            self.person.save()
+
+        self.assertEqual(self.get_movie()['actors'], ['Mark Richard Hamill'])
+
+    def test_movie_delete_invalidates_cache(self):
+        self.get_movie()
+
+        with self.commit_callbacks():
+            FilmWork.objects.filter(pk=self.movie.pk).delete()
+
+        self.assertIsNone(get_movie(self.movie.pk))
+
+    def test_missing_movie_is_not_cached(self):
+        movie_id = '00000000-0000-0000-0000-000000000000'
+        response = self.client.get(f'/api/v1/movies/{movie_id}')
+
+        self.assertEqual(response.status_code, 404)
+        self.assertIsNone(get_movie(movie_id))
+
+
+class AdminQueriesTest(ContentTestCase):
+    """Amount of queries of admin pages should not depend on amount of rows"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        cls.movie = FilmWork.objects.create(title='Star Wars', type=FilmWorkType.MOVIE)
+        cls.genre = Genre.objects.create(name='Sci-Fi')
+        cls.person = Person.objects.create(full_name='George Lucas')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def add_rows(self, amount: int):
+        """Adds movies of the genre and persons of the movie"""
+        movies = FilmWork.objects.bulk_create(
+            FilmWork(title=f'Movie {i}', type=FilmWorkType.MOVIE) for i in range(amount)
+        )
+        persons = Person.objects.bulk_create(
+            Person(full_name=f'Actor {i}') for i in range(amount)
+        )
+        GenreFilmWork.objects.bulk_create(
+            GenreFilmWork(film_work=movie, genre=self.genre) for movie in movies
+        )
+        PersonFilmWork.objects.bulk_create([
+            *(PersonFilmWork(film_work=self.movie, person=p, role=RoleType.ACTOR) for p in persons),
+            *(PersonFilmWork(film_work=m, person=self.person, role=RoleType.WRITER) for m in movies),
+        ])
+
+    def count_queries(self, url: str) -> int:
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def assertConstantQueries(self, url: str):
+        # autocomplete widgets select their value for every rendered row, so the baseline is a full inline page
+        self.add_rows(PaginatedTabularInline.per_page)
+        expected = self.count_queries(url)
+        self.add_rows(200)
+        self.assertEqual(self.count_queries(url), expected)
+
+    def test_film_work_changelist(self):
+        self.assertConstantQueries(reverse('admin:movies_filmwork_changelist'))
+
+    def test_film_work_change(self):
+        self.assertConstantQueries(reverse('admin:movies_filmwork_change', args=[self.movie.pk]))
+
+    def test_genre_changelist(self):
+        self.assertConstantQueries(reverse('admin:movies_genre_changelist'))
+
+    def test_genre_change(self):
+        self.assertConstantQueries(reverse('admin:movies_genre_change', args=[self.genre.pk]))
+
+    def test_person_changelist(self):
+        self.assertConstantQueries(reverse('admin:movies_person_changelist'))
+
+    def test_person_change(self):
+        self.assertConstantQueries(reverse('admin:movies_person_change', args=[self.person.pk]))
+
+    def test_inline_is_paginated(self):
+        self.add_rows(30)
+        url = reverse('admin:movies_filmwork_change', args=[self.movie.pk])
+        response = self.client.get(url, {'person_film_work-page': 2})
+
+        formset = response.context['inline_admin_formsets'][1].formset
+        self.assertEqual(len(formset.forms), 10)
+
+    def test_inline_page_links_keep_query(self):
+        self.add_rows(30)
+        url = reverse('admin:movies_filmwork_change', args=[self.movie.pk])
+        response = self.client.get(url, {'_changelist_filters': 'type=movie', 'person_film_work-page': 2})
+
+        links = dict(response.context['inline_admin_formsets'][1].formset.page_links())
+        self.assertEqual(links[1], '_changelist_filters=type%3Dmovie&person_film_work-page=1')
+        self.assertContains(response, f'href="?{links[1]}"'.replace('&', '&amp;'))
+
+
+class ImportExportTest(ContentTestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = str(Path(directory.name) / 'db.sqlite')
+
+        with sqlite3.connect(self.path) as db:
+            db.executescript(SQLITE_SCHEMA)
+
+    def import_catalog(self):
+        call_command('import_sqlite', self.path, stdout=StringIO())
+
+    def rename_movie(self, title: str):
+        with sqlite3.connect(self.path) as db:
+            db.execute('UPDATE movies SET title = ?', [title])
+
+    def test_upsert_round_trip(self):
+        self.import_catalog()
+        self.import_catalog()
+
+        # the director and the writer is the same person
+        self.assertEqual(FilmWork.objects.count(), 1)
+        self.assertEqual(set(Genre.objects.values_list('name', flat=True)), {'Action', 'Sci-Fi'})
+        self.assertEqual(set(Person.objects.values_list('full_name', flat=True)), {'George Lucas', 'Mark Hamill'})
+        self.assertEqual(GenreFilmWork.objects.count(), 2)
+        self.assertEqual(PersonFilmWork.objects.count(), 3)
+
+        self.rename_movie('Star Wars: Episode IV')
+        self.import_catalog()
+
+        self.assertEqual(FilmWork.objects.get().title, 'Star Wars: Episode IV')
+
+    def test_import_invalidates_cache(self):
+        self.import_catalog()
+        url = f'/api/v1/movies/{FilmWork.objects.get().pk}'
+        self.assertEqual(json.loads(self.client.get(url).content)['title'], 'Star Wars')
+
+        self.rename_movie('Star Wars: Episode IV')
+        self.import_catalog()
+
+        self.assertEqual(json.loads(self.client.get(url).content)['title'], 'Star Wars: Episode IV')
+
+    def test_export(self):
+        self.import_catalog()
+        ndjson, csv = StringIO(), StringIO()
+        call_command('export_content', 'genre', '--format', 'ndjson', stdout=ndjson)
+        call_command('export_content', 'filmwork', stdout=csv)
+
+        names = {json.loads(line)['name'] for line in ndjson.getvalue().splitlines()}
+        header, row = csv.getvalue().splitlines()
+        self.assertEqual(names, {'Action', 'Sci-Fi'})
+        self.assertIn('title', header.split(','))
+        self.assertIn('Star Wars', row)
+
+
+class SearchTest(ContentTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.star_wars = FilmWork.objects.create(
+            title='Star Wars', type=FilmWorkType.MOVIE, description='Luke rescues the princess'
+        )
+        cls.star_trek = FilmWork.objects.create(
+            title='Star Trek', type=FilmWorkType.MOVIE, description='Kirk explores space'
+        )
+        cls.person = Person.objects.create(full_name='Mark Hamill')
+
+    def search(self, term: str) -> set:
+        return set(search_film_works(FilmWork.objects.all(), term))
+
+    def test_uuid_is_primary_key(self):
+        self.assertEqual(self.search(f' {self.star_trek.pk} '), {self.star_trek})
+
+    def test_title_substring(self):
+        self.assertEqual(self.search('wars'), {self.star_wars})
+        self.assertEqual(self.search('star'), {self.star_wars, self.star_trek})
+
+    def test_description_words(self):
+        self.assertEqual(self.search('princesses'), {self.star_wars})
+
+    def test_person_name(self):
+        self.assertEqual(list(search_persons(Person.objects.all(), 'hamil')), [self.person])
 
-# Create your tests here.
+    def test_api_search(self):
+        response = self.client.get('/api/v1/movies/', {'search': 'trek'})
+        titles = [movie['title'] for movie in json.loads(response.content)['results']]
+        self.assertEqual(titles, ['Star Trek'])
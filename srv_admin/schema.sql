@@ -55,4 +55,12 @@ CREATE TABLE IF NOT EXISTS content.person_film_work (
 
 -- Обязательно проверяется уникальность кинопроизведения, человека и роли человека, чтобы не появлялось дублей
 -- Один человек может быть сразу в нескольких ролях (например, сценарист и режиссер)
-CREATE UNIQUE INDEX film_work_person_role ON content.person_film_work (film_work_id, person_id, role);
\ No newline at end of file
+CREATE UNIQUE INDEX film_work_person_role ON content.person_film_work (film_work_id, person_id, role);
+
+-- Поиск в админке и API: триграммные индексы обслуживают ILIKE и поиск похожих строк,
+-- полнотекстовый индекс - поиск по описанию (конфигурация совпадает с movies.search.SEARCH_CONFIG)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS film_work_title_trgm ON content.film_work USING gin (title gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS film_work_description_fts ON content.film_work
+    USING gin (to_tsvector('english'::regconfig, COALESCE(description, '')));
+CREATE INDEX IF NOT EXISTS person_full_name_trgm ON content.person USING gin (full_name gin_trgm_ops);
@@ -0,0 +1,197 @@
+"""
+Dimension caches shared by ETL batches
+
+Persons and genres are referenced by many film works, so their names are kept
+in memory for a run instead of being selected again for every batch. A full
+load preloads a dimension by one query at the start, then transform of any
+batch is dictionary lookups, ids missing in the cache are fetched in bulk.
+The cache is bounded by an estimated size in bytes, the least recently used
+entries are evicted first.
+
+An incremental run keeps the cache and applies rows changed since the latest
+"updated_at" seen, so only changed persons are selected again.
+
+Example:
+    persons = DimensionCache(
+        'person',
+        fetch=lambda ids: cursor_of('SELECT id, full_name FROM content.person WHERE id = ANY(%s)', ids),
+        fetch_changed=lambda since: cursor_of(
+            'SELECT id, full_name, updated_at FROM content.person WHERE updated_at > %s', since
+        ),
+    )
+    persons.preload(cursor_of('SELECT id, full_name, updated_at FROM content.person'))
+    names = persons.get_many(persons_ids)
+    ...
+    persons.sync()
+"""
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from sys import getsizeof
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Tuple
+
+
+MAX_SIZE = 64 * 2 ** 20
+# ids missing in the source are cached too, so they are not fetched again
+MISSING = object()
+
+Fetch = Callable[[List[Hashable]], Iterable[Tuple[Hashable, Any]]]
+FetchChanged = Callable[[Any], Iterable[Tuple[Hashable, Any, Any]]]
+
+
+@dataclass
+class CacheStats:
+    """Counters of a cache, picklable to be sent from worker processes"""
+    name: str
+    items: int = 0
+    size: int = 0
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def add(self, other: 'CacheStats'):
+        """Adds counters of another cache of the same dimension"""
+        self.items += other.items
+        self.size += other.size
+        self.hits += other.hits
+        self.misses += other.misses
+        self.evictions += other.evictions
+
+    def as_dict(self) -> dict:
+        return {**asdict(self), 'hit_ratio': self.hit_ratio}
+
+
+def get_entry_size(key: Hashable, value: Any) -> int:
+    """Estimates memory of a cache entry in bytes"""
+    return getsizeof(key) + (getsizeof(value) if value is not MISSING else 0)
+
+
+class DimensionCache:
+    """Values of a dimension by id with LRU eviction by size
+
+    :param name: name of the dimension in reports
+    :param fetch: returns (id, value) rows of the ids found in the source
+    :param max_size: max estimated size of entries in bytes
+    :param fetch_changed: returns (id, value, updated_at) rows changed after the "updated_at"
+    """
+
+    def __init__(self, name: str, fetch: Fetch, max_size: int = MAX_SIZE, fetch_changed: FetchChanged = None):
+        self.fetch = fetch
+        self.fetch_changed = fetch_changed
+        self.max_size = max_size
+        # id: (value, size)
+        self.entries: OrderedDict = OrderedDict()
+        self.stats = CacheStats(name)
+        self.updated_at = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.entries
+
+    def _put(self, key: Hashable, value: Any):
+        """Stores the value as the most recently used one, evicts old ones if the cache is full"""
+        self._drop(key)
+        size = get_entry_size(key, value)
+        self.entries[key] = value, size
+        self.stats.items += 1
+        self.stats.size += size
+
+        while self.stats.size > self.max_size:
+            self._drop(next(iter(self.entries)))
+            self.stats.evictions += 1
+
+    def _drop(self, key: Hashable):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.stats.items -= 1
+            self.stats.size -= entry[1]
+
+    def _advance(self, updated_at: Any):
+        if updated_at is not None and (self.updated_at is None or updated_at > self.updated_at):
+            self.updated_at = updated_at
+
+    def preload(self, rows: Iterable[tuple]) -> int:
+        """Fills the cache with (id, value) or (id, value, updated_at) rows
+
+        Rows which don't fit are skipped and fetched when requested,
+        "updated_at" is taken from all of them.
+        :return: amount of cached rows
+        """
+        loaded = 0
+
+        for key, value, *updated_at in rows:
+            self._advance(updated_at[0] if updated_at else None)
+
+            if self.stats.size + get_entry_size(key, value) <= self.max_size:
+                self._put(key, value)
+                loaded += 1
+
+        return loaded
+
+    def get_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, Any]:
+        """Returns values by id of the ids found in the source, misses are fetched by one call"""
+        found, missed = {}, []
+        keys = dict.fromkeys(keys)
+
+        for key in keys:
+            entry = self.entries.get(key)
+
+            if entry is None:
+                missed.append(key)
+                continue
+
+            self.entries.move_to_end(key)
+            if entry[0] is not MISSING:
+                found[key] = entry[0]
+
+        self.stats.hits += len(keys) - len(missed)
+        self.stats.misses += len(missed)
+
+        if missed:
+            fetched = dict(self.fetch(missed))
+
+            for key in missed:
+                value = fetched.get(key, MISSING)
+                self._put(key, value)
+                if value is not MISSING:
+                    found[key] = value
+
+        return found
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        return self.get_many([key]).get(key, default)
+
+    def invalidate(self, keys: Iterable[Hashable] = None):
+        """Drops the ids or all entries, they are fetched again when requested"""
+        if keys is None:
+            self.stats.items = self.stats.size = 0
+            self.entries.clear()
+            return
+
+        for key in keys:
+            self._drop(key)
+
+    def sync(self) -> int:
+        """Applies rows changed in the source since the latest "updated_at"
+
+        Cached ids get new values, others are fetched when requested.
+        :return: amount of changed rows
+        """
+        if self.fetch_changed is None or self.updated_at is None:
+            return 0
+
+        changed = 0
+
+        for key, value, updated_at in self.fetch_changed(self.updated_at):
+            if key in self.entries:
+                self._put(key, value)
+            self._advance(updated_at)
+            changed += 1
+
+        return changed
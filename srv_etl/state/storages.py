@@ -2,7 +2,10 @@ import abc
 import json
 import os
 
-import redis
+try:
+    import redis
+except ImportError:  # only RedisStorage needs it
+    redis = None
 
 
 class BaseStorage:
@@ -42,7 +45,7 @@ class JsonFileStorage(BaseStorage):
 
 class RedisStorage(BaseStorage):
 
-    def __init__(self, redis_conn: redis.Redis):
+    def __init__(self, redis_conn: 'redis.Redis'):
         self._redis = redis_conn
         self._state = self.retrieve_state()
 
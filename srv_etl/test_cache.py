@@ -0,0 +1,91 @@
+from pytest import main
+
+from .cache import DimensionCache, get_entry_size
+
+
+class Source:
+    """Rows of a dimension table with counted queries"""
+
+    def __init__(self, rows: dict):
+        self.rows = rows
+        self.updated = {key: 1 for key in rows}
+        self.queries = []
+
+    def fetch(self, ids):
+        self.queries.append(list(ids))
+        return [(key, self.rows[key]) for key in ids if key in self.rows]
+
+    def fetch_changed(self, since):
+        self.queries.append(since)
+        return [(key, self.rows[key], updated) for key, updated in self.updated.items() if updated > since]
+
+
+def test_misses_are_fetched_once():
+    source = Source({1: 'Mark Hamill', 2: 'Carrie Fisher'})
+    cache = DimensionCache('person', source.fetch)
+
+    assert cache.get_many([1, 2, 3, 1]) == {1: 'Mark Hamill', 2: 'Carrie Fisher'}
+    assert cache.get_many([3, 2]) == {2: 'Carrie Fisher'}
+    assert cache.get(3, 'unknown') == 'unknown'
+    assert source.queries == [[1, 2, 3]]
+    assert (cache.stats.hits, cache.stats.misses) == (3, 3)
+    assert cache.stats.hit_ratio == 0.5
+
+
+def test_preload():
+    source = Source({})
+    cache = DimensionCache('genre', source.fetch)
+
+    assert cache.preload([('a', 'Action', 3), ('d', 'Drama', 5), ('c', 'Comedy', None)]) == 3
+    assert cache.get_many(['a', 'c']) == {'a': 'Action', 'c': 'Comedy'}
+    assert cache.updated_at == 5
+    assert not source.queries
+
+
+def test_size_bound():
+    entry_size = get_entry_size(1, 'name 1')
+    source = Source({i: f'name {i}' for i in range(10)})
+    cache = DimensionCache('person', source.fetch, max_size=3 * entry_size)
+
+    # rows which don't fit are fetched when requested
+    assert cache.preload(source.rows.items()) == 3
+    cache.get_many([0, 5])
+    cache.get_many([6])
+
+    # 1 and 2 were the least recently used
+    assert list(cache.entries) == [0, 5, 6]
+    assert cache.stats.size <= cache.max_size
+    assert cache.stats.evictions == 2
+    assert len(cache) == cache.stats.items == 3
+
+
+def test_sync_by_updated_at():
+    source = Source({1: 'Mark Hamill', 2: 'Carrie Fisher'})
+    cache = DimensionCache('person', source.fetch, fetch_changed=source.fetch_changed)
+    cache.preload((key, name, source.updated[key]) for key, name in source.rows.items())
+
+    source.rows.update({2: 'Carrie Frances Fisher', 3: 'Harrison Ford'})
+    source.updated.update({2: 2, 3: 2})
+
+    assert cache.sync() == 2
+    assert cache.sync() == 0
+    assert source.queries == [1, 2]
+    assert 3 not in cache
+    assert cache.get_many([2, 3]) == {2: 'Carrie Frances Fisher', 3: 'Harrison Ford'}
+
+
+def test_invalidate():
+    source = Source({1: 'Mark Hamill', 2: 'Carrie Fisher'})
+    cache = DimensionCache('person', source.fetch)
+    cache.get_many([1, 2])
+
+    cache.invalidate([1])
+    assert 1 not in cache and 2 in cache
+
+    cache.invalidate()
+    assert not cache.entries
+    assert cache.stats.items == cache.stats.size == 0
+
+
+if __name__ == '__main__':
+    main()
@@ -2,11 +2,21 @@ from elasticsearch.exceptions import NotFoundError
 from flask import Blueprint, jsonify, request
 
 from ..app import es, logger
-from ..utils import catch
-from .utils import UrlArgValidator, get_movies
+from ..config import HIDDEN_FIELDS, SUGGEST_CACHE_SIZE, SUGGEST_CACHE_TTL
+from ..utils import TTLCache, catch
+from .utils import SuggestArgValidator, UrlArgValidator, get_movies, get_suggestions
 
 
 api = Blueprint('api', __name__)
+suggestions_cache = TTLCache(SUGGEST_CACHE_SIZE, SUGGEST_CACHE_TTL)
+
+
+@api.after_request
+def log_request(response):
+    """Writes an access log line, the workload is replayed from it in load tests"""
+    path = request.full_path.rstrip('?')
+    logger.info(f'{request.method} {path} FROM: {request.remote_addr} STATUS: {response.status_code}')
+    return response
 
 
 @api.route('movies/', methods=['GET'])
@@ -26,8 +36,9 @@ def movies():
         return args.unsupported(), 400
 
     result = get_movies(es, **args.values)
+    found = result.json['movies'] if args.values['facets'] else result.json
 
-    return result, (200 if result.json else 404)
+    return result, (200 if found else 404)
 
 
 @api.route('movies/<movie_id>', methods=['GET'])
@@ -35,20 +46,52 @@ def movies():
 def movie_detail(movie_id):
     """Looks for all information about the movie by id"""
 
-    logger.info(f'{request.method} request FROM: {request.remote_addr}')
-
-    args = UrlArgValidator(expected=())
-    if args:
+    args = UrlArgValidator(expected=('fields',))
+    if args.excess:
         return args.unsupported(), 400
 
+    if args.errors:
+        return args.validation_details(), 422
+
     response, status = 'Movie not found', 404
 
+    if fields := args.values['fields']:
+        source = {'_source_includes': fields}
+    else:
+        source = {'_source_excludes': list(HIDDEN_FIELDS)}
+
     try:
-        response = es.get(
-            'movies', movie_id, _source_excludes=['actors_names', 'writers_names']
-        )['_source']
+        response = es.get('movies', movie_id, **source).get('_source', {})
         status = 200
     except NotFoundError:
         logger.debug(f'Movie with id = {movie_id} not found')
 
     return jsonify(response), status
+
+
+@api.route('suggest/', methods=['GET'])
+@catch
+def suggest():
+    """Suggests movies by a typed prefix of title"""
+
+    args = SuggestArgValidator()
+
+    if args.errors:
+        return args.validation_details(), 422
+
+    if args.excess:
+        return args.unsupported(), 400
+
+    key = args.values['prefix'], args.values['limit']
+    suggestions = suggestions_cache.get(key)
+
+    if suggestions is None:
+        suggestions = get_suggestions(es, **args.values)
+
+        # failures are not cached
+        if suggestions is None:
+            return jsonify([]), 200
+
+        suggestions_cache.set(key, suggestions)
+
+    return jsonify(suggestions), 200
@@ -1,8 +1,48 @@
-from typing import Sequence
+import json
+from typing import Iterator, List, Optional, Sequence
 
 from elasticsearch.exceptions import TransportError
 from flask import Response, request, jsonify
 
+from ..config import (
+    FACETS_SIZE, HIDDEN_FIELDS, INDEX_SCHEMA, LIST_FIELDS, RATING_RANGE,
+    SEARCH_DEFAULT_FIELD_SET, SEARCH_FIELD_SETS, SEARCH_TERMINATE_AFTER, SEARCH_TIMEOUT, SEARCH_TRACK_TOTAL_HITS,
+    SUGGEST_LIMIT, SUGGEST_MAX_LIMIT, SUGGEST_MAX_PREFIX,
+)
+
+
+def get_mapping_fields(properties: dict, prefix: str = '') -> Iterator[str]:
+    """Returns paths of fields of the index mapping, "actors.name" for nested ones"""
+    for name, mapping in properties.items():
+        path = prefix + name
+        yield path
+
+        if 'properties' in mapping:
+            yield from get_mapping_fields(mapping['properties'], f'{path}.')
+
+
+with open(INDEX_SCHEMA) as schema:
+    MOVIE_FIELDS = tuple(
+        field for field in get_mapping_fields(json.load(schema)['mappings']['properties'])
+        if field.split('.')[0] not in HIDDEN_FIELDS
+    )
+
+
+FACETS_AGGS = {
+    'genre': {'terms': {'field': 'genre', 'size': FACETS_SIZE}},
+    'imdb_rating': {
+        'range': {
+            'field': 'imdb_rating',
+            'keyed': False,
+            # the last range includes the top rating
+            'ranges': [
+                {'key': f'{low}-{low + 1}', 'from': low, **({'to': low + 1} if low < 9 else {})}
+                for low in range(10)
+            ],
+        }
+    },
+}
+
 
 class UrlArgValidator:
     """URL Arguments validator inside Flask request context
@@ -23,8 +63,28 @@ class UrlArgValidator:
         'limit': {'msg': 'Limit should be greater than 0', 'type': 'integer'},
         'page': {'msg': 'Page should be greater than 0', 'type': 'integer'},
         'search': {'msg': 'Search maybe any string', 'type': 'string'},
+        'search_in': {
+            'msg': f'Search fields should be one of the following: {", ".join(SEARCH_FIELD_SETS)}',
+            'type': 'string',
+        },
         'sort': {'msg': '', 'type': 'string'},
-        'sort_order': {'msg': 'Sort order should be one of the following: asc, desc', 'type': 'string'}
+        'sort_order': {'msg': 'Sort order should be one of the following: asc, desc', 'type': 'string'},
+        'genre': {'msg': 'Genre maybe any string, several genres are separated by comma', 'type': 'string'},
+        'rating_min': {
+            'msg': 'Minimal rating should be a number from {} to {}'.format(*RATING_RANGE),
+            'type': 'number',
+        },
+        'rating_max': {
+            'msg': 'Maximal rating should be a number from {} to {} not less than minimal one'.format(*RATING_RANGE),
+            'type': 'number',
+        },
+        'actor': {'msg': 'Actor maybe any string', 'type': 'string'},
+        'director': {'msg': 'Director maybe any string', 'type': 'string'},
+        'facets': {'msg': 'Facets should be one of the following: true, false', 'type': 'boolean'},
+        'fields': {
+            'msg': f'Fields should be separated by comma, available fields: {", ".join(MOVIE_FIELDS)}',
+            'type': 'string',
+        },
     }
 
     def __init__(self, expected: Sequence = tuple(supported), sort_fields: Sequence = default_fields):
@@ -32,7 +92,8 @@ class UrlArgValidator:
         self.expected = expected
 
         self.doc_fields = sort_fields
-        self.supported['sort']['msg'] = f'Sort field should be one of the following: {", ".join(self.doc_fields)}'
+        if 'sort' in self.supported:
+            self.supported['sort']['msg'] = f'Sort field should be one of the following: {", ".join(self.doc_fields)}'
 
         self.errors = []
         self.excess = None
@@ -70,6 +131,8 @@ class UrlArgValidator:
             'limit': self.limit(),
             'page': self.page(),
             'sort': self.sort(),
+            'facets': self.facets(),
+            'fields': self.fields(),
         }
 
     def unsupported(self) -> Response:
@@ -130,35 +193,155 @@ class UrlArgValidator:
         return page
 
     def query(self):
-        """Returns a body to ES query"""
-        query = {}
+        """Returns a body to ES query, the text is scored and filters only narrow results"""
         contained_text = self.search()
+        fields = self.search_fields()
+        filters = self.filters()
+
+        if not (contained_text or filters):
+            return {}
+
+        must = []
 
         if contained_text:
-            query["query"] = {
+            must.append({
                 "multi_match": {
                     "query": contained_text,
-                    # тесты проходят только по полю title
-                    "fields": ['title'],  # ["title", "description", "actors_names", "writers_names", "director"],
-                    # "fuzziness": "auto"
+                    # тесты проходят только по полю title, поэтому оно ищется по умолчанию
+                    "fields": fields,
+                    "type": "best_fields",
+                    "tie_breaker": 0.3,
                 }
-            }
+            })
+
+        return {"query": {"bool": {"must": must, "filter": filters}}}
+
+    def filters(self) -> List[dict]:
+        """Returns clauses of a bool query filter, they don't affect scoring and are cached by ES"""
+        filters = []
+
+        if genres := self.genres():
+            filters.append({'terms': {'genre': genres}})
+
+        if rating := self.rating_range():
+            filters.append({'range': {'imdb_rating': rating}})
+
+        if actor := self._extract('actor'):
+            filters.append({
+                'nested': {
+                    'path': 'actors',
+                    'query': {'match': {'actors.name': {'query': actor, 'operator': 'and'}}},
+                }
+            })
+
+        if director := self._extract('director'):
+            filters.append({'match': {'director': {'query': director, 'operator': 'and'}}})
+
+        return filters
+
+    def genres(self) -> List[str]:
+        """Returns genres from comma separated 'genre' argument"""
+        value = self._extract('genre')
+
+        if value is None:
+            return []
+
+        return [genre.strip() for genre in value.split(',') if genre.strip()]
+
+    def rating(self, arg: str) -> Optional[float]:
+        """Returns a bound of rating from the argument"""
+        value = self._extract(arg, float)
+
+        # not set
+        if value is None:
+            return None
+
+        # wrong value, NaN is out of range too
+        low, high = RATING_RANGE
+        if value is False or not low <= value <= high:
+            self.errors.append(arg)
+            return None
+
+        return value
+
+    def rating_range(self) -> dict:
+        """Returns a range query of 'rating_min' and 'rating_max' arguments"""
+        rating_min = self.rating('rating_min')
+        rating_max = self.rating('rating_max')
+
+        if rating_min is not None and rating_max is not None and rating_min > rating_max:
+            self.errors.append('rating_max')
+            return {}
 
-        return query
+        bounds = {'gte': rating_min, 'lte': rating_max}
+        return {name: value for name, value in bounds.items() if value is not None}
+
+    def fields(self) -> Optional[List[str]]:
+        """Returns fields of movies from comma separated 'fields' argument"""
+        value = self._extract('fields')
+
+        # not set
+        if value is None:
+            return None
+
+        fields = [field.strip() for field in value.split(',') if field.strip()]
+
+        # wrong value
+        if not fields or set(fields) - set(MOVIE_FIELDS):
+            self.errors.append('fields')
+            return None
+
+        return fields
+
+    def facets(self) -> bool:
+        """Returns whether to count movies by genres and ratings"""
+        value = self._extract('facets')
+
+        # not set
+        if value is None:
+            return False
+
+        value = value.lower()
+
+        # wrong value
+        if value not in ('true', 'false'):
+            self.errors.append('facets')
+            return False
+
+        return value == 'true'
+
+    def search_fields(self):
+        """Returns boosted fields of the set from 'search_in' argument"""
+        name = self._extract('search_in')
+
+        # not set
+        if name is None:
+            return SEARCH_FIELD_SETS[SEARCH_DEFAULT_FIELD_SET]
+
+        # wrong value
+        if name not in SEARCH_FIELD_SETS:
+            self.errors.append('search_in')
+            return SEARCH_FIELD_SETS[SEARCH_DEFAULT_FIELD_SET]
+
+        return SEARCH_FIELD_SETS[name]
 
     def search(self):
         """Returns 'search' argument value"""
         return self._extract('search')
 
     def sort(self):
-        """Returns sort param to ES query"""
+        """Returns sort param to ES query, a full-text search is ordered by relevance unless a field is set"""
 
         field = self.sort_field()
         order = self.sort_order()
 
-        if not (field and order):
+        if field is False or order is False:
             return None
 
+        # not set
+        if field is None:
+            return None if self.search() else f'id:{order}'
+
         return f'{field}:{order}'
 
     def sort_field(self):
@@ -167,7 +350,7 @@ class UrlArgValidator:
 
         # not set
         if field is None:
-            return 'id'
+            return None
 
         field = field.replace('"', '')
 
@@ -196,33 +379,143 @@ class UrlArgValidator:
         return order
 
 
-def get_movies(client, query: dict = None, limit: int = None, page: int = 1, sort: str = None) -> Response:
+class SuggestArgValidator(UrlArgValidator):
+    """URL Arguments validator of search-as-you-type suggestions"""
+
+    supported = {
+        'prefix': {'msg': f'Prefix should be a string up to {SUGGEST_MAX_PREFIX} characters', 'type': 'string'},
+        'limit': {'msg': 'Limit should be greater than 0', 'type': 'integer'},
+    }
+
+    def __init__(self):
+        super().__init__(expected=tuple(self.supported))
+
+    def _get(self):
+        """Returns all expected URL arguments"""
+        self.errors.clear()
+        self.excess = set(self.args) - set(self.expected)
+        return {
+            'prefix': self.prefix(),
+            'limit': self.limit(),
+        }
+
+    def prefix(self):
+        """Returns a normalized prefix, the same for the cache and the suggester"""
+        prefix = self._extract('prefix')
+
+        if not prefix or len(prefix) > SUGGEST_MAX_PREFIX:
+            self.errors.append('prefix')
+            return None
+
+        return ' '.join(prefix.lower().split())
+
+    def limit(self):
+        """Returns amount of suggestions, capped"""
+        limit = self._extract('limit', int)
+
+        # not set
+        if limit is None:
+            return SUGGEST_LIMIT
+
+        # wrong value
+        if limit is False or limit < 1:
+            self.errors.append('limit')
+            return SUGGEST_LIMIT
+
+        return min(limit, SUGGEST_MAX_LIMIT)
+
+
+def get_movies(client, query: dict = None, limit: int = None, page: int = 1, sort: str = None,
+               facets: bool = False, fields: Sequence[str] = None) -> Response:
     """Looks for movies are relative to a query
 
     :param client: ElasticSearch client
     :param query: ES request body
     :param limit: results amount
     :param page: results page
-    :param sort: sorting
-    :returns HTTP Response object
+    :param sort: sorting, by relevance if not set for a query and by id otherwise
+    :param facets: count movies by genres and ratings
+    :param fields: fields of movies to return, id, title and rating by default
+    :returns HTTP Response object, {"movies": [...], "facets": {...}} if facets are requested
     """
 
     size = limit or 50
     from_ = size * (page - 1) or None
-    sort = sort or 'id:asc'
+    sort = sort or (None if query else 'id:asc')
+    # full-text queries are bounded, listing is cheap anyway
+    limits = {'timeout': SEARCH_TIMEOUT} if query else {}
+
+    # collected documents are the best scored ones only when sorted by relevance
+    if query and not sort:
+        limits['terminate_after'] = SEARCH_TERMINATE_AFTER
+    body = dict(query or {})
+
+    if facets:
+        body['aggs'] = FACETS_AGGS
 
     try:
         response = client.search(
-            query or {}, 'movies',
-            filter_path=['hits.hits._source'],
-            _source=['id', 'title', 'imdb_rating'],
+            body, 'movies',
+            filter_path=['hits.hits._source', 'aggregations.*.buckets'],
+            _source=list(fields or LIST_FIELDS),
             size=size,
             from_=from_,
-            sort=sort
+            sort=sort,
+            track_total_hits=SEARCH_TRACK_TOTAL_HITS,
+            **limits
         )
         results = response.get('hits', {}).get('hits', [])
+        aggregations = response.get('aggregations', {})
     except TransportError:
-        results = []
+        results, aggregations = [], {}
+
+    # a movie without the requested fields is returned as {}
+    movies = [r.get('_source', {}) for r in results]
+
+    if facets:
+        return jsonify({'movies': movies, 'facets': get_facets(aggregations)})
 
-    movies = [r['_source'] for r in results]
     return jsonify(movies)
+
+
+def get_facets(aggregations: dict) -> dict:
+    """Converts aggregations to facets: {"genre": [{"value": "Drama", "count": 10}, ...], ...}"""
+    return {
+        name: [
+            {'value': bucket.get('key_as_string', bucket['key']), 'count': bucket['doc_count']}
+            for bucket in aggregations.get(name, {}).get('buckets', [])
+        ]
+        for name in FACETS_AGGS
+    }
+
+
+def get_suggestions(client, prefix: str, limit: int = SUGGEST_LIMIT) -> Optional[List[dict]]:
+    """Suggests movies by a prefix of title from the completion field
+
+    :param client: ElasticSearch client
+    :param prefix: typed text
+    :param limit: suggestions amount
+    :returns ids and titles of movies, None if ElasticSearch failed
+    """
+
+    body = {
+        '_source': ['id', 'title'],
+        'suggest': {
+            'titles': {
+                'prefix': prefix,
+                'completion': {'field': 'suggest', 'size': limit},
+            }
+        },
+    }
+
+    try:
+        response = client.search(
+            body, 'movies',
+            filter_path=['suggest.titles.options._source'],
+            size=0,
+        )
+    except TransportError:
+        return None
+
+    options = response.get('suggest', {}).get('titles', [{}])[0].get('options', [])
+    return [option['_source'] for option in options]
@@ -7,6 +7,38 @@ LOG_LEVEL = 20
 LOG_FILE = os.path.join(LOG_DIR, 'search_srv.log')
 
 
+# index, the schema is found from the package, so it is imported from any directory
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INDEX_SCHEMA = os.path.join(BASE_DIR, 'practice', 'sprint_1', 'etl', 'create_index.json')
+# fields returned by default and fields never returned
+LIST_FIELDS = 'id', 'title', 'imdb_rating'
+HIDDEN_FIELDS = 'actors_names', 'writers_names', 'suggest'
+
+
+# search: field sets with boosts, chosen by "search_in" URL argument
+SEARCH_FIELD_SETS = {
+    'title': ['title'],
+    'people': ['actors_names', 'writers_names', 'director'],
+    'all': ['title^5', 'actors_names^3', 'director^3', 'writers_names^2', 'description'],
+}
+SEARCH_DEFAULT_FIELD_SET = 'title'
+# worst case limits of a search request, partial results are returned when reached
+SEARCH_TIMEOUT = '500ms'
+SEARCH_TERMINATE_AFTER = 10000
+SEARCH_TRACK_TOTAL_HITS = False
+# filters and facets
+RATING_RANGE = 0.0, 10.0
+FACETS_SIZE = 30
+
+
+# search-as-you-type suggestions
+SUGGEST_LIMIT = 5
+SUGGEST_MAX_LIMIT = 10
+SUGGEST_MAX_PREFIX = 50
+SUGGEST_CACHE_SIZE = 10000
+SUGGEST_CACHE_TTL = 60
+
+
 # app
 class Config:
     DEBUG = True
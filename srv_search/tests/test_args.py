@@ -0,0 +1,130 @@
+from pytest import fixture, importorskip, mark
+
+
+@fixture(scope='module')
+def app():
+    for module in 'flask', 'flask_script', 'elasticsearch':
+        importorskip(module)
+    from srv_search.app import app
+    return app
+
+
+def validate(app, url: str):
+    """Returns values and errors of URL arguments"""
+    from srv_search.api.utils import UrlArgValidator
+
+    with app.test_request_context(url):
+        args = UrlArgValidator()
+        return args.values, args.errors
+
+
+def test_search_with_filters(app):
+    values, errors = validate(
+        app,
+        '/?search=star&genre=Action,%20Adventure&rating_min=7&rating_max=9&actor=Mark%20Hamill&director=Lucas',
+    )
+    query = values['query']['query']['bool']
+
+    assert not errors
+    assert query['must'][0]['multi_match']['query'] == 'star'
+    assert query['filter'] == [
+        {'terms': {'genre': ['Action', 'Adventure']}},
+        {'range': {'imdb_rating': {'gte': 7.0, 'lte': 9.0}}},
+        {
+            'nested': {
+                'path': 'actors',
+                'query': {'match': {'actors.name': {'query': 'Mark Hamill', 'operator': 'and'}}},
+            }
+        },
+        {'match': {'director': {'query': 'Lucas', 'operator': 'and'}}},
+    ]
+
+
+def test_filters_without_search(app):
+    values, errors = validate(app, '/?rating_min=8')
+
+    assert not errors
+    assert values['query'] == {'query': {'bool': {'must': [], 'filter': [{'range': {'imdb_rating': {'gte': 8.0}}}]}}}
+
+
+def test_no_query(app):
+    values, errors = validate(app, '/')
+
+    assert not errors
+    assert values['query'] == {}
+    assert values['facets'] is False
+
+
+@mark.parametrize('url,facets', [
+    ('/?facets=true', True),
+    ('/?facets=False', False),
+])
+def test_facets(app, url, facets):
+    values, errors = validate(app, url)
+    assert not errors
+    assert values['facets'] is facets
+
+
+@mark.parametrize('url,error', [
+    ('/?rating_min=aaa', 'rating_min'),
+    ('/?rating_max=11', 'rating_max'),
+    ('/?rating_min=nan', 'rating_min'),
+    ('/?rating_min=8&rating_max=5', 'rating_max'),
+    ('/?facets=yes', 'facets'),
+])
+def test_invalid(app, url, error):
+    _, errors = validate(app, url)
+    assert errors == [error]
+
+
+@mark.parametrize('url,fields', [
+    ('/', None),
+    ('/?fields=id,%20title', ['id', 'title']),
+    ('/?fields=id,actors.name', ['id', 'actors.name']),
+])
+def test_fields(app, url, fields):
+    values, errors = validate(app, url)
+    assert not errors
+    assert values['fields'] == fields
+
+
+@mark.parametrize('url', ['/?fields=suggest', '/?fields=id,budget', '/?fields=,'])
+def test_invalid_fields(app, url):
+    values, errors = validate(app, url)
+    assert errors == ['fields']
+    assert values['fields'] is None
+
+
+@mark.parametrize('url,sort', [
+    ('/', 'id:asc'),
+    ('/?sort_order=desc', 'id:desc'),
+    ('/?genre=Drama', 'id:asc'),
+    ('/?search=star', None),
+    ('/?search=star&sort=title', 'title:asc'),
+    ('/?search=star&sort=imdb_rating&sort_order=desc', 'imdb_rating:desc'),
+])
+def test_sort(app, url, sort):
+    values, errors = validate(app, url)
+    assert not errors
+    assert values['sort'] == sort
+
+
+class SearchSpy:
+    def __init__(self):
+        self.params = None
+
+    def search(self, body=None, index=None, **params):
+        self.params = params
+        return {}
+
+
+@mark.parametrize('sort,terminate_after', [(None, True), ('title:asc', False)])
+def test_search_limits(app, sort, terminate_after):
+    from srv_search.api.utils import get_movies
+
+    client = SearchSpy()
+    with app.test_request_context('/'):
+        get_movies(client, {'query': {'match_all': {}}}, sort=sort)
+
+    assert client.params['sort'] == sort
+    assert ('terminate_after' in client.params) is terminate_after
@@ -19,6 +19,22 @@ def client():
     ('/api/v1/movies/?sort_order=asc', 200),
     ('/api/v1/movies/?sort_order=desc', 200),
     ('/api/v1/movies/?search=star&limit=2&page=2&sort=title&sort_order=desc', 200),
+    ('/api/v1/movies/?search=lucas&search_in=people', 200),
+    ('/api/v1/movies/?search=star&search_in=all', 200),
+    ('/api/v1/movies/?search=star&search_in=plot', 422),
+    ('/api/v1/movies/?genre=Drama', 200),
+    ('/api/v1/movies/?genre=Action,Adventure&rating_min=7&rating_max=9', 200),
+    ('/api/v1/movies/?actor=Mark%20Hamill', 200),
+    ('/api/v1/movies/?director=George%20Lucas&search=star', 200),
+    ('/api/v1/movies/?genre=Drama&facets=true', 200),
+    ('/api/v1/movies/?rating_min=aaa', 422),
+    ('/api/v1/movies/?rating_max=11', 422),
+    ('/api/v1/movies/?rating_min=8&rating_max=5', 422),
+    ('/api/v1/movies/?facets=yes', 422),
+    ('/api/v1/movies/?fields=id,title', 200),
+    ('/api/v1/movies/?fields=id,actors.name&search=star', 200),
+    ('/api/v1/movies/?fields=suggest', 422),
+    ('/api/v1/movies/?fields=budget', 422),
     ('/api/v1/movies/?page=aaa', 422),
     ('/api/v1/movies/?page=-1', 422),
     ('/api/v1/movies/?limit=aaa', 422),
@@ -32,6 +48,15 @@ def client():
     ('/api/v1/movies/tt0000000', 404),
     ('/api/v1/movies/tt0112270?page=1', 400),
     ('/api/v1/movies/tt0112270?wrong=argument', 400),
+    ('/api/v1/movies/tt0112270?fields=title,genre', 200),
+    ('/api/v1/movies/tt0112270?fields=actors_names', 422),
+
+    ('/api/v1/suggest/?prefix=sta', 200),
+    ('/api/v1/suggest/?prefix=star%20w&limit=3', 200),
+    ('/api/v1/suggest/?prefix=sta&limit=100', 200),
+    ('/api/v1/suggest/', 422),
+    ('/api/v1/suggest/?prefix=sta&limit=0', 422),
+    ('/api/v1/suggest/?prefix=sta&page=1', 400),
 ])
 def test_status(client, url, status):
     """Checks expected URL statuses"""
@@ -45,3 +70,21 @@ def test_client_info(client):
     with client:
         response = client.get('/client/info', headers={'User-Agent': 'testagent/1.0'})
         assert response.json == {'user_agent': 'testagent/1.0'}
+
+
+def test_facets(client):
+    """Checks facets are counted with filtered movies"""
+    with client:
+        response = client.get('/api/v1/movies/?genre=Drama&facets=true')
+        assert set(response.json) == {'movies', 'facets'}
+        assert 'Drama' in [facet['value'] for facet in response.json['facets']['genre']]
+        assert len(response.json['facets']['imdb_rating']) == 10
+
+
+def test_fields(client):
+    """Checks only requested fields are returned"""
+    with client:
+        movies = client.get('/api/v1/movies/?fields=id,genre&limit=5').json
+        movie = client.get('/api/v1/movies/tt0112270?fields=title').json
+        assert all(set(m) <= {'id', 'genre'} for m in movies)
+        assert set(movie) == {'title'}
@@ -1,5 +1,8 @@
+from collections import OrderedDict
 from functools import wraps
 from os.path import join
+from threading import Lock
+from time import monotonic
 
 from common import get_logger, LOG_DIR
 from .app import app
@@ -27,3 +30,49 @@ def catch(view):
             return response
 
     return wrapper
+
+
+class TTLCache:
+    """LRU cache of a limited size with expiring entries, safe for threads
+
+    Example:
+        cache = TTLCache(maxsize=1000, ttl=60)
+        if (value := cache.get(key)) is None:
+            value = compute(key)
+            cache.set(key, value)
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        """Returns an actual value or default"""
+        with self._lock:
+            item = self._data.get(key)
+
+            if item is None:
+                return default
+
+            expires, value = item
+
+            if expires < monotonic():
+                del self._data[key]
+                return default
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """Saves a value evicting the least recently used ones"""
+        with self._lock:
+            self._data[key] = monotonic() + self.ttl, value
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)